@@ -0,0 +1,352 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from downloader import Downloader
+from synthetic_corpus import generate, write_media
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Steps in the order they run; the app steps read the database built by the earlier ones
+STEPS = ['import', 'update_db', 'extraction', 'gradio_search', 'flask_index', 'static_server', 'downloader']
+
+# (search text, language, model) run against both apps, each once cold and once from the cache
+SEARCHES = [
+    ('', 'All', 'All'),
+    ('', 'ja', 'All'),
+    ('', 'All', 'chirp-v3'),
+    ('', 'en', 'chirp-v3-5'),
+    ('love', 'All', 'All'),
+    ('"midnight ocean"', 'All', 'All'),
+    ('fire*', 'en', 'All'),
+    ('dream light', 'All', 'chirp-v3-5'),
+]
+
+# A step is reported as a regression when it takes this much longer than in the baseline
+DEFAULT_TOLERANCE = 0.2
+
+@contextmanager
+def working_directory(path):
+    """
+    Run the block from path, as the apps resolve their relative paths from the current folder.
+    """
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def load_module(path, name):
+    """
+    Import a script by path (the app scripts are not importable by name).
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Flask finds its templates through the registered module
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def percentile(values, fraction):
+    """
+    Return the value at fraction (0 to 1) of the sorted values.
+    """
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def latency_summary(latencies):
+    """
+    Summarize request latencies in seconds as milliseconds.
+    """
+    return {
+        'count': len(latencies),
+        'seconds': sum(latencies),
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'max_ms': max(latencies) * 1000,
+    }
+
+def timed(function, *args):
+    """
+    Call function and return its run time in seconds.
+    """
+    start_time = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start_time
+
+def run_script(workdir, script, *args):
+    """
+    Run one of the repository scripts from workdir and return its run time.
+    """
+    start_time = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, script), *args],
+                            cwd=workdir, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start_time
+    if result.returncode:
+        raise RuntimeError(f"{script} failed: {result.stderr.strip().splitlines()[-1:]}")
+    return elapsed
+
+def bench_import(workdir, context):
+    """
+    Time the parallel import of the corpus into suno.db.
+    """
+    seconds = run_script(workdir, 'json_import_sqlite.py', 'data', '--parallel')
+    os.replace(os.path.join(workdir, 'json_data.db'), os.path.join(workdir, 'suno.db'))
+    return {'seconds': seconds, 'records_per_second': context['records'] / seconds}
+
+def bench_update_db(workdir, context):
+    """
+    Time update_db.py (media flags, count tables and indexes).
+    """
+    shutil.copy(os.path.join(REPO_DIR, 'language-codes.csv'), workdir)
+    return {'seconds': run_script(workdir, 'update_db.py')}
+
+def bench_extraction(workdir, context):
+    """
+    Time the prompt template extraction.
+    """
+    seconds = run_script(workdir, 'update_db_interesting_prompts.py', '--db', 'suno.db')
+    return {'seconds': seconds, 'records_per_second': context['records'] / seconds}
+
+def bench_gradio_search(workdir, context):
+    """
+    Time the gradio search handler, cold and from its cache.
+    """
+    with working_directory(os.path.join(workdir, 'gradio')):
+        app = load_module(os.path.join(REPO_DIR, 'gradio', 'suno-gradio.py'), 'benchmark_gradio_app')
+        def search(query, language, model):
+            # The handler streams its HTML, the search is done when the generator is
+            for _ in app.search_songs(query, language, model, False):
+                pass
+        cold = [timed(search, *arguments) for arguments in SEARCHES]
+        warm = [timed(search, *arguments) for arguments in SEARCHES]
+    return {'seconds': sum(cold), 'cold': latency_summary(cold), 'warm': latency_summary(warm)}
+
+def bench_flask_index(workdir, context):
+    """
+    Time the Flask index page, cold and from its cache.
+    """
+    with working_directory(os.path.join(workdir, 'flask')):
+        app = load_module(os.path.join(REPO_DIR, 'flask', 'app.py'), 'benchmark_flask_app')
+        client = app.app.test_client()
+        def index(query, language, model):
+            response = client.get('/', query_string={
+                'search_query': query,
+                'language': '' if language == 'All' else language,
+                'model': '' if model == 'All' else model,
+            })
+            response.get_data()  # Drain the streamed page
+            if response.status_code != 200:
+                raise RuntimeError(f"Flask index returned {response.status_code}")
+        cold = [timed(index, *arguments) for arguments in SEARCHES]
+        warm = [timed(index, *arguments) for arguments in SEARCHES]
+    return {'seconds': sum(cold), 'cold': latency_summary(cold), 'warm': latency_summary(warm)}
+
+def bench_static_server(workdir, context):
+    """
+    Time media, range, thumbnail and listing requests to the static server.
+    """
+    song_ids = context['media_ids']
+    if not song_ids:
+        raise RuntimeError("No media files, run with --media")
+    with working_directory(os.path.join(workdir, 'gradio')):
+        app = load_module(os.path.join(REPO_DIR, 'gradio', 'static-server.py'), 'benchmark_static_server')
+        # send_from_directory resolves the relative media folders from the app root
+        app.app.root_path = os.getcwd()
+        client = app.app.test_client()
+        def get(url, **headers):
+            response = client.get(url, headers=headers)
+            response.get_data()
+            response.close()
+            if response.status_code not in (200, 206):
+                raise RuntimeError(f"{url} returned {response.status_code}")
+        results = {
+            'images': [timed(get, f'/images/{song_id}.jpeg') for song_id in song_ids],
+            'audio_ranges': [timed(lambda url: get(url, Range='bytes=0-65535'), f'/audio/{song_id}.mp3')
+                             for song_id in song_ids],
+            'thumbnails_cold': [timed(get, f'/thumbs/{song_id}') for song_id in song_ids],
+            'thumbnails_warm': [timed(get, f'/thumbs/{song_id}') for song_id in song_ids],
+            'listings': [timed(get, '/list/images?limit=1000') for _ in range(10)],
+        }
+    summary = {name: latency_summary(latencies) for name, latencies in results.items()}
+    summary['seconds'] = sum(item['seconds'] for item in summary.values())
+    return summary
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler with keep-alive and without a log line per request."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+def bench_downloader(workdir, context):
+    """
+    Time the downloader fetching the media files from a local stand-in server.
+    """
+    song_ids = context['media_ids']
+    if not song_ids:
+        raise RuntimeError("No media files, run with --media")
+    media_dir = os.path.join(workdir, 'suno-ai-music-prompts')
+    target_dir = os.path.join(workdir, 'downloads')
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.makedirs(target_dir)
+
+    # Stand-in for the CDN, serving the generated media files
+    server = ThreadingHTTPServer(('127.0.0.1', 0), lambda *args: QuietHandler(*args, directory=media_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    jobs = []
+    for song_id in song_ids:
+        jobs.append((f"{base_url}/audio/{song_id}.mp3", os.path.join(target_dir, f"{song_id}.mp3")))
+        jobs.append((f"{base_url}/image/{song_id}.jpeg", os.path.join(target_dir, f"{song_id}.jpeg")))
+
+    downloader = Downloader(workers=8, per_host=8)
+    start_time = time.perf_counter()
+    try:
+        results = list(downloader.download_all(jobs))
+    finally:
+        server.shutdown()
+        server.server_close()
+    seconds = time.perf_counter() - start_time
+    total_bytes = sum(result.size for result in results if result.status == 'downloaded')
+    return {
+        'seconds': seconds,
+        'files': len(results),
+        'failed': sum(result.status == 'failed' for result in results),
+        'files_per_second': len(results) / seconds,
+        'mb_per_second': total_bytes / seconds / 2**20,
+    }
+
+BENCHMARKS = {
+    'import': bench_import,
+    'update_db': bench_update_db,
+    'extraction': bench_extraction,
+    'gradio_search': bench_gradio_search,
+    'flask_index': bench_flask_index,
+    'static_server': bench_static_server,
+    'downloader': bench_downloader,
+}
+
+def code_version():
+    """
+    Return the git description of the checked out code, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Print each step's time against a baseline result file.
+    Returns the names of the steps slower than the baseline by more than tolerance.
+    """
+    regressions = []
+    for name, result in results['results'].items():
+        before = baseline.get('results', {}).get(name, {}).get('seconds')
+        if before is None or 'seconds' not in result:
+            continue
+        ratio = result['seconds'] / max(before, 1e-9)
+        regressed = ratio > 1 + tolerance
+        print(f"{'REGRESSION' if regressed else 'ok':<10} {name}: {before:.3f}s -> {result['seconds']:.3f}s ({ratio:.2f}x)")
+        if regressed:
+            regressions.append(name)
+    if baseline.get('records') != results['records']:
+        print(f"Note: the baseline used {baseline.get('records')} records, this run {results['records']}")
+    return regressions
+
+def run(workdir, records, media=200, seed=0, steps=STEPS):
+    """
+    Generate a corpus in workdir and run the benchmark steps on it.
+    Returns the results document.
+    """
+    os.makedirs(os.path.join(workdir, 'gradio'), exist_ok=True)
+    os.makedirs(os.path.join(workdir, 'flask'), exist_ok=True)
+
+    start_time = time.perf_counter()
+    _, media_ids = generate(workdir, records, seed, keep_ids=media)
+    write_media(workdir, media_ids, seed=seed)
+    context = {'records': records, 'media_ids': media_ids}
+
+    results = {'generate': {'seconds': time.perf_counter() - start_time}}
+    for name in steps:
+        try:
+            results[name] = BENCHMARKS[name](workdir, context)
+            print(f"{name}: {results[name]['seconds']:.3f}s")
+        except Exception as e:
+            # Keep going, a missing optional dependency only skips its step
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+            print(f"{name}: failed ({results[name]['error']})")
+
+    return {
+        'version': code_version(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'records': records,
+        'media': len(media_ids),
+        'seed': seed,
+        'results': results,
+    }
+
+def main(records, out_path, workdir=None, media=200, seed=0, steps=STEPS, baseline_path=None,
+         tolerance=DEFAULT_TOLERANCE, keep=False):
+    """
+    Run the benchmark, write the results as JSON and compare them with a baseline.
+    Returns the process exit status: 1 if any step regressed.
+    """
+    temporary = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix='suno-benchmark-'))
+    try:
+        results = run(workdir, records, media, seed, steps)
+    finally:
+        if temporary and not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the import, the batch jobs and the apps on a synthetic corpus.")
+    parser.add_argument('--records', type=int, default=10000, help="songs in the synthetic corpus")
+    parser.add_argument('--media', type=int, default=200, help="songs with stand-in media files")
+    parser.add_argument('--seed', type=int, default=0, help="corpus random seed")
+    parser.add_argument('--steps', default=",".join(STEPS), help="comma separated steps to run, in order")
+    parser.add_argument('--workdir', help="folder for the corpus and database (default: a temporary folder)")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary folder")
+    parser.add_argument('--out', default='benchmark.json', help="results file")
+    parser.add_argument('--compare', help="baseline results file; exits with status 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    steps = [step.strip() for step in args.steps.split(',') if step.strip()]
+    for step in steps:
+        if step not in BENCHMARKS:
+            parser.error(f"unknown step: {step}")
+
+    sys.exit(main(args.records, args.out, args.workdir, args.media, args.seed, steps,
+                  args.compare, args.tolerance, args.keep))
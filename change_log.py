@@ -0,0 +1,73 @@
+# Song id of every inserted, updated or deleted json_data row -> sequence number of its latest change.
+# Incremental jobs (prompt_analytics.py, columnar_export.py) keep the last number they processed;
+# a logged id with no json_data row is a deleted song.
+CHANGE_TABLE = 'json_data_changes'
+
+def create_change_log(cursor):
+    """
+    Create the change log and the triggers recording every inserted, updated or
+    deleted song with an increasing sequence number, whatever script wrote it
+    (imports, template extraction, local flags). Keyed by song id rather than
+    rowid: a deleted song's rowid can be reused by the next insert, which would
+    overwrite its tombstone. Returns True if it did not exist yet, i.e. earlier
+    changes were not recorded.
+    """
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({CHANGE_TABLE})')]
+    exists = bool(columns)
+    # Logs keyed by rowid are rebuilt, which makes the consumers start from a full refresh
+    if exists and 'song_id' not in columns:
+        for trigger in ('json_data_log_insert', 'json_data_log_update', 'json_data_log_delete'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute(f'DROP TABLE {CHANGE_TABLE}')
+        exists = False
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} (
+            song_id TEXT PRIMARY KEY,
+            seq INTEGER
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{CHANGE_TABLE}_seq ON {CHANGE_TABLE} (seq)')
+    next_seq = f'(SELECT COALESCE(MAX(seq), 0) + 1 FROM {CHANGE_TABLE})'
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS json_data_log_insert
+        AFTER INSERT ON json_data BEGIN
+            INSERT OR REPLACE INTO {CHANGE_TABLE} (song_id, seq) VALUES (new.id, {next_seq});
+        END
+    ''')
+    # A changed id also removes the song under its old id
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS json_data_log_update
+        AFTER UPDATE ON json_data BEGIN
+            INSERT OR REPLACE INTO {CHANGE_TABLE} (song_id, seq)
+            SELECT old.id, {next_seq} WHERE old.id IS NOT new.id;
+            INSERT OR REPLACE INTO {CHANGE_TABLE} (song_id, seq) VALUES (new.id, {next_seq});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS json_data_log_delete
+        AFTER DELETE ON json_data BEGIN
+            INSERT OR REPLACE INTO {CHANGE_TABLE} (song_id, seq) VALUES (old.id, {next_seq});
+        END
+    ''')
+    return not exists
+
+def current_seq(cursor):
+    """
+    Return the sequence number of the latest recorded change (0 if none).
+    """
+    return cursor.execute(f'SELECT COALESCE(MAX(seq), 0) FROM {CHANGE_TABLE}').fetchone()[0]
+
+def load_changed_songs(cursor, after_seq, until_seq):
+    """
+    Load the ids of the songs changed after after_seq, up to until_seq, into
+    temp.changed_songs, deleted songs included (they have no json_data row).
+    Returns the number of songs.
+    """
+    cursor.execute('DROP TABLE IF EXISTS temp.changed_songs')
+    cursor.execute('CREATE TEMP TABLE changed_songs (id TEXT PRIMARY KEY) WITHOUT ROWID')
+    cursor.execute(f'''
+        INSERT INTO temp.changed_songs (id)
+        SELECT song_id FROM {CHANGE_TABLE}
+        WHERE seq > ? AND seq <= ?
+    ''', (after_seq, until_seq))
+    return cursor.rowcount
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zlib
+from collections.abc import Mapping
+
+from db_indexes import analyze_and_check
+
+# Optional: zstandard compresses faster and smaller than zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bulky json_data columns that no search or listing query reads
+COLD_COLUMNS = [
+    'video_url', 'image_large_url', 'meta_history', 'meta_concat_history',
+    'meta_infill', 'meta_error_type', 'meta_error_message', 'meta_configurations',
+]
+
+COLD_TABLE = 'json_data_cold'
+
+# The first byte of a stored value names its codec
+ZLIB_CODEC = b'z'
+ZSTD_CODEC = b's'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def compress_values(values):
+    """
+    Pack the non-null cold values of a song into compressed JSON, or None if all are null.
+    """
+    values = {column: value for column, value in values.items() if value is not None}
+    if not values:
+        return None
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    if zstandard is not None:
+        return ZSTD_CODEC + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return ZLIB_CODEC + zlib.compress(data, ZLIB_LEVEL)
+
+def decompress_values(blob):
+    """
+    Return the {column: value} dict stored by compress_values.
+    """
+    codec, data = blob[:1], blob[1:]
+    if codec == ZSTD_CODEC:
+        if zstandard is None:
+            raise RuntimeError("Install zstandard to read cold columns written with it")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+class ColdRecord(Mapping):
+    """
+    The cold columns of one song, decompressed on first access.
+    Missing columns read as None.
+    """
+
+    def __init__(self, blob):
+        self._blob = blob
+        self._values = None
+
+    def _decoded(self):
+        if self._values is None:
+            self._values = decompress_values(self._blob) if self._blob else {}
+        return self._values
+
+    def __getitem__(self, column):
+        if column not in COLD_COLUMNS:
+            raise KeyError(column)
+        return self._decoded().get(column)
+
+    def __iter__(self):
+        return iter(COLD_COLUMNS)
+
+    def __len__(self):
+        return len(COLD_COLUMNS)
+
+def create_cold_table(cursor):
+    """
+    Create the side table and the trigger removing the cold values of deleted songs.
+    """
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {COLD_TABLE} (
+            id TEXT PRIMARY KEY,
+            data BLOB
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS json_data_cold_delete
+        AFTER DELETE ON json_data BEGIN
+            DELETE FROM {COLD_TABLE} WHERE id = old.id;
+        END
+    ''')
+
+def is_split(cursor):
+    """
+    Return True if the cold columns live in the side table.
+    """
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (COLD_TABLE,)
+    ).fetchone() is not None
+
+def load_cold(conn, song_ids):
+    """
+    Return {song id: ColdRecord} for the given ids; songs without cold values get an empty record.
+    """
+    song_ids = list(song_ids)
+    records = {song_id: ColdRecord(None) for song_id in song_ids}
+    for i in range(0, len(song_ids), 500):
+        chunk = song_ids[i:i + 500]
+        rows = conn.execute(
+            f'SELECT id, data FROM {COLD_TABLE} WHERE id IN ({", ".join(["?"] * len(chunk))})', chunk
+        )
+        for song_id, blob in rows:
+            records[song_id] = ColdRecord(blob)
+    return records
+
+def register_cold_functions(conn):
+    """
+    Add cold_value(data, column) for reading a cold column in SQL, e.g.
+    SELECT cold_value(data, 'meta_history') FROM json_data_cold WHERE id = ?
+    """
+    def cold_value(blob, column):
+        value = decompress_values(blob).get(column) if blob else None
+        return json.dumps(value) if isinstance(value, (list, dict)) else value
+    conn.create_function('cold_value', 2, cold_value, deterministic=True)
+
+def migrate(conn):
+    """
+    Move the cold columns of an existing json_data into the side table and
+    drop them from json_data (rowids, indexes and triggers are kept); the
+    json_data_full view decodes them back.
+    Returns the number of songs with cold values, or None if already split.
+    """
+    cursor = conn.cursor()
+    if is_split(cursor):
+        return None
+
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(json_data)')]
+    present = [column for column in COLD_COLUMNS if column in columns]
+    conn.create_function('cold_pack', len(present),
+                         lambda *values: compress_values(dict(zip(present, values))))
+
+    # One transaction: an interrupted migration leaves the database unchanged
+    cursor.execute('BEGIN')
+    create_cold_table(cursor)
+    cursor.execute(f'''
+        INSERT INTO {COLD_TABLE} (id, data)
+        SELECT id, data FROM (SELECT id, cold_pack({", ".join(present)}) AS data FROM json_data)
+        WHERE data IS NOT NULL
+    ''')
+    moved = cursor.rowcount
+    for column in present:
+        cursor.execute(f'ALTER TABLE json_data DROP COLUMN {column}')
+    # json_data_full reads the moved columns from the side table from now on
+    # (imported here, dimensions.py imports this module)
+    from dimensions import create_compat_view
+    create_compat_view(cursor)
+    conn.commit()
+    return moved
+
+def main(db_path, vacuum=True):
+    """
+    Migrate a database to the cold side table and report the size change.
+    """
+    start_time = time.time()
+    size_before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path)
+    moved = migrate(conn)
+    if moved is None:
+        print("Cold columns already moved")
+    else:
+        print(f"Cold values of {moved} songs moved to {COLD_TABLE}")
+        if vacuum:
+            # Give the freed pages back to the file system
+            conn.execute('VACUUM')
+        analyze_and_check(conn)
+    conn.close()
+    size_after = os.path.getsize(db_path)
+    print(f"{db_path}: {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB "
+          f"in {time.time() - start_time:.2f} seconds")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move the bulky, rarely read json_data columns into a compressed side table.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--no-vacuum', action='store_true', help="skip the VACUUM that shrinks the file")
+    args = parser.parse_args()
+
+    main(args.db, not args.no_vacuum)
@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from change_log import CHANGE_TABLE, create_change_log, current_seq
+
+# json_data is split into one folder per model and prompt language (hive style,
+# e.g. model_name=chirp-v3-5/meta_prompt_lang=en/), so filters on them skip whole folders
+PARTITION_COLUMNS = ['model_name', 'meta_prompt_lang']
+
+# Derived tables, rewritten whole on every export
+DERIVED_TABLES = ['languages', 'models', 'creators', 'statuses', 'prompt_instructions', 'prompt_stats', 'prompt_stats_top']
+
+# Rows converted per record batch
+BATCH_SIZE = 50000
+
+# Change log sequence number of each exported row, used to keep the latest version of updated songs
+VERSION_COLUMN = 'change_seq'
+
+# True on the rows recording a deleted song (tombstones, only id and change_seq are set)
+DELETED_COLUMN = 'deleted'
+
+# Export progress, stored with the files so copying the folder keeps it
+STATE_FILE = '_export_state.json'
+
+# Declared SQLite column type -> Arrow type; other declarations become strings
+ARROW_TYPES = {
+    'INTEGER': pa.int64(),
+    'REAL': pa.float64(),
+    'BOOLEAN': pa.bool_(),
+    'TEXT': pa.string(),
+}
+
+# Formats: uncompressed Arrow IPC files can be memory-mapped, Parquet is smaller to store and share
+FORMATS = {'arrow': 'ipc', 'parquet': 'parquet'}
+EXTENSIONS = {'arrow': 'arrow', 'parquet': 'parquet'}
+
+def table_exists(cursor, name):
+    """
+    Return True if the database has a table or view with this name.
+    """
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (name,)
+    ).fetchone() is not None
+
+def arrow_schema(cursor, table):
+    """
+    Build the Arrow schema of a table from its declared column types.
+    """
+    fields = []
+    for row in cursor.execute(f'PRAGMA table_info({table})'):
+        name, declared = row[1], (row[2] or '').upper()
+        fields.append(pa.field(name, ARROW_TYPES.get(declared, pa.string())))
+    return pa.schema(fields)
+
+def to_int(value):
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return int(value)
+    return None
+
+def to_float(value):
+    return float(value) if isinstance(value, (int, float)) else None
+
+# Arrow type -> conversion of one SQLite value. SQLite does not enforce column types:
+# booleans are stored as 0/1, and values stored with another type become strings
+# in text columns and nulls in numeric ones instead of failing the export
+CONVERTERS = {
+    pa.bool_(): lambda value: None if value is None else bool(value),
+    pa.int64(): to_int,
+    pa.float64(): to_float,
+    pa.string(): lambda value: None if value is None else str(value),
+}
+
+def to_arrow_array(values, arrow_type):
+    """
+    Convert one column of SQLite values.
+    """
+    return pa.array([CONVERTERS[arrow_type](value) for value in values], type=arrow_type)
+
+def record_batches(cursor, query, params, schema):
+    """
+    Yield the query results as Arrow record batches of BATCH_SIZE rows.
+    """
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [to_arrow_array(list(values), field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+def read_state(out_dir):
+    """
+    Return the export state of a folder ({} before the first export).
+    """
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def write_state(out_dir, state):
+    """
+    Save the export state atomically.
+    """
+    temp_path = os.path.join(out_dir, STATE_FILE + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, os.path.join(out_dir, STATE_FILE))
+
+def export_songs(conn, out_dir, file_format, last_seq):
+    """
+    Append the json_data rows changed after last_seq in the change log (see
+    change_log.py) to the partitioned dataset in out_dir/json_data, or every row if
+    last_seq is None. Deleted songs are appended as tombstones. Returns
+    (rows, newest change sequence number exported).
+    """
+    cursor = conn.cursor()
+    song_schema = arrow_schema(cursor, 'json_data')
+    schema = song_schema.append(pa.field(VERSION_COLUMN, pa.int64())).append(pa.field(DELETED_COLUMN, pa.bool_()))
+
+    until_seq = current_seq(cursor)
+    if last_seq is None:
+        # Songs not changed since the log was created count as version 0
+        columns = ", ".join(f"j.{name}" for name in song_schema.names)
+        query = f'''
+            SELECT {columns}, COALESCE(c.seq, 0), 0
+            FROM json_data j
+            LEFT JOIN {CHANGE_TABLE} c ON c.song_id = j.id
+            WHERE COALESCE(c.seq, 0) <= ?
+        '''
+        params = (until_seq,)
+    else:
+        # Inserted, updated or deleted by any script (imports, extraction, local flags) since the last export
+        columns = ", ".join("c.song_id" if name == 'id' else f"j.{name}" for name in song_schema.names)
+        query = f'''
+            SELECT {columns}, c.seq, j.id IS NULL
+            FROM {CHANGE_TABLE} c
+            LEFT JOIN json_data j ON j.id = c.song_id
+            WHERE c.seq > ? AND c.seq <= ?
+        '''
+        params = (last_seq, until_seq)
+
+    rows = 0
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        counted(record_batches(cursor, query, params, schema)),
+        os.path.join(out_dir, 'json_data'),
+        schema=schema,
+        format=FORMATS[file_format],
+        partitioning=PARTITION_COLUMNS,
+        partitioning_flavor='hive',
+        # One new file per partition and export run, existing files are kept
+        basename_template=f"changes-{until_seq}-{int(time.time())}-{{i}}.{EXTENSIONS[file_format]}",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return rows, until_seq
+
+def export_table(conn, out_dir, table, file_format):
+    """
+    Rewrite one derived table as a single file, one record batch at a time.
+    Returns the row count, or None if it does not exist.
+    """
+    cursor = conn.cursor()
+    if not table_exists(cursor, table):
+        return None
+    schema = arrow_schema(cursor, table)
+    table_dir = os.path.join(out_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+
+    path = os.path.join(table_dir, f"{table}.{EXTENSIONS[file_format]}")
+    temp_path = path + '.tmp'
+    rows = 0
+    if file_format == 'arrow':
+        sink = pa.OSFile(temp_path, 'wb')
+        writer = pa.ipc.new_file(sink, schema)
+    else:
+        sink = None
+        writer = pq.ParquetWriter(temp_path, schema)
+    try:
+        for batch in record_batches(cursor, f'SELECT * FROM {table}', (), schema):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+    os.replace(temp_path, path)
+    return rows
+
+def export_all(db_path, out_dir, file_format='arrow', full=False):
+    """
+    Export the new and changed json_data rows and every derived table to out_dir.
+    json_data is exported whole again when its columns changed (e.g. after the
+    dimensions.py or cold_storage.py migration) or its changes were not logged.
+    """
+    state = read_state(out_dir)
+    if not full and state.get('format', file_format) != file_format:
+        raise ValueError(f"{out_dir} holds {state['format']} files, export to another folder or use --full")
+
+    # Start logging the changes of json_data; until then they are unknown
+    conn = sqlite3.connect(db_path)
+    new_log = create_change_log(conn.cursor())
+    conn.commit()
+    # The exported columns, so that a change of the export layout also exports everything again
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(json_data)')] + [VERSION_COLUMN, DELETED_COLUMN]
+    conn.close()
+
+    if not full and state and (new_log or state.get('columns') != columns or 'last_change_seq' not in state):
+        print("json_data: columns changed or changes not logged since the last export, exporting everything")
+        full = True
+    if full:
+        for table in ['json_data'] + DERIVED_TABLES:
+            shutil.rmtree(os.path.join(out_dir, table), ignore_errors=True)
+        state = {}
+    os.makedirs(out_dir, exist_ok=True)
+
+    # pyarrow pulls the record batches from its own thread
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False)
+    start_time = time.time()
+    rows, last_seq = export_songs(conn, out_dir, file_format, state.get('last_change_seq'))
+    print(f"json_data: {rows} rows appended (changes up to {last_seq}) "
+          f"in {time.time() - start_time:.2f} seconds")
+
+    for table in DERIVED_TABLES:
+        count = export_table(conn, out_dir, table, file_format)
+        if count is not None:
+            print(f"{table}: {count} rows")
+    conn.close()
+
+    write_state(out_dir, {
+        'format': file_format,
+        'last_change_seq': last_seq,
+        'columns': columns,
+        'exported_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+def open_dataset(out_dir, table='json_data'):
+    """
+    Open an exported table as a pyarrow dataset. Arrow files are memory-mapped,
+    so only the pages of the columns actually read are loaded.
+    """
+    file_format = read_state(out_dir).get('format', 'arrow')
+    path = os.path.join(out_dir, table)
+    return ds.dataset(
+        path,
+        format=FORMATS[file_format],
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        partitioning=ds.partitioning(
+            pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor='hive'
+        ) if table == 'json_data' else None,
+    )
+
+def load_table(out_dir, table='json_data', columns=None, filters=None, latest_only=True):
+    """
+    Load an exported table into a pandas DataFrame, reading only the given columns.
+    filters maps column names to a value or list of values, e.g. {'meta_prompt_lang': 'en'};
+    filters on the partition columns skip the other folders entirely.
+    For json_data, latest_only keeps only the latest version of each song exported
+    by several runs, and drops deleted songs.
+    """
+    dataset = open_dataset(out_dir, table)
+
+    expression = None
+    for column, value in (filters or {}).items():
+        condition = ds.field(column).isin(value) if isinstance(value, (list, tuple, set)) else ds.field(column) == value
+        expression = condition if expression is None else expression & condition
+
+    if not (latest_only and table == 'json_data'):
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    # The latest version of every song is found before filtering: a song whose
+    # language changed still has its old version in the old partition
+    versions = dataset.to_table(columns=['id', VERSION_COLUMN, DELETED_COLUMN]).to_pandas()
+    latest = versions.sort_values(VERSION_COLUMN).drop_duplicates('id', keep='last')
+    latest = latest.loc[~latest[DELETED_COLUMN].fillna(False).astype(bool), ['id', VERSION_COLUMN]]
+
+    read_columns = columns
+    if columns is not None:
+        read_columns = list(dict.fromkeys(list(columns) + ['id', VERSION_COLUMN]))
+    frame = dataset.to_table(columns=read_columns, filter=expression).to_pandas()
+    frame = frame.merge(latest, on=['id', VERSION_COLUMN])
+    if columns is not None:
+        frame = frame[list(columns)]
+    return frame
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export json_data and the derived tables to Arrow or Parquet files.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--out', default='export', help="output folder")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='arrow',
+                        help="arrow (memory-mappable, default) or parquet (compressed)")
+    parser.add_argument('--full', action='store_true', help="rewrite json_data instead of appending the changed songs")
+    args = parser.parse_args()
+
+    export_all(args.db, args.out, args.format, args.full)
@@ -0,0 +1,186 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+from prompt_structure import common_tags_query, sequence_query
+from serving_queries import FLASK_PAGE_SIZE, GRADIO_PAGE_SIZE, LANGUAGE_COUNTS, LIST_COLUMNS, MODEL_COUNTS, SONG_COLUMNS
+from serving_queries import play_count_queries, song_filters
+
+# (index name, columns, partial index condition) for the serving queries.
+# Every filter combination of the gradio search gets an index whose trailing
+# (play_count, id) columns return rows already in ORDER BY play_count DESC order,
+# and whose leading columns also cover the language/model counts. The local-only
+# variants are partial indexes holding just the songs with local audio.
+SERVING_INDEXES = [
+    ('idx_json_data_play_count', 'play_count, id', None),
+    ('idx_json_data_lang_play_count', 'meta_prompt_lang, play_count, id', None),
+    ('idx_json_data_model_play_count', 'model_name, play_count, id', None),
+    ('idx_json_data_lang_model_play_count', 'meta_prompt_lang, model_name, play_count, id', None),
+    ('idx_json_data_local_play_count', 'play_count, id', 'local_audio = 1'),
+    ('idx_json_data_local_lang_play_count', 'meta_prompt_lang, play_count, id', 'local_audio = 1'),
+    ('idx_json_data_local_model_play_count', 'model_name, play_count, id', 'local_audio = 1'),
+    ('idx_json_data_local_lang_model_play_count', 'meta_prompt_lang, model_name, play_count, id', 'local_audio = 1'),
+]
+
+def page_query(columns, page_size, after=None, part=0, **filters):
+    """
+    Return the (sql, params) of one part of an app's play count page query, as
+    serving_queries builds it, with the row limit of a full page.
+    """
+    clause, params = song_filters(**filters)
+    sql, params = play_count_queries(columns, clause, params, after)[part]
+    return sql, params + [page_size + 1]
+
+# (name, (SQL, parameters), allow_index_scan, allow_temp_sort) for the queries the apps run,
+# built by the same functions as the apps. allow_index_scan accepts an ordered walk over an
+# index (stopped early by LIMIT, or reading only the index); allow_temp_sort is for orders
+# no index can provide.
+CANONICAL_QUERIES = [
+    ('gradio: top songs',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE), True, False),
+    ('gradio: language filter',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, language='en'), False, False),
+    ('gradio: model filter',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, model='chirp-v3-5'), False, False),
+    ('gradio: language and model filter',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, language='en', model='chirp-v3-5'), False, False),
+    ('gradio: local content',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, local_only=True), True, False),
+    ('gradio: language, model and local content',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, language='en', model='chirp-v3-5', local_only=True), False, False),
+    ('gradio: next page with language filter',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, after=(100, 'x'), language='en'), False, False),
+    ('gradio: full text search with language filter',
+     page_query(SONG_COLUMNS, GRADIO_PAGE_SIZE, match_query='"love"', language='en'), False, True),
+    ('flask: first page',
+     page_query(LIST_COLUMNS, FLASK_PAGE_SIZE), True, False),
+    ('flask: next page with language filter',
+     page_query(LIST_COLUMNS, FLASK_PAGE_SIZE, after=(100, 'x'), language='en'), False, False),
+    ('flask: songs without play count after a full first part',
+     page_query(LIST_COLUMNS, FLASK_PAGE_SIZE, part=1, language='en'), False, False),
+    ('flask: next page of songs without play count',
+     page_query(LIST_COLUMNS, FLASK_PAGE_SIZE, after=(None, 'x')), False, False),
+    ('update_db: language counts',
+     (LANGUAGE_COUNTS, []), True, False),
+    ('update_db: model counts',
+     (MODEL_COUNTS, []), True, False),
+    ('prompt_structure: common tags for a language and model version',
+     common_tags_query('en', 'v3.5'), False, True),
+    ('prompt_structure: songs with a tag sequence',
+     sequence_query(['chorus', 'bridge']), False, False),
+]
+
+# Tables and columns built by other pipeline steps; queries on them are skipped until
+# they exist (local_audio and local_image come from update_db.py, template_hash from
+# update_db_interesting_prompts.py). Any other missing table or column is an error.
+OPTIONAL_TABLES = ['json_data_fts', 'prompt_instructions']
+OPTIONAL_COLUMNS = ['local_audio', 'local_image', 'template_hash']
+
+def is_optional(error):
+    """
+    Return True if an SQLite error only says that an optional table or column is missing.
+    """
+    message = str(error)
+    if message.startswith('no such table: '):
+        return message[len('no such table: '):] in OPTIONAL_TABLES
+    if message.startswith('no such column: '):
+        # e.g. "no such column: j.template_hash"
+        return message[len('no such column: '):].rpartition('.')[2] in OPTIONAL_COLUMNS
+    return False
+
+def create_serving_indexes(conn):
+    """
+    Create the serving indexes. Follow with analyze_and_check.
+    """
+    cursor = conn.cursor()
+    for name, columns, where in SERVING_INDEXES:
+        condition = f" WHERE {where}" if where else ""
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON json_data ({columns}){condition}')
+    conn.commit()
+
+def plan_problems(plan, allow_index_scan, allow_temp_sort):
+    """
+    Return the lines of an EXPLAIN QUERY PLAN result that count as a regression.
+    """
+    problems = []
+    for row in plan:
+        detail = row[-1]
+        if detail.startswith('SCAN') and 'VIRTUAL TABLE' not in detail:
+            if 'INDEX' not in detail or not allow_index_scan:
+                problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE FOR ORDER BY') and not allow_temp_sort:
+            problems.append(detail)
+    return problems
+
+def check_query_plans(conn):
+    """
+    Run EXPLAIN QUERY PLAN on every canonical query.
+    Returns (failures, skipped): (name, problem lines) for the queries that regressed
+    to a scan or a sort, and (name, error) for those whose optional tables or columns are
+    not built yet; other errors (e.g. a renamed column) are raised.
+    """
+    failures = []
+    skipped = []
+    for name, (sql, params), allow_index_scan, allow_temp_sort in CANONICAL_QUERIES:
+        try:
+            plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+        except sqlite3.OperationalError as e:
+            if not is_optional(e):
+                raise
+            skipped.append((name, str(e)))
+            continue
+        problems = plan_problems(plan, allow_index_scan, allow_temp_sort)
+        if problems:
+            failures.append((name, problems))
+    return failures, skipped
+
+def print_report(failures, skipped):
+    """
+    Print the skipped and regressed queries and the number of plans that passed.
+    """
+    for name, error in skipped:
+        print(f"SKIP {name}: {error}")
+    for name, problems in failures:
+        print(f"FAIL {name}: {'; '.join(problems)}")
+    checked = len(CANONICAL_QUERIES) - len(skipped)
+    print(f"{checked - len(failures)} of {checked} query plans OK")
+
+def analyze_and_check(conn):
+    """
+    Refresh the planner statistics and check the canonical query plans.
+    Every script that adds indexes or rebuilds json_data ends with this, since a new
+    index without fresh statistics can change the plans. Returns the failures.
+    """
+    conn.execute('ANALYZE')
+    conn.commit()
+    failures, skipped = check_query_plans(conn)
+    print_report(failures, skipped)
+    return failures
+
+def main(db_path, check_only=False):
+    """
+    Create the serving indexes (unless check_only) and verify the query plans.
+    Exits with status 1 if any canonical query regressed.
+    """
+    conn = sqlite3.connect(db_path)
+    if check_only:
+        failures, skipped = check_query_plans(conn)
+        print_report(failures, skipped)
+    else:
+        start_time = time.time()
+        create_serving_indexes(conn)
+        print(f"Serving indexes ready in {time.time() - start_time:.2f} seconds")
+        failures = analyze_and_check(conn)
+    conn.close()
+
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create the serving indexes and check the app query plans.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--check-only', action='store_true', help="only check the query plans")
+    args = parser.parse_args()
+
+    main(args.db, args.check_only)
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+
+from cold_storage import register_cold_functions
+from metrics import TracedConnection
+
+# Memory-map up to 1GB of the database file, so reads skip the page cache copy
+DEFAULT_MMAP_SIZE = 1 << 30
+
+# Page cache per connection, in KiB (negative values are KiB for SQLite)
+DEFAULT_CACHE_SIZE = -65536
+
+# Compiled statements kept per connection; the apps run a few dozen distinct queries
+CACHED_STATEMENTS = 256
+
+# One pool per database path, shared by every module of the process
+_pools = {}
+_pools_lock = threading.Lock()
+
+def enable_wal(db_path):
+    """
+    Switch the database to WAL mode so readers never block on a writer
+    (e.g. media_inventory.py --watch). Needs write access once; the setting persists.
+    Raises FileNotFoundError if the database does not exist, instead of creating an empty one.
+    """
+    if not os.path.isfile(db_path):
+        raise FileNotFoundError(f"Database not found: {os.path.abspath(db_path)}")
+    try:
+        conn = sqlite3.connect(f'file:{db_path}?mode=rw', uri=True)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.close()
+    except sqlite3.OperationalError:
+        pass  # Read-only file system, keep the current journal mode
+
+class ReadOnlyPool:
+    """
+    Per-thread, read-only SQLite connections tuned for serving.
+    Each thread keeps its connection (and its compiled statements and warm
+    page cache) for the life of the process, so requests pay no setup cost.
+    """
+
+    def __init__(self, db_path, mmap_size=DEFAULT_MMAP_SIZE, cache_size=DEFAULT_CACHE_SIZE,
+                 row_factory=sqlite3.Row, on_connect=None):
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.row_factory = row_factory
+        self.on_connect = on_connect
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+
+    def connect(self, row_factory=None):
+        """
+        Open a new tuned read-only connection, e.g. as an SQLAlchemy creator.
+        The caller owns it; most code should use connection() instead.
+        Its queries are recorded in the metrics (see metrics.py).
+        """
+        conn = sqlite3.connect(
+            f'file:{self.db_path}?mode=ro', uri=True, factory=TracedConnection,
+            check_same_thread=False, cached_statements=CACHED_STATEMENTS
+        )
+        conn.row_factory = row_factory
+        conn.execute('PRAGMA query_only = ON')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size = {int(self.cache_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        # json_data_full decodes the cold columns with cold_value()
+        register_cold_functions(conn)
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+
+    def connection(self):
+        """
+        Return this thread's connection, opening it on first use. Do not close it.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.connect(self.row_factory)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def data_version(self):
+        """
+        Return PRAGMA data_version of one long-lived connection. The value changes
+        whenever another connection commits, so caches compare it to detect new data.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = self.connect()
+            # A plain cursor: these polls run on every request and would crowd the query metrics
+            return sqlite3.Cursor(self._version_conn).execute('PRAGMA data_version').fetchone()[0]
+
+    def close_all(self):
+        """
+        Close every connection handed out by connection().
+        """
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+
+def get_pool(db_path, on_connect=None):
+    """
+    Return the shared pool for db_path, creating it (and enabling WAL) on first use.
+    on_connect is called with every new connection, e.g. to register SQL functions.
+    """
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            enable_wal(db_path)
+            pool = _pools[db_path] = ReadOnlyPool(db_path, on_connect=on_connect)
+        return pool
@@ -0,0 +1,227 @@
+import argparse
+import os
+import sqlite3
+import time
+
+from cold_storage import COLD_COLUMNS, COLD_TABLE, is_split
+from db_indexes import analyze_and_check
+
+# Dimension table -> (integer key stored on json_data, columns moved off json_data).
+# A creator row holds one combination of the creator columns, so a renamed
+# handle simply gets a new key.
+DIMENSIONS = {
+    'creators': ('creator_id', ['user_id', 'handle', 'display_name', 'avatar_image_url']),
+    'statuses': ('status_id', ['status']),
+}
+
+# View with the original columns decoded back (dimension and cold columns), for queries that need them
+COMPAT_VIEW = 'json_data_full'
+
+# Columns replaced by a key on json_data
+ENCODED_COLUMNS = {column for _, attributes in DIMENSIONS.values() for column in attributes}
+
+def table_columns(cursor, table):
+    """
+    Return the column names of a table, in order.
+    """
+    return [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+
+def is_encoded(cursor):
+    """
+    Return True if json_data stores dimension keys instead of the original columns.
+    """
+    return all(key in table_columns(cursor, 'json_data') for key, _ in DIMENSIONS.values())
+
+def fact_columns(columns):
+    """
+    Map the original json_data columns to the encoded layout: each dimension's
+    first column is replaced by its key and the other ones are dropped.
+    """
+    keys = {attributes[0]: key for key, attributes in DIMENSIONS.values()}
+    return [keys.get(column, column) for column in columns if column in keys or column not in ENCODED_COLUMNS]
+
+def create_dimension_tables(cursor):
+    """
+    Create the dimension tables. Follow with create_compat_view.
+    """
+    for table, (key, attributes) in DIMENSIONS.items():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} INTEGER PRIMARY KEY,
+                {", ".join(f"{column} TEXT" for column in attributes)}
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_values
+            ON {table} ({", ".join(attributes)})
+        ''')
+
+def create_compat_view(cursor):
+    """
+    (Re)create json_data_full: every json_data column plus the decoded dimension
+    columns and, once they live in the side table, the cold columns. j.* is
+    expanded when the view is used, so columns added to json_data later show up
+    too. Reading the cold columns needs cold_storage.register_cold_functions on
+    the connection.
+    """
+    joins = []
+    decoded = []
+    if is_encoded(cursor):
+        for table, (key, attributes) in DIMENSIONS.items():
+            joins.append(f"LEFT JOIN {table} ON {table}.{key} = j.{key}")
+            decoded.extend(f"{table}.{column}" for column in attributes)
+    if is_split(cursor):
+        joins.append(f"LEFT JOIN {COLD_TABLE} cold ON cold.id = j.id")
+        decoded.extend(f"cold_value(cold.data, '{column}') AS {column}" for column in COLD_COLUMNS)
+    cursor.execute(f'DROP VIEW IF EXISTS {COMPAT_VIEW}')
+    cursor.execute(f'''
+        CREATE VIEW {COMPAT_VIEW} AS
+        SELECT {", ".join(["j.*"] + decoded)}
+        FROM json_data j
+        {" ".join(joins)}
+    ''')
+
+class DimensionEncoder:
+    """
+    Interns the dimension columns of flattened rows into integer keys.
+    Known keys are loaded once and cached in memory; new values are inserted
+    into their dimension table on first sight.
+    """
+
+    def __init__(self, conn, columns):
+        self.conn = conn
+        self.kept = [i for i, column in enumerate(columns) if column not in ENCODED_COLUMNS]
+        self.dimensions = []
+        for table, (key, attributes) in DIMENSIONS.items():
+            positions = [columns.index(column) for column in attributes]
+            keys = {tuple(row[1:]): row[0] for row in conn.execute(
+                f'SELECT {key}, {", ".join(attributes)} FROM {table}'
+            )}
+            insert_sql = (f'INSERT INTO {table} ({", ".join(attributes)}) '
+                          f'VALUES ({", ".join(["?"] * len(attributes))})')
+            self.dimensions.append((columns.index(attributes[0]), positions, keys, insert_sql))
+        self.key_positions = {first: i for i, (first, _, _, _) in enumerate(self.dimensions)}
+
+    def key(self, dimension, row):
+        """
+        Return the key of a row's values in one dimension (None if they are all null).
+        """
+        _, positions, keys, insert_sql = self.dimensions[dimension]
+        values = tuple(row[i] for i in positions)
+        key = keys.get(values)
+        if key is None and any(value is not None for value in values):
+            key = keys[values] = self.conn.execute(insert_sql, values).lastrowid
+        return key
+
+    def encode(self, row):
+        """
+        Return the row in fact_columns order.
+        """
+        encoded = []
+        for i in sorted(self.kept + list(self.key_positions)):
+            if i in self.key_positions:
+                encoded.append(self.key(self.key_positions[i], row))
+            else:
+                encoded.append(row[i])
+        return tuple(encoded)
+
+def saved_schema(cursor, table):
+    """
+    Return the CREATE statements of the indexes and triggers of a table.
+    """
+    return [row[0] for row in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,)
+    )]
+
+def migrate(conn):
+    """
+    Rebuild an existing json_data in the encoded layout. Rowids are kept, so the
+    full text index stays valid, and the indexes and triggers of json_data are
+    recreated. Returns False if the table was already encoded.
+    """
+    cursor = conn.cursor()
+    if is_encoded(cursor):
+        return False
+
+    declared = {row[1]: row[2] for row in cursor.execute('PRAGMA table_info(json_data)')}
+    columns = table_columns(cursor, 'json_data')
+    schema = saved_schema(cursor, 'json_data')
+    # One transaction: an interrupted migration leaves the database unchanged
+    cursor.execute('BEGIN')
+    create_dimension_tables(cursor)
+    cursor.execute(f'DROP VIEW IF EXISTS {COMPAT_VIEW}')
+
+    # Intern every distinct combination
+    for table, (key, attributes) in DIMENSIONS.items():
+        column_list = ", ".join(attributes)
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {table} ({column_list})
+            SELECT DISTINCT {column_list} FROM json_data
+            WHERE NOT ({" AND ".join(f"{column} IS NULL" for column in attributes)})
+        ''')
+
+    # Copy the rows with their keys, looked up through the unique value indexes
+    lookups = {}
+    for table, (key, attributes) in DIMENSIONS.items():
+        match = " AND ".join(f"d.{column} IS j.{column}" for column in attributes)
+        lookups[key] = f"(SELECT d.{key} FROM {table} d WHERE {match})"
+    new_columns = fact_columns(columns)
+    definitions = ", ".join(
+        f"{column} {'INTEGER' if column in lookups else declared[column]}"
+        + (" PRIMARY KEY" if column == 'id' else "")
+        for column in new_columns
+    )
+    cursor.execute('DROP TABLE IF EXISTS json_data_encoded')
+    cursor.execute(f'CREATE TABLE json_data_encoded ({definitions})')
+    cursor.execute(f'''
+        INSERT INTO json_data_encoded (rowid, {", ".join(new_columns)})
+        SELECT j.rowid, {", ".join(lookups.get(column, f"j.{column}") for column in new_columns)}
+        FROM json_data j
+    ''')
+
+    cursor.execute('DROP TABLE json_data')
+    # Views and triggers elsewhere may name json_data, which does not exist during the rename
+    cursor.execute('PRAGMA legacy_alter_table = ON')
+    cursor.execute('ALTER TABLE json_data_encoded RENAME TO json_data')
+    cursor.execute('PRAGMA legacy_alter_table = OFF')
+    for sql in schema:
+        try:
+            cursor.execute(sql)
+        except sqlite3.OperationalError as e:
+            # Indexes and triggers on the moved columns cannot be recreated
+            print(f"Skipped {sql.split('(')[0].strip()}: {e}")
+    create_compat_view(cursor)
+    conn.commit()
+    return True
+
+def main(db_path, vacuum=True):
+    """
+    Migrate a database to dimension keys and report the size change.
+    """
+    start_time = time.time()
+    size_before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path)
+    if not migrate(conn):
+        print("json_data already uses dimension keys")
+    else:
+        for table in DIMENSIONS:
+            count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            print(f"{table}: {count} rows")
+        if vacuum:
+            # Give the freed pages back to the file system
+            conn.execute('VACUUM')
+        # json_data was rebuilt, so its statistics are gone
+        analyze_and_check(conn)
+    conn.close()
+    size_after = os.path.getsize(db_path)
+    print(f"{db_path}: {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB "
+          f"in {time.time() - start_time:.2f} seconds")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move the repeated creator and status columns of json_data into dimension tables.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--no-vacuum', action='store_true', help="skip the VACUUM that shrinks the file")
+    args = parser.parse_args()
+
+    main(args.db, not args.no_vacuum)
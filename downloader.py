@@ -0,0 +1,257 @@
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Concurrent downloads overall and per host
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 4
+
+# Attempts after the first one, and the first backoff delay in seconds (doubled each retry)
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+
+# Longest wait between attempts in seconds, also for a server's Retry-After
+DEFAULT_MAX_BACKOFF = 60
+
+DEFAULT_TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+
+# Partial downloads are kept next to the target until complete, then renamed
+PART_SUFFIX = '.part'
+
+# Next to a partial download: the ETag or Last-Modified of the response it came from
+VALIDATOR_SUFFIX = '.part.validator'
+
+# Responses worth another attempt
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# status is 'exists', 'downloaded' or 'failed'; size is in bytes
+DownloadResult = namedtuple('DownloadResult', ['url', 'path', 'status', 'size', 'error'])
+
+class RetryableError(Exception):
+    """
+    A failed attempt that may succeed when retried (resuming from the partial file).
+    retry_after is the delay in seconds the server asked for, if any.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """
+    Token bucket shared by all threads: at most rate requests per second on average,
+    with bursts of up to burst requests.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Block until a request may be made.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+def content_range_total(response):
+    """
+    Return the total size from a "Content-Range: bytes a-b/total" header, or None.
+    """
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+def range_validator(response):
+    """
+    Return the strong ETag of a response, or else its Last-Modified date, to send
+    as If-Range when resuming (None if it has neither). Weak ETags are not allowed there.
+    """
+    etag = response.headers.get('ETag', '')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+def read_validator(path):
+    """
+    Return the validator saved at path, or None.
+    """
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def remove_file(path):
+    """
+    Remove a file if it exists.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class Downloader:
+    """
+    Download many files concurrently over pooled keep-alive sessions.
+    Each file is written to <path>.part, resumed with an HTTP Range request after
+    an interruption (with If-Range, so a file changed on the server is downloaded
+    again from the start), checked against the announced length and renamed into
+    place, so a file at <path> is always complete.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, verify_length=True, rate=None,
+                 max_backoff=DEFAULT_MAX_BACKOFF):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.verify_length = verify_length
+        # Optional global limit in requests per second, retries included
+        self.limiter = RateLimiter(rate) if rate else None
+        self._local = threading.local()
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def session(self):
+        """
+        Return this thread's session, keeping up to per_host connections alive per host.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.per_host)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        return session
+
+    def host_slot(self, url):
+        """
+        Return the semaphore limiting concurrent requests to the host of url.
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def fetch_once(self, url, path):
+        """
+        Make one attempt at completing path from url, resuming its .part file.
+        Returns the final size in bytes.
+        """
+        part_path = path + PART_SUFFIX
+        validator_path = path + VALIDATOR_SUFFIX
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validator = read_validator(validator_path)
+        # Ask for the raw bytes, so lengths match what is written to disk
+        headers = {'Accept-Encoding': 'identity'}
+        # Resume only a partial file whose version is known: if the file changed
+        # since, If-Range makes the server answer 200 with all of it
+        if offset and validator:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator
+
+        with self.session().get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # The partial file already holds everything, or is not a prefix of this file
+                if content_range_total(response) == offset:
+                    os.replace(part_path, path)
+                    remove_file(validator_path)
+                    return offset
+                os.remove(part_path)
+                remove_file(validator_path)
+                raise RetryableError("Stale partial download discarded")
+            if response.status_code in RETRY_STATUSES:
+                # fetch waits after giving back the host slot
+                retry_after = response.headers.get('Retry-After', '')
+                raise RetryableError(f"HTTP {response.status_code}",
+                                     int(retry_after) if retry_after.isdigit() else None)
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                mode = 'ab'
+                expected = content_range_total(response)
+            else:
+                # A new download, the file changed or the server ignored the range: start over
+                mode = 'wb'
+                length = response.headers.get('Content-Length', '')
+                expected = int(length) if length.isdigit() else None
+                validator = range_validator(response)
+                if validator:
+                    with open(validator_path, 'w') as f:
+                        f.write(validator)
+                else:
+                    remove_file(validator_path)
+
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+
+        size = os.path.getsize(part_path)
+        if self.verify_length and expected is not None and size != expected:
+            raise RetryableError(f"Incomplete download: {size} of {expected} bytes")
+        os.replace(part_path, path)
+        remove_file(validator_path)
+        return size
+
+    def fetch(self, url, path):
+        """
+        Download url to path unless it already exists, retrying with exponential
+        backoff and jitter, waiting at most max_backoff seconds (a longer Retry-After
+        is cut short, so the next attempt usually fails too and counts against the
+        retries). Never raises; failures are reported in the result.
+        """
+        if os.path.exists(path):
+            return DownloadResult(url, path, 'exists', os.path.getsize(path), None)
+
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # Waiting outside the host slot lets other downloads from the host use it
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                delay = max(delay, getattr(error, 'retry_after', None) or 0)
+                time.sleep(min(delay, self.max_backoff))
+            if self.limiter:
+                self.limiter.wait()
+            try:
+                with self.host_slot(url):
+                    size = self.fetch_once(url, path)
+                return DownloadResult(url, path, 'downloaded', size, None)
+            except (RetryableError, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                error = e
+            except (requests.RequestException, OSError) as e:
+                return DownloadResult(url, path, 'failed', 0, e)
+        return DownloadResult(url, path, 'failed', 0, error)
+
+    def download_all(self, jobs):
+        """
+        Download (url, path) pairs concurrently, yielding a DownloadResult as each finishes.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.fetch, url, path) for url, path in jobs if url]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+from collections import namedtuple
+
+# One filter option: the value stored in json_data, its display name and its song count
+Facet = namedtuple('Facet', ['value', 'name', 'count'])
+
+def load_facets(conn):
+    """
+    Read the language and model options from the count tables built by update_db.py,
+    most common first. Falls back to grouping json_data (through the serving
+    indexes) for databases where update_db.py has not been run yet.
+    """
+    try:
+        languages = conn.execute('''
+            SELECT language_code, COALESCE(language, language_code), count
+            FROM languages ORDER BY count DESC, language_code
+        ''').fetchall()
+        models = conn.execute('''
+            SELECT model_name, model_name, count
+            FROM models ORDER BY count DESC, model_name
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        languages = conn.execute('''
+            SELECT meta_prompt_lang, meta_prompt_lang, COUNT(*) AS count
+            FROM json_data WHERE meta_prompt_lang IS NOT NULL
+            GROUP BY meta_prompt_lang ORDER BY count DESC, meta_prompt_lang
+        ''').fetchall()
+        models = conn.execute('''
+            SELECT model_name, model_name, COUNT(*) AS count
+            FROM json_data WHERE model_name IS NOT NULL
+            GROUP BY model_name ORDER BY count DESC, model_name
+        ''').fetchall()
+    return {
+        'languages': [Facet(*row) for row in languages],
+        'models': [Facet(*row) for row in models],
+    }
+
+class FacetCache:
+    """
+    Language and model options kept in memory and reloaded only when the
+    database's data_version changes, i.e. after update_db.py or an import committed.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._facets = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return {'languages': [Facet, ...], 'models': [Facet, ...]}.
+        """
+        version = self.pool.data_version()
+        with self._lock:
+            if self._facets is None or version != self._version:
+                self._facets = load_facets(self.pool.connection())
+                self._version = version
+            return self._facets
+
+def facet_label(facet):
+    """
+    Dropdown label of an option, e.g. "English (12345)".
+    """
+    return f"{facet.name} ({facet.count})"
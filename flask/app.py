@@ -1,11 +1,40 @@
-from flask import Flask, render_template, request
+from flask import Flask, request, stream_template
 from flask_sqlalchemy import SQLAlchemy
 import sqlite3
+import os
+import sys
 
-app = Flask(__name__)
+# Shared modules live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db_pool import get_pool
+from facets import FacetCache
+from metrics import instrument_flask
+from prompt_analytics import STAT_COLUMNS, get_stats
+from search_cache import SearchCache
+from search_index import to_match_query
+from serving_queries import FLASK_PAGE_SIZE, LIST_COLUMNS, play_count_queries, read_in_order, song_filters
 
-# Configure the SQLite database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///suno.db'
+app = Flask(__name__, template_folder='template')
+
+# Request latency histograms and query metrics, served at /metrics
+instrument_flask(app, 'flask')
+
+# Number of songs rendered per page
+app.config['SONGS_PER_PAGE'] = int(os.environ.get('SONGS_PER_PAGE', FLASK_PAGE_SIZE))
+
+# Configure the SQLite database, shared with the gradio app
+DB_PATH = '../suno.db'
+read_pool = get_pool(DB_PATH)
+
+# SQLAlchemy pools tuned read-only connections from db_pool instead of opening its own
+app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(DB_PATH)}'
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'creator': read_pool.connect}
+
+# Dropdown options, reloaded only when the database changes
+facet_cache = FacetCache(read_pool)
+
+# Recently rendered result pages, dropped when the database changes
+search_cache = SearchCache(read_pool)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
@@ -35,7 +64,7 @@ class Model(db.Model):
 
 # Create the tables if they don't exist
 def initialize_db():
-    with sqlite3.connect('../suno.db') as conn:
+    with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
         # Create languages table if not exists
         cursor.execute('''
@@ -59,42 +88,102 @@ def setup():
     """Ensure tables are initialized before the first request."""
     initialize_db()
 
+def parse_cursor(after):
+    """Split an "<play_count>:<id>" page cursor; an empty play_count stands for NULL."""
+    play_count, _, song_id = after.partition(':')
+    return (int(play_count) if play_count else None), song_id
+
+def page_rows(filters, after, limit):
+    """
+    Yield up to limit matching songs in (play_count DESC, id DESC) order, after the cursor.
+    filters is the (FROM/WHERE clause, parameters) of serving_queries.song_filters;
+    the SQL is the one the gradio app runs and db_indexes.py checks.
+    The queries run here, while the response streams, so they use the
+    session of the streaming context rather than one already torn down.
+    """
+    clause, params = filters
+    queries = play_count_queries(LIST_COLUMNS, clause, params, parse_cursor(after) if after else None)
+    def execute(sql, sql_params):
+        return db.session.connection().exec_driver_sql(sql, tuple(sql_params))
+    yield from read_in_order(execute, queries, limit)
+
+def cached_page_rows(key, filters, after, limit):
+    """
+    Yield the rows of a result page from the search cache, or from page_rows while
+    storing them for the next request. Pages are only cached once fully streamed.
+    """
+    found, rows, version = search_cache.get(key)
+    if found:
+        yield from rows
+        return
+
+    rows = []
+    for row in page_rows(filters, after, limit):
+        rows.append(row)
+        yield row
+    search_cache.put(key, rows, version)
+
 # Route for the index page with search functionality
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    search_query = request.form.get('search_query', '')
-    selected_language = request.form.get('language', '')
-    selected_model = request.form.get('model', '')
-
-    # Query for languages and models to populate the dropdowns
-    languages = Language.query.all()
-    models = Model.query.all()
-
-    # Build the query dynamically based on filters
-    query = Song.query
-    if search_query:
-        query = query.filter(
-            (Song.title.ilike(f'%{search_query}%')) |
-            (Song.meta_prompt.ilike(f'%{search_query}%'))
-        )
-    if selected_language:
-        query = query.filter(Song.meta_prompt_lang == selected_language)
-    if selected_model:
-        query = query.filter(Song.model_name == selected_model)
-
-    # Execute the query and fetch results
-    songs = query.all()
-
-    return render_template(
+    search_query = request.values.get('search_query', '')
+    selected_language = request.values.get('language', '')
+    selected_model = request.values.get('model', '')
+    after = request.values.get('after', '')
+    page_size = app.config['SONGS_PER_PAGE']
+
+    # Languages and models with their song counts to populate the dropdowns
+    facets = facet_cache.get()
+
+    # Build the filters dynamically, only the displayed columns are loaded;
+    # title, lyrics and tags are matched through the full text index
+    match_query = to_match_query(search_query)
+    filters = song_filters(match_query, selected_language or None, selected_model or None)
+
+    # Keyset pagination: continue after the last song of the previous page
+    try:
+        parse_cursor(after)
+    except ValueError:
+        return {"error": "Invalid page cursor"}, 400
+
+    # One extra row tells the template whether there is a next page
+    key = (match_query, selected_language, selected_model, after, page_size + 1)
+    songs = cached_page_rows(key, filters, after, page_size + 1)
+
+    # Rows are fetched while the page streams out, so the header renders right away
+    return stream_template(
         'index.html',
         songs=songs,
-        languages=languages,
-        models=models,
+        page_size=page_size,
+        languages=facets['languages'],
+        models=facets['models'],
         search_query=search_query,
         selected_language=selected_language,
         selected_model=selected_model
     )
 
+# JSON summaries of prompt performance by template, language, model, tag, ...
+@app.route('/stats/<dimension>')
+def stats(dimension):
+    order_by = request.args.get('order_by', 'mean_play_count')
+    min_songs = request.args.get('min_songs', 1, type=int)
+    limit = request.args.get('limit', 50, type=int)
+
+    try:
+        rows = get_stats(read_pool.connection(), dimension, order_by, min_songs, limit)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except sqlite3.OperationalError:
+        return {"error": "Prompt statistics not built, run prompt_analytics.py"}, 404
+
+    fields = ["value"] + STAT_COLUMNS + ["example"]
+    return {"dimension": dimension, "stats": [dict(zip(fields, row)) for row in rows]}
+
+# Hit, miss and eviction counters of the search cache
+@app.route('/search-cache')
+def search_cache_stats():
+    return search_cache.stats()
+
 # Run the Flask app
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,7 +1,12 @@
-import sqlite3
+import argparse
 import sys
 import os
-import requests
+
+# Shared modules live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db_pool import get_pool
+from downloader import DEFAULT_PER_HOST, DEFAULT_RETRIES, DEFAULT_WORKERS, Downloader
+from search_index import to_match_query
 
 # Constants
 DB_PATH = '../suno.db'  # Adjust the path to your SQLite database
@@ -9,10 +14,8 @@ DOWNLOAD_FOLDER = "./downloads"
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)  # Ensure download folder exists
 
 def get_db_connection():
-    """Connect to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Get rows as dictionaries
-    return conn
+    """Return the shared read-only connection to the SQLite database (rows as dictionaries)."""
+    return get_pool(DB_PATH).connection()
 
 def fetch_songs(search_query, limit):
     """Query the database for songs matching the search query."""
@@ -21,12 +24,18 @@ def fetch_songs(search_query, limit):
     query = """
         SELECT id, title, audio_url, image_url, local_audio, local_image
         FROM json_data
-        WHERE title LIKE ? OR meta_prompt LIKE ? ORDER BY RANDOM()
-        LIMIT ?
     """
-    params = [f'%{search_query}%', f'%{search_query}%', limit]
+    params = []
+
+    # Match title, lyrics and tags through the full text index
+    match_query = to_match_query(search_query)
+    if match_query:
+        query += " WHERE rowid IN (SELECT rowid FROM json_data_fts WHERE json_data_fts MATCH ?)"
+        params.append(match_query)
+
+    query += " ORDER BY RANDOM() LIMIT ?"
+    params.append(limit)
     songs = conn.execute(query, params).fetchall()
-    conn.close()
 
     return songs
 
@@ -41,55 +50,33 @@ def human_readable_size(size_in_bytes):
     else:
         return f"{size_in_bytes / (1024**3):.2f} GB"
 
-def download_file(url, filename):
-    """Download a file from a given URL if it doesn't already exist."""
-    file_path = os.path.join(DOWNLOAD_FOLDER, filename)
-
-    # Check if file already exists
-    if os.path.exists(file_path):
-        print(f"File exists: {filename}")
-        return None
-
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Raise an error for bad status codes
-
-        with open(file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        file_size = os.path.getsize(file_path)
-        print(f"Downloaded: {filename} ({human_readable_size(file_size)})")
-        return file_path
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to download {filename}: {e}")
-        return None
-
-def download_song_assets(song):
-    """Download both audio and image for a song."""
+def download_jobs(song):
+    """Return the (url, path) pairs of a song's audio and image."""
     song_id = song["id"]
-
-    # Determine URLs (can be local or remote)
-    audio_url = song["audio_url"]
-    image_url = song["image_url"]
-
-    # Download the audio and image files
-    audio_filename = f"{song_id}.mp3"
-    image_filename = f"{song_id}.jpeg"
-
-    download_file(audio_url, audio_filename)
-    download_file(image_url, image_filename)
-
-def main():
-    """Main function to parse arguments and download songs."""
-    if len(sys.argv) < 3:
-        print("Usage: python song_downloader.py <search_query> <number_of_songs>")
-        sys.exit(1)
-
-    # Parse arguments
-    search_query = sys.argv[1]
-    number_of_songs = int(sys.argv[2])
-
+    return [
+        (song["audio_url"], os.path.join(DOWNLOAD_FOLDER, f"{song_id}.mp3")),
+        (song["image_url"], os.path.join(DOWNLOAD_FOLDER, f"{song_id}.jpeg")),
+    ]
+
+def download_song_assets(songs, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, retries=DEFAULT_RETRIES):
+    """Download the audio and image of every song concurrently, printing each result."""
+    downloader = Downloader(workers=workers, per_host=per_host, retries=retries)
+    jobs = [job for song in songs for job in download_jobs(song)]
+
+    failed = 0
+    for result in downloader.download_all(jobs):
+        filename = os.path.basename(result.path)
+        if result.status == 'exists':
+            print(f"File exists: {filename}")
+        elif result.status == 'downloaded':
+            print(f"Downloaded: {filename} ({human_readable_size(result.size)})")
+        else:
+            failed += 1
+            print(f"Failed to download {filename}: {result.error}")
+    return failed
+
+def main(search_query, number_of_songs, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, retries=DEFAULT_RETRIES):
+    """Fetch matching songs and download their assets."""
     # Fetch songs from the database
     songs = fetch_songs(search_query, number_of_songs)
 
@@ -97,12 +84,21 @@ def main():
         print("No songs found matching your search criteria.")
         sys.exit(0)
 
-    # Download assets for each song
-    for song in songs:
-        print(f"Downloading assets for: {song['title']}")
-        download_song_assets(song)
+    print(f"Downloading assets for {len(songs)} songs")
+    failed = download_song_assets(songs, workers, per_host, retries)
 
-    print("Download completed.")
+    if failed:
+        print(f"Download completed, {failed} files failed (run again to resume them).")
+    else:
+        print("Download completed.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download the audio and images of songs matching a search.")
+    parser.add_argument('search_query', help="title, lyrics or tags to search for")
+    parser.add_argument('number_of_songs', type=int, help="number of random matching songs")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="concurrent downloads")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help="concurrent downloads per host")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="retries per file, with backoff")
+    args = parser.parse_args()
+
+    main(args.search_query, args.number_of_songs, args.workers, args.per_host, args.retries)
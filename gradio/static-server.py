@@ -1,48 +1,178 @@
-from flask import Flask, send_from_directory,  abort
+from flask import Flask, Response, request, send_from_directory,  abort, redirect, url_for
+from bisect import bisect_left, bisect_right
+import argparse
+import heapq
+import json
 import os
 import signal
 import sys
+import threading
+
+# Shared modules live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from metrics import instrument_flask
+from thumbnails import UNREADABLE_IMAGE_ERRORS, ThumbnailCache
+
+# Optional: waitress is a multi-threaded production WSGI server
+try:
+    from waitress import serve
+except ImportError:
+    serve = None
 
 # Initialize the Flask app
 app = Flask(__name__)
 
+# Request latency histograms per route, served at /metrics
+instrument_flask(app, 'static')
+
 # Base paths for static files
 IMAGE_PATH = "../suno-ai-music-prompts/image"
 AUDIO_PATH = "../suno-ai-music-prompts/audio"
+THUMB_PATH = "../suno-ai-music-prompts/thumbs"
 
-# Serve images from the image folder
-@app.route('/images/<filename>')
-def serve_image(filename):
+# Files are named by song id and never change, so browsers may keep them for a year
+CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Worker threads of the production server
+DEFAULT_THREADS = 16
+
+# Names returned per listing page by default and at most
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+class DirectoryIndex:
+    """
+    Sorted file names of a folder, kept in memory. The folder is only rescanned
+    when its mtime changes (files added, removed or renamed), and the differences
+    are merged into the existing list instead of sorting everything again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.names = []
+        self.mtime_ns = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Return the current sorted names. Raises FileNotFoundError if the folder is missing.
+        """
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        if mtime_ns == self.mtime_ns:
+            return self.names
+
+        with self._lock:
+            if mtime_ns != self.mtime_ns:
+                with os.scandir(self.path) as entries:
+                    current = {entry.name for entry in entries}
+                known = set(self.names)
+                names = self.names
+                if known - current:
+                    names = [name for name in names if name in current]
+                added = sorted(current - known)
+                if added:
+                    names = list(heapq.merge(names, added))
+                # Replace the list rather than changing it, pages being streamed keep their snapshot
+                self.names = names
+                self.mtime_ns = mtime_ns
+        return self.names
+
+    def page(self, after='', prefix='', limit=DEFAULT_PAGE_SIZE):
+        """
+        Return (names, next cursor) for up to limit names sorted after the cursor and
+        starting with prefix. The cursor is None on the last page.
+        """
+        names = self.refresh()
+        start = bisect_right(names, after) if after else 0
+        start = max(start, bisect_left(names, prefix))
+        end = start
+        while end < len(names) and end - start < limit and names[end].startswith(prefix):
+            end += 1
+        more = end < len(names) and names[end].startswith(prefix)
+        return names[start:end], (names[end - 1] if more else None)
+
+# Thumbnails made on first request when the batch job has not created them yet
+thumbnail_cache = ThumbnailCache(IMAGE_PATH, THUMB_PATH)
+
+# One index per media folder
+directory_indexes = {
+    'images': DirectoryIndex(IMAGE_PATH),
+    'audio': DirectoryIndex(AUDIO_PATH),
+}
+
+def stream_listing(key, names, next_after):
+    """
+    Yield a {key: [names], "next": cursor} JSON document in small pieces.
+    """
+    yield f'{{"{key}": ['
+    for i in range(0, len(names), 1000):
+        yield ("," if i else "") + ",".join(json.dumps(name) for name in names[i:i + 1000])
+    yield f'], "next": {json.dumps(next_after)}}}'
+
+def list_directory(key, missing_message):
+    """
+    Answer a listing request: ?after=<cursor>&prefix=<text>&limit=<n>.
+    Pass the returned "next" value as after to get the following page.
+    """
+    after = request.args.get('after', '')
+    prefix = request.args.get('prefix', '')
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    try:
+        names, next_after = directory_indexes[key].page(after, prefix, limit)
+    except FileNotFoundError:
+        return {"error": missing_message}, 404
+    return Response(stream_listing(key, names, next_after), mimetype='application/json')
+
+def send_media(folder, filename, immutable=True):
+    """
+    Send a media file with byte range (206) support for seeking, ETag and
+    Last-Modified validators answered with 304, and immutable cache headers
+    (or no-cache, revalidated on every use, if not immutable).
+    """
     try:
-        return send_from_directory(IMAGE_PATH, filename)
+        response = send_from_directory(folder, filename, conditional=True, etag=True,
+                                       max_age=CACHE_MAX_AGE if immutable else None)
     except FileNotFoundError:
         abort(404)
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+# Serve images from the image folder
+@app.route('/images/<filename>')
+def serve_image(filename):
+    return send_media(IMAGE_PATH, filename)
 
 # Serve audio files from the audio folder
 @app.route('/audio/<filename>')
 def serve_audio(filename):
+    return send_media(AUDIO_PATH, filename)
+
+# Serve a small thumbnail of a song's artwork
+@app.route('/thumbs/<song_id>')
+def serve_thumbnail(song_id):
     try:
-        return send_from_directory(AUDIO_PATH, filename)
-    except FileNotFoundError:
+        path = thumbnail_cache.get(song_id)
+    except UNREADABLE_IMAGE_ERRORS:
+        # Unreadable image, let the browser try the original. A temporary redirect,
+        # so the full image is not cached as the thumbnail once a good one exists
+        return redirect(url_for('serve_image', filename=f"{song_id}.jpeg"))
+    if path is None:
         abort(404)
+    # Rebuilt under the same URL once an unreadable image is replaced
+    return send_media(THUMB_PATH, os.path.relpath(path, THUMB_PATH), immutable=False)
 
-# List all images
+# List the images, one page at a time
 @app.route('/list/images')
 def list_images():
-    try:
-        files = os.listdir(IMAGE_PATH)
-        return {"images": files}
-    except FileNotFoundError:
-        return {"error": "Image directory not found"}, 404
+    return list_directory('images', "Image directory not found")
 
-# List all audio files
+# List the audio files, one page at a time
 @app.route('/list/audio')
 def list_audio():
-    try:
-        files = os.listdir(AUDIO_PATH)
-        return {"audio": files}
-    except FileNotFoundError:
-        return {"error": "Audio directory not found"}, 404
+    return list_directory('audio', "Audio directory not found")
 
 
 # Signal handler to handle termination gracefully
@@ -55,4 +185,25 @@ signal.signal(signal.SIGTERM, handle_sigterm)
 
 # Run the Flask app
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    parser = argparse.ArgumentParser(description="Serve the local images and audio files.")
+    parser.add_argument('--port', type=int, default=5000, help="port to listen on")
+    parser.add_argument('--production', action='store_true',
+                        help="multi-threaded server without debugging (waitress if installed)")
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help="worker threads in production mode")
+    parser.add_argument('--x-sendfile', action='store_true',
+                        help="let a fronting web server send the files (X-Sendfile)")
+    args = parser.parse_args()
+
+    # The fronting server (Apache mod_xsendfile, lighttpd) sends the file itself,
+    # the only mode where the file contents are not copied through Python
+    app.config['USE_X_SENDFILE'] = args.x_sendfile
+
+    if not args.production:
+        app.run(debug=True, host='0.0.0.0', port=args.port)
+    elif serve is not None:
+        # waitress reads the file through wsgi.file_wrapper in blocks and writes
+        # them to the socket, so the data still passes through Python
+        serve(app, host='0.0.0.0', port=args.port, threads=args.threads)
+    else:
+        print("waitress not installed, using the threaded Werkzeug server")
+        app.run(host='0.0.0.0', port=args.port, threaded=True)
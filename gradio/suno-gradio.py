@@ -2,97 +2,192 @@ import sqlite3
 import gradio as gr
 import signal
 import sys
+import os
+import time
+
+# Shared modules live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db_pool import get_pool
+from facets import FacetCache, facet_label
+from metrics import PHASE_SECONDS, start_metrics_server, track_request
+from prompt_analytics import DIMENSIONS, STAT_COLUMNS, get_stats
+from search_cache import SearchCache
+from search_index import SORT_OPTIONS, rank_expression, register_search_functions, to_match_query
+from serving_queries import GRADIO_PAGE_SIZE, SONG_COLUMNS, play_count_queries, read_in_order, song_filters
 
 # Flask server URL to serve static files
 FLASK_SERVER_URL = "http://127.0.0.1:5000"
 
-# Connect to the SQLite database
+# Port of the Prometheus /metrics endpoint (gradio cannot add the route itself)
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 7861))
+
+# Read-only connections, one per worker thread, reused across searches
+db_pool = get_pool('../suno.db', on_connect=register_search_functions)  # Database path
+
+# Connect to the SQLite database (rows are returned as dictionaries)
 def get_db_connection():
-    conn = sqlite3.connect('../suno.db')  # Database path
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+    return db_pool.connection()
 
-# Fetch unique languages and models for dropdown options
+# Languages and models with their song counts, reloaded only when the database changes
+facet_cache = FacetCache(db_pool)
+
+# Fetch languages and models for dropdown options as (label, value) pairs
 def get_filter_options():
-    conn = get_db_connection()
-    languages = conn.execute("SELECT DISTINCT meta_prompt_lang FROM json_data").fetchall()
-    models = conn.execute("SELECT DISTINCT model_name FROM json_data").fetchall()
-    conn.close()
+    facets = facet_cache.get()
 
     # Prepare dropdown options (including "All")
-    language_options = ["All"] + [lang["meta_prompt_lang"] for lang in languages if lang["meta_prompt_lang"]]
-    model_options = ["All"] + [model["model_name"] for model in models if model["model_name"]]
-    
+    language_options = [("All", "All")] + [(facet_label(lang), lang.value) for lang in facets["languages"]]
+    model_options = [("All", "All")] + [(facet_label(model), model.value) for model in facets["models"]]
+
     return language_options, model_options
 
-# Query the database and prepare the output based on filters
-def search_songs(search_query, selected_language, selected_model, local_only):
+# Refresh the dropdowns on every page load, keeping the current selection
+def refresh_filter_options(selected_language, selected_model):
+    language_options, model_options = get_filter_options()
+    if selected_language not in [value for _, value in language_options]:
+        selected_language = "All"
+    if selected_model not in [value for _, value in model_options]:
+        selected_model = "All"
+    return (
+        gr.Dropdown(choices=language_options, value=selected_language),
+        gr.Dropdown(choices=model_options, value=selected_model),
+    )
+
+# Songs shown per page; "Load More" fetches the next page
+PAGE_SIZE = GRADIO_PAGE_SIZE
+
+NO_RESULTS = "No songs found matching your search criteria."
+
+# Yield the songs after the cursor, one row more than a page to tell if there are more.
+# Rows are read while the cards are rendered; the pool's connections may be used from
+# whichever thread gradio resumes the generator on.
+def query_songs(match_query, selected_language, selected_model, local_only, sort_by, after):
     conn = get_db_connection()
 
-    # Build the query dynamically based on user filters
-    query = """
-        SELECT id, title, meta_prompt AS lyrics, meta_duration AS duration, 
-               play_count, meta_prompt_lang AS language, model_name, 
-               audio_url, image_url, local_image, local_audio
-        FROM json_data
-        WHERE (title LIKE ? OR meta_prompt LIKE ?)
-    """
-    params = [f'%{search_query}%', f'%{search_query}%']
-
-    # Add language filter if selected
-    if selected_language != "All":
-        query += " AND meta_prompt_lang = ?"
-        params.append(selected_language)
-
-    # Add model filter if selected
-    if selected_model != "All":
-        query += " AND model_name = ?"
-        params.append(selected_model)
-
-    # Add local content filter if checked
-    if local_only:
-        query += " AND local_audio = 1"
-
-    query += " ORDER BY play_count DESC LIMIT 20"
-    results = conn.execute(query, params).fetchall()
-    conn.close()
-
-    if not results:
-        return "No songs found matching your search criteria."
-
-    # Prepare the formatted HTML output
-    formatted_results = ""
-    for row in results:
-        image_origin = "Local Content" if row["local_image"] else "Server Content"
-        audio_origin = "Local Content" if row["local_audio"] else "Server Content"
-
-        image_url = (
-            f"{FLASK_SERVER_URL}/images/{row['id']}.jpeg"
-            if row["local_image"] else row["image_url"]
-        )
-        audio_url = (
-            f"{FLASK_SERVER_URL}/audio/{row['id']}.mp3"
-            if row["local_audio"] else row["audio_url"]
-        )
+    # Build the query dynamically based on user filters (shared with the Flask index
+    # and the query plan checks of db_indexes.py)
+    query, params = song_filters(
+        match_query,
+        selected_language if selected_language != "All" else None,
+        selected_model if selected_model != "All" else None,
+        local_only,
+    )
+
+    limit = PAGE_SIZE + 1
+
+    # Relevance orders page on the rank of the match, computed in a subquery
+    if match_query and sort_by != "Play Count":
+        rank = rank_expression(conn.cursor(), sort_by)
+        query = f"SELECT * FROM (SELECT {SONG_COLUMNS}, {rank} AS sort_key {query})"
+        if after:
+            query += " WHERE (sort_key, id) > (?, ?)"
+            params += list(after)
+        yield from conn.execute(query + " ORDER BY sort_key, id LIMIT ?", params + [limit])
+        return
 
-        formatted_results += f"""
+    yield from read_in_order(conn.execute, play_count_queries(SONG_COLUMNS, query, params, after), limit)
+
+# Format one song as HTML; media only loads when scrolled to or played
+def render_song(row):
+    image_origin = "Local Content" if row["local_image"] else "Server Content"
+    audio_origin = "Local Content" if row["local_audio"] else "Server Content"
+
+    image_url = (
+        f"{FLASK_SERVER_URL}/images/{row['id']}.jpeg"
+        if row["local_image"] else row["image_url"]
+    )
+    # Local artwork is shown as a small thumbnail linking to the full image
+    thumbnail_url = (
+        f"{FLASK_SERVER_URL}/thumbs/{row['id']}"
+        if row["local_image"] else row["image_url"]
+    )
+    audio_url = (
+        f"{FLASK_SERVER_URL}/audio/{row['id']}.mp3"
+        if row["local_audio"] else row["audio_url"]
+    )
+
+    return f"""
         <h2>{row['title']}</h2>
         <p><strong>Language:</strong> {row['language']} | <strong>Model:</strong> {row['model_name']}</p>
         <p><strong>Duration:</strong> {row['duration']} seconds | <strong>Play Count:</strong> {row['play_count']}</p>
         <p><strong>Lyrics:</strong><br>{row['lyrics']}</p>
 
         <p><strong>Image Source:</strong> <b>{image_origin}</b></p>
-        <img src="{image_url}" alt="Song Image" width="300"><br>
+        <a href="{image_url}" target="_blank"><img src="{thumbnail_url}" alt="Song Image" width="300" loading="lazy"></a><br>
 
         <p><strong>Audio Source:</strong> <b>{audio_origin}</b></p>
-        <audio controls>
+        <audio controls preload="none">
             <source src="{audio_url}" type="audio/mpeg">
             Your browser does not support the audio element.
         </audio>
         <hr>
         """
 
-    return formatted_results
+# Recent result pages, dropped when the database changes
+search_cache = SearchCache(db_pool)
+
+# Yield (html, state, load more button) while the cards of the next page are rendered
+def stream_page(state):
+    key = state["key"] + (state["after"],)
+    html = state["html"]
+    found, cached, version = search_cache.get(key)
+    if found:
+        cards, after = cached
+        html += "".join(cards)
+    else:
+        # Show each card as soon as its row is read and formatted
+        rows = query_songs(*state["key"], state["after"])
+        cards = []
+        after = last = None
+        sql_seconds = render_seconds = 0
+        while True:
+            start_time = time.perf_counter()
+            row = next(rows, None)
+            sql_seconds += time.perf_counter() - start_time
+            if row is None:
+                break
+            if len(cards) == PAGE_SIZE:
+                # The extra row only tells that there is a next page
+                after = last
+                break
+            start_time = time.perf_counter()
+            cards.append(render_song(row))
+            render_seconds += time.perf_counter() - start_time
+            last = (row["sort_key"], row["id"])
+            html += cards[-1]
+            yield html, state, gr.Button(visible=False)
+        rows.close()
+        PHASE_SECONDS.observe(sql_seconds, app='gradio', phase='sql')
+        PHASE_SECONDS.observe(render_seconds, app='gradio', phase='render')
+        search_cache.put(key, (cards, after), version)
+
+    if not html:
+        html = NO_RESULTS
+    state = dict(state, after=after, html=html)
+    yield html, state, gr.Button(visible=after is not None)
+
+# Start a new search, streaming the first page
+def search_songs(search_query, selected_language, selected_model, local_only, sort_by="Play Count"):
+    # Searches that differ only in spacing or quoting share cache entries
+    match_query = to_match_query(search_query)
+    key = (match_query, selected_language, selected_model, bool(local_only), sort_by if match_query else None)
+    with track_request('gradio', 'search_songs'):
+        yield from stream_page({"key": key, "after": None, "html": ""})
+
+# Append the next page of the current search
+def load_more(state):
+    if state:
+        with track_request('gradio', 'load_more'):
+            yield from stream_page(state)
+
+# Read the precomputed prompt performance summaries (see prompt_analytics.py)
+def show_prompt_stats(dimension, order_by, min_songs):
+    conn = get_db_connection()
+    try:
+        rows = get_stats(conn, dimension, order_by, int(min_songs or 1))
+    except sqlite3.OperationalError:
+        rows = []  # Summaries not built yet
+    return [list(row) for row in rows]
 
 # Fetch filter options for the dropdowns
 language_options, model_options = get_filter_options()
@@ -102,22 +197,60 @@ with gr.Blocks() as demo:
     gr.Markdown("# Song Search")
 
     with gr.Row():
-        search_query = gr.Textbox(label="Search by Title or Lyrics", placeholder="Enter search term...")
+        search_query = gr.Textbox(
+            label="Search by Title, Lyrics or Tags",
+            placeholder='Enter search terms, "exact phrase" or prefix*...'
+        )
 
     with gr.Row():
         language_dropdown = gr.Dropdown(choices=language_options, label="Select Language", value="All")
         model_dropdown = gr.Dropdown(choices=model_options, label="Select Model", value="All")
+        sort_dropdown = gr.Dropdown(choices=SORT_OPTIONS, label="Sort By", value="Play Count")
 
     local_content_checkbox = gr.Checkbox(label="Local Content Only", value=False)
 
     search_button = gr.Button("Search")
     output = gr.HTML()
+    search_state = gr.State(None)
+    load_more_button = gr.Button("Load More", visible=False)
 
-    # Connect the search button to the search function
+    with gr.Accordion("Search Cache", open=False):
+        cache_stats = gr.JSON()
+
+    # Connect the search button to the search function, then show the cache counters
     search_button.click(
         search_songs, 
-        inputs=[search_query, language_dropdown, model_dropdown, local_content_checkbox], 
-        outputs=output
+        inputs=[search_query, language_dropdown, model_dropdown, local_content_checkbox, sort_dropdown], 
+        outputs=[output, search_state, load_more_button]
+    ).then(search_cache.stats, outputs=cache_stats)
+
+    load_more_button.click(
+        load_more,
+        inputs=search_state,
+        outputs=[output, search_state, load_more_button]
+    ).then(search_cache.stats, outputs=cache_stats)
+
+    # Pick up languages and models added since the app started
+    demo.load(
+        refresh_filter_options,
+        inputs=[language_dropdown, model_dropdown],
+        outputs=[language_dropdown, model_dropdown]
+    )
+
+    gr.Markdown("## Prompt Performance")
+
+    with gr.Row():
+        dimension_dropdown = gr.Dropdown(choices=list(DIMENSIONS) + ["tag"], label="Group By", value="template")
+        stat_dropdown = gr.Dropdown(choices=STAT_COLUMNS, label="Rank By", value="mean_play_count")
+        min_songs_number = gr.Number(label="Minimum Songs", value=100, precision=0)
+
+    stats_button = gr.Button("Show Statistics")
+    stats_output = gr.Dataframe(headers=["value"] + STAT_COLUMNS + ["example"])
+
+    stats_button.click(
+        show_prompt_stats,
+        inputs=[dimension_dropdown, stat_dropdown, min_songs_number],
+        outputs=stats_output
     )
 
     # Signal handler to handle termination gracefully
@@ -130,4 +263,5 @@ with gr.Blocks() as demo:
 
 # Run the Gradio app
 if __name__ == "__main__":
+    start_metrics_server(METRICS_PORT)
     demo.launch(server_port=7860)
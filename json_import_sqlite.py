@@ -1,33 +1,38 @@
 import os
 import json
 import sqlite3
+import hashlib
+import zipfile
+from itertools import islice
 from pathlib import Path
-import sys
 import time
+import argparse
+import multiprocessing
+
+from cold_storage import COLD_COLUMNS, COLD_TABLE, compress_values, create_cold_table, is_split
+from dimensions import DimensionEncoder, create_compat_view, create_dimension_tables, fact_columns, is_encoded
+from search_index import create_search_index
 
 def create_table(cursor):
     """
-    Create the SQLite table with hard-coded metadata fields.
+    Create the SQLite table with hard-coded metadata fields. The creator and
+    status columns are stored as keys into the dimension tables (see dimensions.py)
+    and the bulky cold columns in a compressed side table (see cold_storage.py).
     """
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS json_data (
             id TEXT PRIMARY KEY,
-            video_url TEXT,
             audio_url TEXT,
             image_url TEXT,
-            image_large_url TEXT,
             is_video_pending BOOLEAN,
             major_model_version TEXT,
             model_name TEXT,
             reaction TEXT,
-            display_name TEXT,
-            handle TEXT,
+            creator_id INTEGER,
             is_handle_updated BOOLEAN,
-            avatar_image_url TEXT,
             is_following_creator BOOLEAN,
-            user_id TEXT,
             created_at TEXT,
-            status TEXT,
+            status_id INTEGER,
             title TEXT,
             play_count INTEGER,
             upvote_count INTEGER,
@@ -36,40 +41,141 @@ def create_table(cursor):
             meta_negative_tags TEXT,
             meta_prompt TEXT,
             meta_audio_prompt_id TEXT,
-            meta_history TEXT,
-            meta_concat_history TEXT,
             meta_stem_from_id TEXT,
             meta_type TEXT,
             meta_duration REAL,
             meta_refund_credits BOOLEAN,
             meta_stream BOOLEAN,
-            meta_infill TEXT,
             meta_has_vocal BOOLEAN,
             meta_is_audio_upload_tos_accepted BOOLEAN,
-            meta_error_type TEXT,
-            meta_error_message TEXT,
-            meta_configurations TEXT,
             meta_artist_clip_id TEXT,
             meta_cover_clip_id TEXT,
             meta_prompt_lang TEXT,
             meta_gpt_lang TEXT
         )
     ''')
+    # Databases created before the dimension tables and the side table keep their layout until migrated
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(json_data)')}
+    if not columns & set(COLD_COLUMNS):
+        create_cold_table(cursor)
+    if is_encoded(cursor):
+        create_dimension_tables(cursor)
+    if is_encoded(cursor) or is_split(cursor):
+        create_compat_view(cursor)
 
-def insert_json_data(cursor, data):
+def create_manifest_tables(cursor):
     """
-    Insert the JSON data into the SQLite database.
+    Create the tables that track import batches and every imported source file.
     """
-    metadata = data.get('metadata', {})
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_batches (
+            batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            files_scanned INTEGER DEFAULT 0,
+            files_changed INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            content_hash TEXT,
+            record_id TEXT,
+            batch_id INTEGER REFERENCES import_batches(batch_id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_import_manifest_batch
+        ON import_manifest (batch_id)
+    ''')
+    # record_id is the song the file wrote, NULL if another file already had its id
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_import_manifest_record
+        ON import_manifest (record_id)
+    ''')
+
+# Column order shared by the serial and the parallel insert paths
+COLUMNS = [
+    'id', 'video_url', 'audio_url', 'image_url', 'image_large_url',
+    'is_video_pending', 'major_model_version', 'model_name', 'reaction',
+    'display_name', 'handle', 'is_handle_updated', 'avatar_image_url',
+    'is_following_creator', 'user_id', 'created_at', 'status', 'title',
+    'play_count', 'upvote_count', 'is_public',
+    'meta_tags', 'meta_negative_tags', 'meta_prompt', 'meta_audio_prompt_id',
+    'meta_history', 'meta_concat_history', 'meta_stem_from_id', 'meta_type',
+    'meta_duration', 'meta_refund_credits', 'meta_stream', 'meta_infill',
+    'meta_has_vocal', 'meta_is_audio_upload_tos_accepted', 'meta_error_type',
+    'meta_error_message', 'meta_configurations', 'meta_artist_clip_id',
+    'meta_cover_clip_id', 'meta_prompt_lang', 'meta_gpt_lang'
+]
+
+def insert_sql(columns):
+    """
+    Return the INSERT OR IGNORE statement for rows of the given columns.
+    """
+    return f'''
+        INSERT OR IGNORE INTO json_data ({", ".join(columns)})
+        VALUES ({", ".join(["?"] * len(columns))})
+    '''
+
+def upsert_sql(columns):
+    """
+    Return the statement inserting or updating rows of the given columns.
+    """
+    return f'''
+        INSERT INTO json_data ({", ".join(columns)})
+        VALUES ({", ".join(["?"] * len(columns))})
+        ON CONFLICT(id) DO UPDATE SET
+            {", ".join(f"{column} = excluded.{column}" for column in columns[1:])}
+    '''
+
+MANIFEST_UPSERT_SQL = '''
+    INSERT INTO import_manifest (path, size, mtime_ns, content_hash, record_id, batch_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        size = excluded.size,
+        mtime_ns = excluded.mtime_ns,
+        content_hash = excluded.content_hash,
+        record_id = excluded.record_id,
+        batch_id = excluded.batch_id
+'''
+
+# Cold values follow their json_data row: kept when the row is ignored, replaced when it is updated
+COLD_INSERT_SQL = f'INSERT OR IGNORE INTO {COLD_TABLE} (id, data) VALUES (?, ?)'
+COLD_UPSERT_SQL = f'''
+    INSERT INTO {COLD_TABLE} (id, data) VALUES (?, ?)
+    ON CONFLICT(id) DO UPDATE SET data = excluded.data
+'''
+
+# Number of records written per transaction in parallel mode
+DEFAULT_BATCH_SIZE = 50000
 
-    # Convert lists/dicts to JSON strings
-    def to_json_string(value):
-        if isinstance(value, (list, dict)):
-            return json.dumps(value)  # Convert to JSON string
-        return value
+# Number of source files checked against the manifest per lookup round
+SCAN_CHUNK_SIZE = 10000
+
+# Separates the archive path from the member name, e.g. "/x/suno.zip::data/1.json"
+ARCHIVE_MEMBER_SEPARATOR = '::'
+
+# Archives opened by this process, reused across members. Keyed by process id too:
+# forked workers must not share the parent's file offset
+_open_archives = {}
+
+# Convert lists/dicts to JSON strings
+def to_json_string(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)  # Convert to JSON string
+    return value
+
+def flatten_record(data):
+    """
+    Flatten a Kaggle JSON record into a tuple matching COLUMNS.
+    """
+    metadata = data.get('metadata', {})
 
-    # Prepare the values for insertion
-    values = [
+    return (
         data.get('id'),
         data.get('video_url'),
         data.get('audio_url'),
@@ -112,42 +218,401 @@ def insert_json_data(cursor, data):
         metadata.get('cover_clip_id', None),
         metadata.get('prompt_lang', None),
         metadata.get('gpt_lang', None)
-    ]
+    )
 
-    # Insert the data into the table
-    cursor.execute(f'''
-        INSERT OR IGNORE INTO json_data (
-            id, video_url, audio_url, image_url, image_large_url,
-            is_video_pending, major_model_version, model_name, reaction,
-            display_name, handle, is_handle_updated, avatar_image_url,
-            is_following_creator, user_id, created_at, status, title,
-            play_count, upvote_count, is_public,
-            meta_tags, meta_negative_tags, meta_prompt, meta_audio_prompt_id,
-            meta_history, meta_concat_history, meta_stem_from_id, meta_type,
-            meta_duration, meta_refund_credits, meta_stream, meta_infill,
-            meta_has_vocal, meta_is_audio_upload_tos_accepted, meta_error_type,
-            meta_error_message, meta_configurations, meta_artist_clip_id,
-            meta_cover_clip_id, meta_prompt_lang, meta_gpt_lang
-        ) VALUES ({", ".join(["?"] * len(values))})
-    ''', values)
-
-def process_file(cursor, file_path):
+class RecordWriter:
+    """
+    Writes flattened rows (in COLUMNS order) to json_data in the layout of the
+    database: cold columns go to the compressed side table and the creator and
+    status columns are interned on databases that use them.
+    """
+
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+        columns = COLUMNS
+        self.hot_positions = None
+        if is_split(self.cursor):
+            self.hot_positions = [i for i, column in enumerate(COLUMNS) if column not in COLD_COLUMNS]
+            self.cold_positions = [COLUMNS.index(column) for column in COLD_COLUMNS]
+            columns = [COLUMNS[i] for i in self.hot_positions]
+        self.encoder = None
+        if is_encoded(self.cursor):
+            self.encoder = DimensionEncoder(conn, columns)
+            columns = fact_columns(columns)
+        self.insert_sql = insert_sql(columns)
+        self.upsert_sql = upsert_sql(columns)
+
+    def split(self, row):
+        """
+        Return the json_data row and the (id, compressed cold values) side row,
+        which is None when the database keeps the cold columns inline.
+        """
+        cold = None
+        if self.hot_positions is not None:
+            cold = (row[0], compress_values({column: row[i] for column, i in zip(COLD_COLUMNS, self.cold_positions)}))
+            row = tuple(row[i] for i in self.hot_positions)
+        if self.encoder:
+            row = self.encoder.encode(row)
+        return row, cold
+
+    def insert(self, row):
+        """
+        Insert a row unless its id exists.
+        """
+        self.insert_many([row])
+
+    def insert_many(self, rows):
+        """
+        Insert rows unless their id exists.
+        """
+        split_rows = [self.split(row) for row in rows]
+        self.cursor.executemany(self.insert_sql, [row for row, _ in split_rows])
+        self.cursor.executemany(COLD_INSERT_SQL, [cold for _, cold in split_rows if cold and cold[1] is not None])
+
+    def upsert(self, row):
+        """
+        Insert a row or update the existing one.
+        """
+        row, cold = self.split(row)
+        self.cursor.execute(self.upsert_sql, row)
+        if cold and cold[1] is not None:
+            self.cursor.execute(COLD_UPSERT_SQL, cold)
+        elif cold:
+            self.cursor.execute(f'DELETE FROM {COLD_TABLE} WHERE id = ?', cold[:1])
+
+def insert_json_data(writer, data):
+    """
+    Insert the JSON data into the SQLite database.
+    """
+    writer.insert(flatten_record(data))
+
+def process_file(writer, file_path):
     """
     Process a single JSON file and insert its data into the database.
     """
     with open(file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
-        insert_json_data(cursor, data)
+        insert_json_data(writer, data)
 
-def process_folder(cursor, folder_path):
+def process_folder(writer, folder_path):
     """
     Process all JSON files in the given folder.
     """
     for file in Path(folder_path).glob('*.json'):
         print(f"Processing {file}")
-        process_file(cursor, file)
+        process_file(writer, file)
+
+def list_file_entries(paths):
+    """
+    Yield (path, size, mtime_ns) for files on disk.
+    """
+    for path in paths:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        yield path, stat.st_size, stat.st_mtime_ns
+
+def list_archive_entries(archive_path):
+    """
+    Yield (path, size, mtime_ns) for the JSON files under data/ in a zip archive,
+    without extracting anything.
+    """
+    archive_path = os.path.abspath(archive_path)
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            parts = info.filename.split('/')
+            if info.is_dir() or not info.filename.endswith('.json') or 'data' not in parts[:-1]:
+                continue
+            mtime_ns = int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+            yield f"{archive_path}{ARCHIVE_MEMBER_SEPARATOR}{info.filename}", info.file_size, mtime_ns
+
+def read_source(path):
+    """
+    Read the raw bytes of a JSON file on disk or of a zip archive member.
+    """
+    archive_path, separator, member = path.partition(ARCHIVE_MEMBER_SEPARATOR)
+    if not separator:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    key = (os.getpid(), archive_path)
+    archive = _open_archives.get(key)
+    if archive is None:
+        archive = _open_archives[key] = zipfile.ZipFile(archive_path)
+    return archive.read(member)
+
+def parse_file(file_path):
+    """
+    Parse a single JSON file or archive member into a row tuple
+    (runs in a worker process).
+    """
+    return flatten_record(json.loads(read_source(str(file_path))))
+
+def apply_bulk_load_pragmas(cursor):
+    """
+    Trade durability for speed while the writer owns the database.
+    """
+    cursor.execute('PRAGMA synchronous = OFF')
+    cursor.execute('PRAGMA journal_mode = MEMORY')
+    cursor.execute('PRAGMA temp_store = MEMORY')
+    cursor.execute('PRAGMA cache_size = -262144')  # 256MB page cache
+    cursor.execute('PRAGMA locking_mode = EXCLUSIVE')
+
+def report_progress(count, start_time):
+    """
+    Print the number of records processed and the current throughput.
+    """
+    elapsed = max(time.time() - start_time, 1e-9)
+    print(f"{count} records, {count / elapsed:.0f} records/s")
+
+def write_rows(conn, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert rows with executemany, committing once per batch.
+    Returns the number of rows consumed.
+    """
+    writer = RecordWriter(conn)
+    start_time = time.time()
+    count = 0
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.insert_many(batch)
+            conn.commit()
+            count += len(batch)
+            batch = []
+            report_progress(count, start_time)
+
+    if batch:
+        writer.insert_many(batch)
+        conn.commit()
+        count += len(batch)
+        report_progress(count, start_time)
+
+    return count
+
+def process_folder_parallel(conn, folder_path, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Parse JSON files across a process pool and insert them from a single writer.
+    Files are consumed in the same order as process_folder, so INSERT OR IGNORE
+    keeps the same record for duplicate ids and the resulting table is identical.
+    """
+    apply_bulk_load_pragmas(conn.cursor())
+
+    files = Path(folder_path).glob('*.json')
+    with multiprocessing.Pool(processes=workers) as pool:
+        rows = pool.imap(parse_file, files, chunksize=256)
+        return write_rows(conn, rows, batch_size)
+
+def process_archive(conn, archive_path, parallel=False, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream the data/ members of a zip archive into the database.
+    Each worker opens the archive once and decompresses and parses its own
+    members while the writer inserts, so nothing is extracted to disk.
+    """
+    apply_bulk_load_pragmas(conn.cursor())
+
+    members = (path for path, _, _ in list_archive_entries(archive_path))
+    if not parallel:
+        return write_rows(conn, map(parse_file, members), batch_size)
+
+    with multiprocessing.Pool(processes=workers) as pool:
+        rows = pool.imap(parse_file, members, chunksize=256)
+        return write_rows(conn, rows, batch_size)
+
+def start_batch(conn, source):
+    """
+    Return the id of an unfinished batch for this source (resuming an
+    interrupted run), or open a new one.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT batch_id FROM import_batches WHERE source = ? AND finished_at IS NULL '
+        'ORDER BY batch_id DESC LIMIT 1', (source,)
+    )
+    row = cursor.fetchone()
+    if row:
+        print(f"Resuming interrupted import batch {row[0]}")
+        return row[0]
+
+    cursor.execute(
+        "INSERT INTO import_batches (source, started_at) VALUES (?, datetime('now'))",
+        (source,)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+def finish_batch(conn, batch_id, files_scanned, files_changed):
+    """
+    Mark a batch as complete so the next run starts a new one.
+    """
+    conn.execute('''
+        UPDATE import_batches
+        SET finished_at = datetime('now'),
+            files_scanned = files_scanned + ?,
+            files_changed = files_changed + ?
+        WHERE batch_id = ?
+    ''', (files_scanned, files_changed, batch_id))
+    conn.commit()
+
+def find_changed_files(cursor, entries):
+    """
+    Compare (path, size, mtime_ns) entries with the manifest, in one join per call.
+    Returns (path, size, mtime_ns, known_hash) for new or modified files only,
+    in the order of entries.
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS scanned_files (
+            position INTEGER PRIMARY KEY,
+            path TEXT,
+            size INTEGER,
+            mtime_ns INTEGER
+        )
+    ''')
+    cursor.execute('DELETE FROM temp.scanned_files')
+    cursor.executemany('INSERT INTO temp.scanned_files (path, size, mtime_ns) VALUES (?, ?, ?)', entries)
+    return cursor.execute('''
+        SELECT s.path, s.size, s.mtime_ns, m.content_hash
+        FROM temp.scanned_files s
+        LEFT JOIN import_manifest m ON m.path = s.path
+        WHERE m.path IS NULL OR m.size IS NOT s.size OR m.mtime_ns IS NOT s.mtime_ns
+        ORDER BY s.position
+    ''').fetchall()
+
+def load_changed_file(task):
+    """
+    Hash a changed file and parse it unless its content is unchanged
+    (runs in a worker process). Returns the task with its hash and row.
+    """
+    path, size, mtime_ns, known_hash = task
+    content = read_source(path)
+    content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+    if content_hash == known_hash:
+        return path, size, mtime_ns, content_hash, None
+    return path, size, mtime_ns, content_hash, flatten_record(json.loads(content))
+
+def write_changed_files(conn, results, batch_id, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upsert changed records together with their manifest entries.
+    A file's record and its manifest row are committed in the same
+    transaction, so an interrupted run never marks unwritten data as done.
+    As in the serial and parallel imports, the first file with an id keeps it:
+    a record whose id another file already wrote is ignored. When a file's
+    record gets another id, the song under the old id is deleted.
+    Returns the number of records upserted.
+    """
+    cursor = conn.cursor()
+    writer = RecordWriter(conn)
+    pending = 0
+    upserted = 0
+    start_time = time.time()
+
+    for path, size, mtime_ns, content_hash, row in results:
+        if row is None:
+            # Only the file's timestamp changed, keep its original batch
+            cursor.execute(
+                'UPDATE import_manifest SET size = ?, mtime_ns = ? WHERE path = ?',
+                (size, mtime_ns, path)
+            )
+        else:
+            known = cursor.execute('SELECT record_id FROM import_manifest WHERE path = ?', (path,)).fetchone()
+            owner = cursor.execute(
+                'SELECT 1 FROM import_manifest WHERE record_id = ? AND path != ?', (row[0], path)
+            ).fetchone()
+            record_id = None
+            if owner is None:
+                writer.upsert(row)
+                record_id = row[0]
+                upserted += 1
+            if known and known[0] is not None and known[0] != record_id:
+                cursor.execute('DELETE FROM json_data WHERE id = ?', (known[0],))
+            cursor.execute(MANIFEST_UPSERT_SQL, (path, size, mtime_ns, content_hash, record_id, batch_id))
+
+        pending += 1
+        if pending >= batch_size:
+            conn.commit()
+            pending = 0
+            report_progress(upserted, start_time)
+
+    conn.commit()
+    return upserted
+
+def remove_deleted_files(conn, source):
+    """
+    Delete the songs of the manifest entries under source (a file, a folder or
+    an archive) that the scan in temp.seen_files did not find any more, and
+    their entries. Returns the number of files removed.
+    """
+    cursor = conn.cursor()
+    if os.path.isdir(source):
+        prefix = source + os.sep
+    else:
+        prefix = source + ARCHIVE_MEMBER_SEPARATOR
+    removed = [
+        (path, record_id) for path, record_id in cursor.execute('''
+            SELECT path, record_id FROM import_manifest
+            WHERE (path = ? OR substr(path, 1, ?) = ?)
+              AND path NOT IN (SELECT path FROM temp.seen_files)
+        ''', (source, len(prefix), prefix)).fetchall()
+        # Only the folder's own files, not those of its subfolders
+        if not os.path.isdir(source) or os.path.dirname(path) == source
+    ]
+    cursor.executemany('DELETE FROM json_data WHERE id = ?', [(record_id,) for _, record_id in removed if record_id])
+    cursor.executemany('DELETE FROM import_manifest WHERE path = ?', [(path,) for path, _ in removed])
+    conn.commit()
+    return len(removed)
 
-def main(input_path):
+def process_incremental(conn, entries, source, parallel=False, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import only new or changed files, recording each one in the manifest, and
+    delete the songs of files that disappeared since the last run.
+    entries yields (path, size, mtime_ns) from list_file_entries or
+    list_archive_entries.
+    """
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA journal_mode = WAL')  # Safe to interrupt, unlike the bulk-load journal
+    cursor.execute('PRAGMA synchronous = NORMAL')
+    cursor.execute('PRAGMA cache_size = -262144')
+    create_manifest_tables(cursor)
+
+    cursor.execute('DROP TABLE IF EXISTS temp.seen_files')
+    cursor.execute('CREATE TEMP TABLE seen_files (path TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    batch_id = start_batch(conn, source)
+    pool = multiprocessing.Pool(processes=workers) if parallel else None
+    files_scanned = 0
+    files_changed = 0
+    start_time = time.time()
+
+    try:
+        entries = iter(entries)
+        while True:
+            chunk = list(islice(entries, SCAN_CHUNK_SIZE))
+            if not chunk:
+                break
+            cursor.executemany('INSERT OR IGNORE INTO temp.seen_files (path) VALUES (?)', [entry[:1] for entry in chunk])
+            tasks = find_changed_files(cursor, chunk)
+            if pool:
+                results = pool.imap(load_changed_file, tasks, chunksize=64)
+            else:
+                results = map(load_changed_file, tasks)
+            files_changed += write_changed_files(conn, results, batch_id, batch_size)
+            files_scanned += len(chunk)
+            print(f"{files_scanned} files scanned, {files_changed} changed, "
+                  f"{files_scanned / max(time.time() - start_time, 1e-9):.0f} files/s")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # Only after a complete scan, an interrupted one has not seen every file
+    removed = remove_deleted_files(conn, source)
+    if removed:
+        print(f"{removed} files no longer present, their songs deleted")
+    finish_batch(conn, batch_id, files_scanned, files_changed)
+    return files_changed
+
+def main(input_path, parallel=False, workers=None, batch_size=DEFAULT_BATCH_SIZE, incremental=False):
     """
     Main function to handle the SQLite connection and input path.
     """
@@ -157,20 +622,39 @@ def main(input_path):
 
     # Create the table
     create_table(cursor)
+    writer = RecordWriter(conn)
 
-    # Process input path (file or folder)
-    if os.path.isfile(input_path):
-        process_file(cursor, input_path)
+    # Process input path (zip archive, file or folder)
+    is_archive = os.path.isfile(input_path) and zipfile.is_zipfile(input_path)
+    source = os.path.abspath(input_path)
+    if incremental and is_archive:
+        entries = list_archive_entries(input_path)
+        process_incremental(conn, entries, source, parallel, workers, batch_size)
+    elif incremental and os.path.isfile(input_path):
+        entries = list_file_entries([input_path])
+        process_incremental(conn, entries, source, parallel, workers, batch_size)
+    elif incremental and os.path.isdir(input_path):
+        entries = list_file_entries(Path(input_path).glob('*.json'))
+        process_incremental(conn, entries, source, parallel, workers, batch_size)
+    elif is_archive:
+        process_archive(conn, input_path, parallel, workers, batch_size)
+    elif os.path.isfile(input_path):
+        process_file(writer, input_path)
+    elif os.path.isdir(input_path) and parallel:
+        process_folder_parallel(conn, input_path, workers, batch_size)
     elif os.path.isdir(input_path):
-        process_folder(cursor, input_path)
+        process_folder(writer, input_path)
     else:
-        print("Invalid input path. Please provide a valid file or folder.")
+        print("Invalid input path. Please provide a valid zip archive, file or folder.")
         conn.close()
         return
 
     # Commit changes
     conn.commit()
 
+    # Build the full text index on first import, later imports keep it in sync via triggers
+    create_search_index(conn)
+
     # Get total records inserted
     cursor.execute("SELECT COUNT(*) FROM json_data")
     total_records = cursor.fetchone()[0]
@@ -187,10 +671,18 @@ def main(input_path):
     print(f"Total running time: {total_time:.2f} seconds")
 
 if __name__ == '__main__':
-    # Ensure the path is provided as a command-line argument
-    if len(sys.argv) < 2:
-        print("Usage: python import_json_sqlite.py <path_to_json_file_or_folder>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Import Kaggle JSON files into SQLite.")
+    parser.add_argument('input_path',
+                        help="path to a JSON file, a folder of JSON files or the dataset zip archive")
+    parser.add_argument('--parallel', action='store_true',
+                        help="parse files in a process pool and bulk insert them")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of parser processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="records per transaction in parallel mode")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only import new or changed files, tracked in import_manifest; "
+                             "an interrupted run resumes where it stopped")
+    args = parser.parse_args()
 
-    input_path = sys.argv[1]
-    main(input_path)
+    main(args.input_path, args.parallel, args.workers, args.batch_size, args.incremental)
@@ -0,0 +1,315 @@
+import argparse
+import os
+import sqlite3
+import time
+
+# Optional: inotify_simple gives instant, per-file updates on Linux
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+# Paths for local content
+IMAGE_PATH = "./suno-ai-music-prompts/image"
+AUDIO_PATH = "./suno-ai-music-prompts/audio"
+
+# kind -> (folder, file extension, json_data flag column)
+MEDIA_KINDS = {
+    'image': (IMAGE_PATH, '.jpeg', 'local_image'),
+    'audio': (AUDIO_PATH, '.mp3', 'local_audio'),
+}
+
+# Seconds between directory mtime checks when inotify is not available
+DEFAULT_POLL_INTERVAL = 30
+
+def create_inventory_tables(cursor):
+    """
+    Create the media inventory and the table remembering each folder's mtime at its last scan.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_inventory (
+            id TEXT,
+            kind TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            PRIMARY KEY (id, kind)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_folders (
+            kind TEXT PRIMARY KEY,
+            path TEXT,
+            mtime_ns INTEGER,
+            scanned_at TEXT
+        )
+    ''')
+
+def ensure_local_flags(cursor):
+    """
+    Add the local_image/local_audio columns to json_data if they are missing.
+    """
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(json_data)')}
+    for _, _, column in MEDIA_KINDS.values():
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE json_data ADD COLUMN {column} BOOLEAN DEFAULT FALSE')
+
+def scan_media(path, extension):
+    """
+    Yield (song_id,) for every media file with one directory scan.
+    Presence needs no stat call; stat_media reads the size of the files that need it.
+    """
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.endswith(extension):
+                    yield (entry.name[:-len(extension)],)
+    except FileNotFoundError:
+        return
+
+def stat_media(path, extension, song_ids):
+    """
+    Yield (size, mtime_ns, song_id) for the given files, skipping those removed since the scan.
+    """
+    for song_id in song_ids:
+        try:
+            stat = os.stat(os.path.join(path, song_id + extension))
+        except FileNotFoundError:
+            continue
+        yield stat.st_size, stat.st_mtime_ns, song_id
+
+def folder_mtime(path):
+    """
+    Return the folder's mtime in nanoseconds, or None if it does not exist.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def refresh_kind(conn, kind, force=False):
+    """
+    Bring the inventory of one media kind up to date and flip the json_data flags
+    of the songs whose files appeared or disappeared.
+    The folder is only rescanned when its mtime differs from the last scan
+    (files were added, removed or renamed) or when force is set. Only new files
+    are stat'ed for their size and mtime, every file when forced.
+    Returns (added, removed, changed) counts, or None if the scan was skipped.
+    """
+    path, extension, flag_column = MEDIA_KINDS[kind]
+    cursor = conn.cursor()
+
+    # Read the mtime before scanning, so changes made during the scan trigger another one
+    mtime_ns = folder_mtime(path)
+    known = cursor.execute('SELECT mtime_ns FROM media_folders WHERE kind = ?', (kind,)).fetchone()
+    if not force and known and known[0] == mtime_ns:
+        return None
+
+    cursor.execute('DROP TABLE IF EXISTS temp.scanned_media')
+    cursor.execute('CREATE TEMP TABLE scanned_media (id TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER) WITHOUT ROWID')
+    cursor.executemany('INSERT OR IGNORE INTO temp.scanned_media (id) VALUES (?)', scan_media(path, extension))
+
+    # Size and mtime of the new files; known files keep their inventory entry
+    if force:
+        to_stat = cursor.execute('SELECT id FROM temp.scanned_media').fetchall()
+    else:
+        to_stat = cursor.execute('''
+            SELECT id FROM temp.scanned_media
+            WHERE id NOT IN (SELECT id FROM media_inventory WHERE kind = ?)
+        ''', (kind,)).fetchall()
+    cursor.executemany(
+        'UPDATE temp.scanned_media SET size = ?, mtime_ns = ? WHERE id = ?',
+        list(stat_media(path, extension, [row[0] for row in to_stat]))
+    )
+    # New files that were removed again before they could be stat'ed
+    cursor.execute('''
+        DELETE FROM temp.scanned_media
+        WHERE size IS NULL AND id NOT IN (SELECT id FROM media_inventory WHERE kind = ?)
+    ''', (kind,))
+
+    # Remember which songs gain or lose their file before the inventory is updated
+    cursor.execute('DROP TABLE IF EXISTS temp.media_added')
+    cursor.execute('DROP TABLE IF EXISTS temp.media_removed')
+    cursor.execute('''
+        CREATE TEMP TABLE media_added AS
+        SELECT id FROM temp.scanned_media
+        WHERE id NOT IN (SELECT id FROM media_inventory WHERE kind = ?)
+    ''', (kind,))
+    cursor.execute('''
+        CREATE TEMP TABLE media_removed AS
+        SELECT id FROM media_inventory
+        WHERE kind = ? AND id NOT IN (SELECT id FROM temp.scanned_media)
+    ''', (kind,))
+
+    cursor.execute('''
+        INSERT INTO media_inventory (id, kind, size, mtime_ns)
+        SELECT id, ?, size, mtime_ns FROM temp.scanned_media WHERE size IS NOT NULL
+        ON CONFLICT (id, kind) DO UPDATE SET
+            size = excluded.size,
+            mtime_ns = excluded.mtime_ns
+        WHERE size != excluded.size OR mtime_ns != excluded.mtime_ns
+    ''', (kind,))
+    changed = cursor.rowcount
+    cursor.execute('''
+        DELETE FROM media_inventory
+        WHERE kind = ? AND id IN (SELECT id FROM temp.media_removed)
+    ''', (kind,))
+
+    cursor.execute(f'UPDATE json_data SET {flag_column} = 1 WHERE id IN (SELECT id FROM temp.media_added)')
+    cursor.execute(f'UPDATE json_data SET {flag_column} = 0 WHERE id IN (SELECT id FROM temp.media_removed)')
+
+    added = cursor.execute('SELECT COUNT(*) FROM temp.media_added').fetchone()[0]
+    removed = cursor.execute('SELECT COUNT(*) FROM temp.media_removed').fetchone()[0]
+    cursor.execute('''
+        INSERT OR REPLACE INTO media_folders (kind, path, mtime_ns, scanned_at)
+        VALUES (?, ?, ?, datetime('now'))
+    ''', (kind, os.path.abspath(path), mtime_ns))
+    conn.commit()
+
+    return added, removed, changed - added
+
+def sync_local_flags(conn):
+    """
+    Derive every json_data local flag from the inventory in one statement,
+    touching only rows whose flags are wrong.
+    """
+    cursor = conn.cursor()
+    assignments = []
+    mismatches = []
+    for kind, (_, _, flag_column) in MEDIA_KINDS.items():
+        in_inventory = f"id IN (SELECT id FROM media_inventory WHERE kind = '{kind}')"
+        assignments.append(f"{flag_column} = {in_inventory}")
+        mismatches.append(f"{flag_column} IS NOT ({in_inventory})")
+
+    cursor.execute(f'''
+        UPDATE json_data
+        SET {", ".join(assignments)}
+        WHERE {" OR ".join(mismatches)}
+    ''')
+    conn.commit()
+    return cursor.rowcount
+
+def refresh_inventory(conn, force=False):
+    """
+    Refresh every media kind, printing what changed.
+    """
+    cursor = conn.cursor()
+    create_inventory_tables(cursor)
+    ensure_local_flags(cursor)
+
+    for kind in MEDIA_KINDS:
+        result = refresh_kind(conn, kind, force)
+        if result is None:
+            print(f"{kind}: folder unchanged, scan skipped")
+        else:
+            added, removed, changed = result
+            print(f"{kind}: {added} added, {removed} removed, {changed} changed")
+
+def apply_file_events(conn, kind, names):
+    """
+    Update the inventory and flags for individual files reported by inotify.
+    """
+    path, extension, flag_column = MEDIA_KINDS[kind]
+    cursor = conn.cursor()
+
+    for name in names:
+        if not name.endswith(extension):
+            continue
+        song_id = name[:-len(extension)]
+        try:
+            stat = os.stat(os.path.join(path, name))
+        except FileNotFoundError:
+            cursor.execute('DELETE FROM media_inventory WHERE id = ? AND kind = ?', (song_id, kind))
+            cursor.execute(f'UPDATE json_data SET {flag_column} = 0 WHERE id = ?', (song_id,))
+            continue
+        cursor.execute('''
+            INSERT OR REPLACE INTO media_inventory (id, kind, size, mtime_ns)
+            VALUES (?, ?, ?, ?)
+        ''', (song_id, kind, stat.st_size, stat.st_mtime_ns))
+        cursor.execute(f'UPDATE json_data SET {flag_column} = 1 WHERE id = ?', (song_id,))
+
+    cursor.execute(
+        'UPDATE media_folders SET mtime_ns = ?, scanned_at = datetime(\'now\') WHERE kind = ?',
+        (folder_mtime(path), kind)
+    )
+    conn.commit()
+
+def watch_inotify(conn):
+    """
+    Apply file changes as inotify reports them.
+    """
+    inotify = INotify()
+    watch_flags = (inotify_flags.CLOSE_WRITE | inotify_flags.DELETE |
+                   inotify_flags.MOVED_FROM | inotify_flags.MOVED_TO)
+    kinds = {}
+    for kind, (path, _, _) in MEDIA_KINDS.items():
+        if os.path.isdir(path):
+            kinds[inotify.add_watch(path, watch_flags)] = kind
+
+    print("Watching media folders with inotify")
+    while True:
+        # Collect events for a second so bursts of downloads are written together
+        changes = {}
+        overflow = False
+        for event in inotify.read(read_delay=1000):
+            if event.mask & inotify_flags.Q_OVERFLOW:
+                overflow = True  # Events were dropped (wd -1), the changes are unknown
+            elif event.wd in kinds:
+                changes.setdefault(kinds[event.wd], set()).add(event.name)
+        if overflow:
+            for kind in kinds.values():
+                added, removed, changed = refresh_kind(conn, kind, force=True)
+                print(f"{kind}: event queue overflowed, rescanned: "
+                      f"{added} added, {removed} removed, {changed} changed")
+            continue
+        for kind, names in changes.items():
+            apply_file_events(conn, kind, names)
+            print(f"{kind}: {len(names)} files updated")
+
+def watch_polling(conn, interval):
+    """
+    Re-check the folder mtimes every interval seconds and rescan the ones that changed.
+    """
+    print(f"Watching media folders every {interval} seconds")
+    while True:
+        time.sleep(interval)
+        for kind in MEDIA_KINDS:
+            result = refresh_kind(conn, kind)
+            if result is not None:
+                added, removed, changed = result
+                print(f"{kind}: {added} added, {removed} removed, {changed} changed")
+
+def main(db_path, watch=False, interval=DEFAULT_POLL_INTERVAL, force=False):
+    """
+    Refresh the media inventory once, then optionally keep watching for changes.
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = WAL')  # Let the apps read while the watcher writes
+
+    refresh_inventory(conn, force)
+    # Also fix flags never derived from the inventory, e.g. of songs imported since
+    print(f"Local content flags updated for {sync_local_flags(conn)} songs")
+    print(f"Media inventory refreshed in {time.time() - start_time:.2f} seconds")
+
+    if watch:
+        try:
+            if INotify is not None:
+                watch_inotify(conn)
+            else:
+                watch_polling(conn, interval)
+        except KeyboardInterrupt:
+            pass
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Track the local media files and keep the local_* flags current.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and apply changes as files are added or removed")
+    parser.add_argument('--interval', type=int, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between checks when inotify_simple is not installed")
+    parser.add_argument('--full', action='store_true',
+                        help="rescan every folder even if its mtime is unchanged")
+    args = parser.parse_args()
+
+    main(args.db, args.watch, args.interval, args.full)
@@ -0,0 +1,415 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds: latencies in seconds, result sizes in rows
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000, 10000)
+
+# Label combinations per metric; later ones are counted under "other" to bound memory
+MAX_SERIES = 1000
+
+# Opt-in slow query log: queries taking at least SLOW_QUERY_MS milliseconds are
+# logged with their bound parameters, to SLOW_QUERY_LOG or stderr
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 0))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Query plans are looked up once per distinct statement
+MAX_CACHED_PLANS = 1024
+
+slow_query_log = logging.getLogger('slow_queries')
+
+def escape_label(value):
+    """
+    Escape a label value for the text format.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value):
+    """
+    Format a sample value for the text format.
+    """
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram with labels.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record one value for the given label values.
+        """
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= MAX_SERIES:
+                    key = ('other',) * len(self.label_names)
+                series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Return the histogram in the text exposition format.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._series.items())]
+        for key, counts, total, count in series:
+            labels = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, key))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {format_value(total)}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return "\n".join(lines)
+
+class Registry:
+    """
+    The metrics of this process.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def histogram(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        """
+        Return the histogram called name, creating it on first use.
+        """
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = Histogram(name, help_text, label_names, buckets)
+        return metric
+
+    def render(self):
+        """
+        Return every metric in the text exposition format.
+        """
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+REGISTRY = Registry()
+
+QUERY_SECONDS = REGISTRY.histogram(
+    'sqlite_query_duration_seconds', "Time spent executing a query and fetching its rows.", ['query', 'plan'])
+QUERY_ROWS = REGISTRY.histogram(
+    'sqlite_query_rows', "Rows returned per query.", ['query', 'plan'], ROW_BUCKETS)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', "Request latency, until the response is fully sent.",
+    ['app', 'endpoint', 'status'])
+PHASE_SECONDS = REGISTRY.histogram(
+    'request_phase_duration_seconds', "Time per request spent in each phase (sql, render).", ['app', 'phase'])
+
+def query_label(sql):
+    """
+    Return a short, stable label for a statement: its start and a checksum of the whole text.
+    """
+    text = re.sub(r'\s+', ' ', sql).strip()
+    if len(text) <= 80:
+        return text
+    return f"{text[:80]}... #{zlib.crc32(text.encode()):08x}"
+
+def classify_plan(details):
+    """
+    Reduce EXPLAIN QUERY PLAN details to the costliest access: table_scan,
+    temp_sort, fts, index_scan or index_search.
+    """
+    kinds = set()
+    for detail in details:
+        if detail.startswith('SCAN') and 'VIRTUAL TABLE' in detail:
+            kinds.add('fts')
+        elif detail.startswith('SCAN') and 'INDEX' in detail:
+            kinds.add('index_scan')
+        elif detail.startswith('SCAN') and 'CONSTANT ROW' not in detail:
+            kinds.add('table_scan')
+        elif detail.startswith('SEARCH'):
+            kinds.add('index_search')
+        elif 'TEMP B-TREE' in detail:
+            kinds.add('temp_sort')
+    for kind in ('table_scan', 'temp_sort', 'fts', 'index_scan', 'index_search'):
+        if kind in kinds:
+            return kind
+    return 'other'
+
+_plans = {}
+
+def plan_type(conn, sql, parameters):
+    """
+    Return the plan type of a SELECT, looked up once per statement text.
+    Other statements are reported as "none".
+    """
+    plan = _plans.get(sql)
+    if plan is None:
+        head = sql.lstrip()[:6].upper()
+        if not head.startswith(('SELECT', 'WITH')):
+            plan = 'none'
+        else:
+            try:
+                # A plain cursor, so the lookup itself is not traced
+                rows = sqlite3.Cursor(conn).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+                plan = classify_plan([row[3] for row in rows])
+            except sqlite3.Error:
+                plan = 'unknown'
+        if len(_plans) >= MAX_CACHED_PLANS:
+            _plans.clear()
+        _plans[sql] = plan
+    return plan
+
+def record_query(conn, sql, parameters, seconds, rows, statement):
+    """
+    Add a finished query to the metrics and to the slow query log.
+    statement is the text traced by SQLite, with the parameters filled in.
+    """
+    plan = plan_type(conn, sql, parameters)
+    label = query_label(sql)
+    QUERY_SECONDS.observe(seconds, query=label, plan=plan)
+    QUERY_ROWS.observe(rows, query=label, plan=plan)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        slow_query_log.warning("%.1f ms, %d rows, %s: %s", seconds * 1000, rows, plan,
+                               re.sub(r'\s+', ' ', statement or sql).strip())
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor timing each query from execute until its last row is fetched
+    (or the cursor is reused, closed or released) and counting the rows.
+    """
+
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start_time = time.perf_counter()
+        super().execute(sql, parameters)
+        self._query = [sql, parameters, time.perf_counter() - start_time, 0,
+                       getattr(self.connection, 'last_statement', None)]
+        if self.description is None:
+            self._finish()  # Nothing to fetch
+        return self
+
+    def _fetched(self, start_time, rows, done):
+        if self._query is not None:
+            self._query[2] += time.perf_counter() - start_time
+            self._query[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        query, self._query = self._query, None
+        if query is not None:
+            self.connection.record(query)
+
+    def fetchone(self):
+        start_time = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start_time, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start_time = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(start_time, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start_time = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start_time, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start_time = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start_time, 0, True)
+            raise
+        self._fetched(start_time, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Queries read only partly, e.g. execute(...).fetchone(). Finalizers may run
+        # during garbage collection in any thread, so the query is only queued here
+        # and its plan is looked up by the connection's next query
+        query, self._query = self._query, None
+        if query is not None:
+            try:
+                self.connection.pending_queries.append(query)
+            except Exception:
+                pass
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors record query metrics. The SQLite trace callback
+    keeps the last statement with its bound parameters for the slow query log.
+    Use as sqlite3.connect(..., factory=TracedConnection).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_statement = None
+        # Queries finished by a cursor finalizer, recorded later (see TracedCursor.__del__)
+        self.pending_queries = deque()
+        if SLOW_QUERY_MS:
+            self.set_trace_callback(self._trace)
+
+    def _trace(self, statement):
+        # Trigger bodies are traced as "-- TRIGGER ..." after their statement
+        if not statement.startswith('--'):
+            self.last_statement = statement
+
+    def record(self, query):
+        """
+        Record a finished [sql, parameters, seconds, rows, statement] query,
+        after the queued ones.
+        """
+        self._record_pending()
+        record_query(self, *query)
+
+    def _record_pending(self):
+        while True:
+            try:
+                query = self.pending_queries.popleft()
+            except IndexError:
+                return
+            record_query(self, *query)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def close(self):
+        self._record_pending()
+        super().close()
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+@contextmanager
+def track_phase(app, phase):
+    """
+    Time a block as one phase of a request.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.observe(time.perf_counter() - start_time, app=app, phase=phase)
+
+@contextmanager
+def track_request(app, endpoint):
+    """
+    Time a request handled by the block; failed requests are labelled "error",
+    abandoned ones (e.g. a streamed search replaced by a new one) "cancelled".
+    """
+    start_time = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except GeneratorExit:
+        status = 'cancelled'
+        raise
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start_time, app=app, endpoint=endpoint, status=status)
+
+def instrument_flask(flask_app, app_name):
+    """
+    Record the latency of every request of a Flask app, including the time to
+    stream its body, and serve the metrics of the process at /metrics.
+    """
+    from flask import Response, g, request
+
+    @flask_app.before_request
+    def start_timer():
+        g.request_start_time = time.perf_counter()
+
+    @flask_app.after_request
+    def stop_timer(response):
+        start_time = g.get('request_start_time')
+        if start_time is not None:
+            endpoint = request.endpoint or 'not_found'
+            status = response.status_code
+            def observe():
+                REQUEST_SECONDS.observe(time.perf_counter() - start_time,
+                                        app=app_name, endpoint=endpoint, status=status)
+            if response.direct_passthrough:
+                # Files are handed to the server as they are (possibly sent zero-copy)
+                # and close callbacks are skipped, so stop once the response is ready
+                observe()
+            else:
+                # Runs once the server has sent the whole (possibly streamed) body
+                response.call_on_close(observe)
+        return response
+
+    flask_app.add_url_rule('/metrics', 'metrics', lambda: Response(REGISTRY.render(), content_type=CONTENT_TYPE))
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the metrics at /metrics."""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve /metrics from a background thread, for apps that cannot add a route.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def enable_slow_query_log(threshold_ms, path=None):
+    """
+    Log queries taking at least threshold_ms milliseconds to path (default stderr).
+    Connections opened afterwards also log the statement with its parameters.
+    """
+    global SLOW_QUERY_MS
+    SLOW_QUERY_MS = threshold_ms
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s slow query %(message)s'))
+    slow_query_log.addHandler(handler)
+    slow_query_log.setLevel(logging.WARNING)
+    slow_query_log.propagate = False
+
+if SLOW_QUERY_MS:
+    enable_slow_query_log(SLOW_QUERY_MS, SLOW_QUERY_LOG)
@@ -0,0 +1,264 @@
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from downloader import DEFAULT_PER_HOST, DEFAULT_RETRIES, DEFAULT_WORKERS, Downloader
+from media_inventory import MEDIA_KINDS, create_inventory_tables, ensure_local_flags
+
+# kind -> json_data column holding the remote URL
+URL_COLUMNS = {'image': 'image_url', 'audio': 'audio_url'}
+
+# Default global limit in requests per second
+DEFAULT_RATE = 10.0
+
+# Seconds between progress reports, and results written per transaction
+REPORT_INTERVAL = 10
+COMMIT_EVERY = 100
+
+def create_job_table(cursor):
+    """
+    Create the persistent download queue, one job per song and media kind.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mirror_jobs (
+            song_id TEXT,
+            kind TEXT,
+            url TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            size INTEGER,
+            error TEXT,
+            queued_at TEXT,
+            finished_at TEXT,
+            PRIMARY KEY (song_id, kind)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_mirror_jobs_pending
+        ON mirror_jobs (status) WHERE status = 'pending'
+    ''')
+
+def queue_jobs(conn, kinds, top_n=None, language=None, model=None):
+    """
+    Queue every missing asset of the selected songs: all of them, or the top_n most
+    played per language, optionally of one language and model. Assets with a local
+    copy or a queued job are skipped; finished jobs whose file has since been
+    removed are queued again. Returns the number of jobs queued.
+    """
+    conditions = ["1"]
+    params = []
+    if language:
+        conditions.append("meta_prompt_lang = ?")
+        params.append(language)
+    if model:
+        conditions.append("model_name = ?")
+        params.append(model)
+
+    songs = f"SELECT * FROM json_data WHERE {' AND '.join(conditions)}"
+    if top_n:
+        songs = f'''
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY meta_prompt_lang ORDER BY play_count DESC, id
+                ) AS language_rank
+                FROM json_data WHERE {' AND '.join(conditions)}
+            ) WHERE language_rank <= ?
+        '''
+        params.append(top_n)
+
+    cursor = conn.cursor()
+    queued = 0
+    for kind in kinds:
+        flag_column = MEDIA_KINDS[kind][2]
+        url_column = URL_COLUMNS[kind]
+        cursor.execute(f'''
+            INSERT INTO mirror_jobs (song_id, kind, url, queued_at)
+            SELECT id, ?, {url_column}, datetime('now') FROM ({songs})
+            WHERE {url_column} IS NOT NULL AND {url_column} != ''
+              AND NOT COALESCE({flag_column}, 0)
+            ON CONFLICT (song_id, kind) DO UPDATE SET
+                status = 'pending', url = excluded.url, queued_at = excluded.queued_at
+            WHERE status = 'done'
+        ''', [kind] + params)
+        queued += cursor.rowcount
+    conn.commit()
+    return queued
+
+def recover_jobs(conn, retry_failed=False):
+    """
+    Put jobs left running by an interrupted run (and optionally failed jobs) back in the queue.
+    """
+    statuses = "('running', 'failed')" if retry_failed else "('running')"
+    cursor = conn.execute(f"UPDATE mirror_jobs SET status = 'pending' WHERE status IN {statuses}")
+    conn.commit()
+    return cursor.rowcount
+
+def claim_jobs(conn, limit):
+    """
+    Mark up to limit pending jobs as running and return them as (song_id, kind, url).
+    """
+    jobs = conn.execute('''
+        SELECT song_id, kind, url FROM mirror_jobs
+        WHERE status = 'pending' LIMIT ?
+    ''', (limit,)).fetchall()
+    conn.executemany(
+        "UPDATE mirror_jobs SET status = 'running', attempts = attempts + 1 WHERE song_id = ? AND kind = ?",
+        [(song_id, kind) for song_id, kind, _ in jobs]
+    )
+    conn.commit()
+    return jobs
+
+def asset_path(song_id, kind):
+    """
+    Return the local path of a song's media file, as read by media_inventory.py and the apps.
+    """
+    folder, extension, _ = MEDIA_KINDS[kind]
+    return os.path.join(folder, f"{song_id}{extension}")
+
+def record_result(cursor, song_id, kind, result):
+    """
+    Store a download result; completed files are added to the media inventory
+    and set the song's local flag.
+    """
+    if result.status == 'failed':
+        cursor.execute('''
+            UPDATE mirror_jobs SET status = 'failed', error = ?, finished_at = datetime('now')
+            WHERE song_id = ? AND kind = ?
+        ''', (str(result.error), song_id, kind))
+        return
+
+    cursor.execute('''
+        UPDATE mirror_jobs SET status = 'done', size = ?, error = NULL, finished_at = datetime('now')
+        WHERE song_id = ? AND kind = ?
+    ''', (result.size, song_id, kind))
+    stat = os.stat(result.path)
+    cursor.execute('''
+        INSERT OR REPLACE INTO media_inventory (id, kind, size, mtime_ns)
+        VALUES (?, ?, ?, ?)
+    ''', (song_id, kind, stat.st_size, stat.st_mtime_ns))
+    cursor.execute(f'UPDATE json_data SET {MEDIA_KINDS[kind][2]} = 1 WHERE id = ?', (song_id,))
+
+def queue_counts(conn):
+    """
+    Return {status: job count}.
+    """
+    return dict(conn.execute('SELECT status, COUNT(*) FROM mirror_jobs GROUP BY status').fetchall())
+
+def report_progress(done, failed, total_bytes, remaining, start_time):
+    """
+    Print throughput and the estimated time to drain the queue.
+    """
+    elapsed = max(time.time() - start_time, 0.001)
+    rate = done / elapsed
+    eta = f"{remaining / rate / 60:.1f} min" if rate else "unknown"
+    print(f"{done} files done, {failed} failed, {remaining} left | "
+          f"{rate:.1f} files/s, {total_bytes / elapsed / 2**20:.2f} MB/s | ETA {eta}")
+
+def drain_queue(conn, downloader):
+    """
+    Download every pending job with the downloader's worker pool.
+    Only this thread touches the database; workers just download.
+    Returns (done, failed, bytes) of this run.
+    """
+    cursor = conn.cursor()
+    remaining = queue_counts(conn).get('pending', 0)
+    done = failed = total_bytes = pending_writes = 0
+    start_time = last_report = time.time()
+
+    executor = ThreadPoolExecutor(max_workers=downloader.workers)
+    in_flight = {}
+    try:
+        while True:
+            # Keep a few jobs per worker queued, claiming more as they finish
+            if len(in_flight) < downloader.workers * 2:
+                for song_id, kind, url in claim_jobs(conn, downloader.workers * 4 - len(in_flight)):
+                    future = executor.submit(downloader.fetch, url, asset_path(song_id, kind))
+                    in_flight[future] = (song_id, kind)
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, timeout=REPORT_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                song_id, kind = in_flight.pop(future)
+                result = future.result()
+                record_result(cursor, song_id, kind, result)
+                remaining -= 1
+                pending_writes += 1
+                if result.status == 'failed':
+                    failed += 1
+                    print(f"Failed {song_id} {kind}: {result.error}")
+                else:
+                    done += 1
+                    if result.status == 'downloaded':
+                        total_bytes += result.size
+
+            if pending_writes >= COMMIT_EVERY or not in_flight:
+                conn.commit()
+                pending_writes = 0
+            if time.time() - last_report >= REPORT_INTERVAL:
+                report_progress(done, failed, total_bytes, remaining, start_time)
+                last_report = time.time()
+    except KeyboardInterrupt:
+        # Drop the queued downloads; their jobs stay running and are resumed next run
+        executor.shutdown(wait=False, cancel_futures=True)
+        conn.commit()
+        raise
+    executor.shutdown()
+
+    conn.commit()
+    report_progress(done, failed, total_bytes, 0, start_time)
+    return done, failed, total_bytes
+
+def main(db_path, kinds, top_n=None, language=None, model=None, workers=DEFAULT_WORKERS,
+         per_host=DEFAULT_PER_HOST, rate=DEFAULT_RATE, retries=DEFAULT_RETRIES, retry_failed=False,
+         queue_only=False):
+    """
+    Queue the missing assets of the selected songs, then drain the queue.
+    Safe to interrupt: the next run resumes with the unfinished jobs.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = WAL')  # Let the apps read while the mirror writes
+    cursor = conn.cursor()
+    create_inventory_tables(cursor)
+    ensure_local_flags(cursor)
+    create_job_table(cursor)
+
+    recovered = recover_jobs(conn, retry_failed)
+    queued = queue_jobs(conn, kinds, top_n, language, model)
+    print(f"Queued {queued} new jobs, {recovered} resumed: {queue_counts(conn)}")
+
+    if not queue_only:
+        for folder, _, _ in (MEDIA_KINDS[kind] for kind in kinds):
+            os.makedirs(folder, exist_ok=True)
+        downloader = Downloader(workers=workers, per_host=per_host, retries=retries, rate=rate)
+        try:
+            drain_queue(conn, downloader)
+        except KeyboardInterrupt:
+            print("Interrupted, run again to resume")
+        print(f"Queue: {queue_counts(conn)}")
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mirror the catalog's audio and images for offline serving.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--kinds', default='audio,image', help="comma separated media kinds to mirror")
+    parser.add_argument('--top-n', type=int, help="only the N most played songs per language")
+    parser.add_argument('--language', help="only songs with this prompt language")
+    parser.add_argument('--model', help="only songs of this model")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="concurrent downloads")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help="concurrent downloads per host")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="global limit in requests per second")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="retries per file, with backoff")
+    parser.add_argument('--retry-failed', action='store_true', help="queue failed jobs again")
+    parser.add_argument('--queue-only', action='store_true', help="queue the jobs without downloading")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+    for kind in kinds:
+        if kind not in MEDIA_KINDS:
+            parser.error(f"unknown media kind: {kind}")
+
+    main(args.db, kinds, args.top_n, args.language, args.model, args.workers,
+         args.per_host, args.rate, args.retries, args.retry_failed, args.queue_only)
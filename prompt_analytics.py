@@ -0,0 +1,262 @@
+import argparse
+import sqlite3
+import time
+
+from change_log import create_change_log, current_seq, load_changed_songs
+
+# dimension name -> json_data column it groups by
+DIMENSIONS = {
+    'template': 'template_hash',
+    'template_length': 'template_length',
+    'language': 'meta_prompt_lang',
+    'model': 'model_name',
+}
+
+# Songs kept per dimension value in prompt_stats_top
+TOP_K = 10
+
+# Columns of prompt_stats that results can be ordered by
+STAT_COLUMNS = [
+    'song_count', 'mean_play_count', 'mean_upvote_count',
+    'p50_play_count', 'p90_play_count', 'p99_play_count', 'max_play_count',
+]
+
+def create_analytics_tables(cursor):
+    """
+    Create the summary tables and the per-song membership table they are computed from.
+    """
+    # One row per song and dimension value it belongs to (one per distinct tag)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_members (
+            dimension TEXT,
+            value,
+            song_id TEXT,
+            play_count INTEGER,
+            upvote_count INTEGER,
+            PRIMARY KEY (dimension, value, song_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_analytics_members_song
+        ON analytics_members (song_id)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_stats (
+            dimension TEXT,
+            value,
+            song_count INTEGER,
+            mean_play_count REAL,
+            mean_upvote_count REAL,
+            p50_play_count INTEGER,
+            p90_play_count INTEGER,
+            p99_play_count INTEGER,
+            max_play_count INTEGER,
+            refreshed_at TEXT,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_stats_top (
+            dimension TEXT,
+            value,
+            rank INTEGER,
+            song_id TEXT,
+            play_count INTEGER,
+            PRIMARY KEY (dimension, value, rank)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_state (
+            key TEXT PRIMARY KEY,
+            value
+        )
+    ''')
+
+def table_exists(cursor, name):
+    """
+    Return True if the database has a table with this name.
+    """
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def member_select(cursor, song_filter):
+    """
+    Build the SELECT producing analytics_members rows for the songs matched by song_filter.
+    Dimensions whose columns have not been created yet are skipped.
+    """
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(json_data)')}
+    upvote = 'j.upvote_count' if 'upvote_count' in columns else 'NULL'
+
+    selects = []
+    for dimension, column in DIMENSIONS.items():
+        if column in columns:
+            selects.append(f'''
+                SELECT '{dimension}', j.{column}, j.id, COALESCE(j.play_count, 0), {upvote}
+                FROM json_data j
+                WHERE j.{column} IS NOT NULL AND {song_filter}
+            ''')
+    if table_exists(cursor, 'prompt_instructions'):
+        selects.append(f'''
+            SELECT DISTINCT 'tag', p.normalized_tag, j.id, COALESCE(j.play_count, 0), {upvote}
+            FROM json_data j
+            JOIN prompt_instructions p ON p.song_id = j.id
+            WHERE {song_filter}
+        ''')
+    return " UNION ALL ".join(selects)
+
+def recompute_stats(cursor, top_k=TOP_K):
+    """
+    Recompute prompt_stats and prompt_stats_top for the keys in temp.affected_keys.
+    Percentiles use the nearest-rank method over play_count.
+    """
+    cursor.execute('''
+        DELETE FROM prompt_stats
+        WHERE (dimension, value) IN (SELECT dimension, value FROM temp.affected_keys)
+    ''')
+    cursor.execute('''
+        DELETE FROM prompt_stats_top
+        WHERE (dimension, value) IN (SELECT dimension, value FROM temp.affected_keys)
+    ''')
+    cursor.execute('''
+        INSERT INTO prompt_stats
+        SELECT dimension, value, MAX(n), AVG(play_count), AVG(upvote_count),
+               MAX(CASE WHEN rn = CAST((n - 1) * 0.50 AS INTEGER) + 1 THEN play_count END),
+               MAX(CASE WHEN rn = CAST((n - 1) * 0.90 AS INTEGER) + 1 THEN play_count END),
+               MAX(CASE WHEN rn = CAST((n - 1) * 0.99 AS INTEGER) + 1 THEN play_count END),
+               MAX(play_count),
+               datetime('now')
+        FROM (
+            SELECT m.dimension, m.value, m.play_count, m.upvote_count,
+                   ROW_NUMBER() OVER (PARTITION BY m.dimension, m.value ORDER BY m.play_count) AS rn,
+                   COUNT(*) OVER (PARTITION BY m.dimension, m.value) AS n
+            FROM analytics_members m
+            JOIN temp.affected_keys k ON k.dimension = m.dimension AND k.value = m.value
+        )
+        GROUP BY dimension, value
+    ''')
+    cursor.execute('''
+        INSERT INTO prompt_stats_top
+        SELECT dimension, value, rank, song_id, play_count
+        FROM (
+            SELECT m.dimension, m.value, m.song_id, m.play_count,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY m.dimension, m.value ORDER BY m.play_count DESC, m.song_id
+                   ) AS rank
+            FROM analytics_members m
+            JOIN temp.affected_keys k ON k.dimension = m.dimension AND k.value = m.value
+        )
+        WHERE rank <= ?
+    ''', (top_k,))
+
+def refresh_analytics(conn, full=False, top_k=TOP_K):
+    """
+    Bring the summary tables up to date.
+    The first run (or full=True) builds everything; later runs only recompute the
+    dimension values touched by songs inserted, updated or deleted since the last
+    refresh, by any script (see change_log.py). Run it after update_db_interesting_prompts.py
+    so templates and tags are set. Returns the number of dimension values recomputed.
+    """
+    cursor = conn.cursor()
+    create_analytics_tables(cursor)
+    # Without a change log, earlier changes are unknown and everything is rebuilt
+    new_log = create_change_log(cursor)
+
+    state = dict(cursor.execute('SELECT key, value FROM analytics_state').fetchall())
+    last_seq = current_seq(cursor)
+
+    cursor.execute('DROP TABLE IF EXISTS temp.affected_keys')
+    cursor.execute('CREATE TEMP TABLE affected_keys (dimension TEXT, value, PRIMARY KEY (dimension, value))')
+
+    if full or new_log or 'built_at' not in state or 'last_change_seq' not in state:
+        cursor.execute('DELETE FROM analytics_members')
+        cursor.execute(f'INSERT INTO analytics_members {member_select(cursor, "1")}')
+        cursor.execute('INSERT OR IGNORE INTO temp.affected_keys SELECT dimension, value FROM prompt_stats')
+        cursor.execute('INSERT OR IGNORE INTO temp.affected_keys SELECT DISTINCT dimension, value FROM analytics_members')
+    else:
+        if not load_changed_songs(cursor, state['last_change_seq'], last_seq):
+            conn.commit()
+            return 0
+        song_filter = 'j.id IN (SELECT id FROM temp.changed_songs)'
+        # Values the changed songs belonged to before and belong to now;
+        # deleted songs are no longer in json_data and just leave their values
+        cursor.execute('''
+            INSERT OR IGNORE INTO temp.affected_keys
+            SELECT dimension, value FROM analytics_members
+            WHERE song_id IN (SELECT id FROM temp.changed_songs)
+        ''')
+        cursor.execute('DELETE FROM analytics_members WHERE song_id IN (SELECT id FROM temp.changed_songs)')
+        cursor.execute(f'INSERT INTO analytics_members {member_select(cursor, song_filter)}')
+        cursor.execute('''
+            INSERT OR IGNORE INTO temp.affected_keys
+            SELECT dimension, value FROM analytics_members
+            WHERE song_id IN (SELECT id FROM temp.changed_songs)
+        ''')
+
+    recompute_stats(cursor, top_k)
+    affected = cursor.execute('SELECT COUNT(*) FROM temp.affected_keys').fetchone()[0]
+    cursor.execute("INSERT OR REPLACE INTO analytics_state VALUES ('built_at', datetime('now'))")
+    cursor.execute("INSERT OR REPLACE INTO analytics_state VALUES ('last_change_seq', ?)", (last_seq,))
+    conn.commit()
+    return affected
+
+def get_stats(conn, dimension, order_by='mean_play_count', min_songs=1, limit=50):
+    """
+    Return prompt_stats rows of one dimension, best first.
+    Template rows also carry an example prompt_template.
+    """
+    if order_by not in STAT_COLUMNS:
+        raise ValueError(f"Unknown statistic: {order_by}")
+
+    example = "NULL"
+    if dimension == 'template':
+        example = "(SELECT prompt_template FROM json_data WHERE template_hash = s.value LIMIT 1)"
+    return conn.execute(f'''
+        SELECT s.value, {", ".join(f"s.{column}" for column in STAT_COLUMNS)}, {example} AS example
+        FROM prompt_stats s
+        WHERE s.dimension = ? AND s.song_count >= ?
+        ORDER BY s.{order_by} DESC
+        LIMIT ?
+    ''', (dimension, min_songs, limit)).fetchall()
+
+def get_value_stats(conn, dimension, value):
+    """
+    Return the prompt_stats row of a single dimension value, or None.
+    """
+    return conn.execute(f'''
+        SELECT value, {", ".join(STAT_COLUMNS)}
+        FROM prompt_stats WHERE dimension = ? AND value = ?
+    ''', (dimension, value)).fetchone()
+
+def get_top_songs(conn, dimension, value):
+    """
+    Return (rank, song_id, play_count) of the most played songs for a dimension value.
+    """
+    return conn.execute('''
+        SELECT rank, song_id, play_count FROM prompt_stats_top
+        WHERE dimension = ? AND value = ?
+        ORDER BY rank
+    ''', (dimension, value)).fetchall()
+
+def main(db_path, full=False, top_k=TOP_K):
+    """
+    Refresh the analytics tables and print the best templates.
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    affected = refresh_analytics(conn, full, top_k)
+    print(f"Recomputed {affected} dimension values in {time.time() - start_time:.2f} seconds")
+
+    print("\nBest performing templates (at least 100 songs):")
+    for row in get_stats(conn, 'template', min_songs=100, limit=10):
+        print(f"{row[1]} songs, mean plays {row[2]:.1f}, median {row[4]}:\n{row[-1]}\n")
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Refresh the prompt performance summary tables.")
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--full', action='store_true', help="rebuild every summary instead of the changed songs")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="songs kept per dimension value")
+    args = parser.parse_args()
+
+    main(args.db, args.full, args.top_k)
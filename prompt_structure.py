@@ -0,0 +1,150 @@
+import hashlib
+import re
+
+# Characters dropped when normalizing a tag, e.g. "Chorus:" or "*Verse*"
+TAG_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# Section numbering, e.g. "Verse 2"
+TAG_NUMBER_RE = re.compile(r'\s*\d+$')
+
+def create_instruction_tables(cursor):
+    """
+    Create the normalized instruction table and the indexes used by structure queries.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_instructions (
+            song_id TEXT,
+            position INTEGER,
+            tag TEXT,
+            normalized_tag TEXT,
+            PRIMARY KEY (song_id, position)
+        ) WITHOUT ROWID
+    ''')
+    # Covers "which songs contain tag X (and where)" without touching json_data
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_prompt_instructions_tag
+        ON prompt_instructions (normalized_tag, song_id, position)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_json_data_template_hash
+        ON json_data (template_hash)
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS json_data_delete_instructions
+        AFTER DELETE ON json_data BEGIN
+            DELETE FROM prompt_instructions WHERE song_id = old.id;
+        END
+    ''')
+
+def normalize_tag(tag):
+    """
+    Canonical form of an instruction: lower case, no punctuation or section number,
+    single spaces. "[Verse 2:]" and "[verse]" both become "verse".
+    """
+    tag = TAG_PUNCTUATION_RE.sub(' ', tag.lower())
+    tag = " ".join(tag.split())
+    return TAG_NUMBER_RE.sub('', tag) or tag
+
+def template_hash(normalized_tags):
+    """
+    Hash of the canonical template as a signed 64-bit integer, so equal structures
+    group together regardless of spelling, case or numbering.
+    """
+    digest = hashlib.blake2b("\n".join(normalized_tags).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def sequence_query(tags, limit=100):
+    """
+    Build the (sql, params) of songs_with_sequence for normalized tags.
+    Each step is an index lookup on idx_prompt_instructions_tag or the primary key.
+    """
+    joins = ""
+    for i in range(1, len(tags)):
+        joins += f'''
+            JOIN prompt_instructions p{i}
+              ON p{i}.song_id = p0.song_id
+             AND p{i}.normalized_tag = ?
+             AND p{i}.position > p{i - 1}.position
+        '''
+
+    query = f'''
+        SELECT DISTINCT p0.song_id FROM prompt_instructions p0
+        {joins}
+        WHERE p0.normalized_tag = ?
+        LIMIT ?
+    '''
+    return query, list(tags[1:]) + [tags[0], limit]
+
+def songs_with_sequence(conn, tags, limit=100):
+    """
+    Return the ids of songs whose structure contains the given tags in this order
+    (not necessarily adjacent), e.g. ["chorus", "bridge"] for a bridge after a chorus.
+    """
+    tags = [normalize_tag(tag) for tag in tags]
+    if not tags:
+        return []
+    query, params = sequence_query(tags, limit)
+    return [row[0] for row in conn.execute(query, params)]
+
+def common_tags_query(language=None, model_version=None, limit=20):
+    """
+    Build the (sql, params) of common_tags.
+    """
+    if not (language or model_version):
+        query = "SELECT normalized_tag, COUNT(*) AS count FROM prompt_instructions"
+        query += " GROUP BY normalized_tag ORDER BY count DESC LIMIT ?"
+        return query, [limit]
+
+    # Start from the matching songs (idx_json_data_lang_play_count for a language)
+    # and read their instructions through the prompt_instructions primary key
+    query = '''
+        SELECT p.normalized_tag, COUNT(*) AS count
+        FROM json_data j
+        JOIN prompt_instructions p ON p.song_id = j.id
+    '''
+    conditions = []
+    params = []
+    if language:
+        conditions.append("j.meta_prompt_lang = ?")
+        params.append(language)
+    if model_version:
+        conditions.append("j.major_model_version = ?")
+        params.append(model_version)
+    query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY p.normalized_tag ORDER BY count DESC LIMIT ?"
+    params.append(limit)
+    return query, params
+
+def common_tags(conn, language=None, model_version=None, limit=20):
+    """
+    Return (normalized_tag, count) for the most common instructions,
+    optionally restricted to a prompt language and a major model version.
+    """
+    return conn.execute(*common_tags_query(language, model_version, limit)).fetchall()
+
+def songs_with_template(conn, hash_value, limit=100):
+    """
+    Return the ids of songs sharing a canonical template, via idx_json_data_template_hash.
+    """
+    return [row[0] for row in conn.execute(
+        'SELECT id FROM json_data WHERE template_hash = ? LIMIT ?', (hash_value, limit)
+    )]
+
+def most_common_templates(conn, limit=20):
+    """
+    Return (template_hash, song_count, example prompt_template) for the most used structures.
+    """
+    # Group on the index alone, then look up one example row per top template
+    return conn.execute('''
+        SELECT template_hash, count,
+               (SELECT prompt_template FROM json_data j
+                WHERE j.template_hash = top.template_hash LIMIT 1)
+        FROM (
+            SELECT template_hash, COUNT(*) AS count
+            FROM json_data
+            WHERE template_hash IS NOT NULL
+            GROUP BY template_hash
+            ORDER BY count DESC
+            LIMIT ?
+        ) AS top
+    ''', (limit,)).fetchall()
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Searches kept per process and seconds before an entry is recomputed anyway
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 300
+
+class SearchCache:
+    """
+    In-process LRU cache of search results with a time to live.
+    Every entry is dropped when the database's data_version changes, so an import,
+    update_db.py or the media watcher never leaves stale results behind. A result
+    computed after a miss is only stored if the data_version is still the one seen
+    by the lookup, so a result read before a change is not cached after it.
+    """
+
+    def __init__(self, pool, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.pool = pool
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.discarded = 0
+
+    def _check_version(self):
+        """
+        Clear the cache if another connection committed since the last lookup.
+        """
+        version = self.pool.data_version()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._version = version
+
+    def get(self, key):
+        """
+        Return (True, value, version) for a fresh cached entry, otherwise
+        (False, None, version). Pass version to put along with the computed value.
+        """
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, self._version
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None, self._version
+
+    def put(self, key, value, version):
+        """
+        Store a result computed after get returned version, evicting the least
+        recently used entries beyond max_entries. The result is discarded if the
+        database changed since, it may have been read before the change.
+        """
+        with self._lock:
+            self._check_version()
+            if version != self._version:
+                self.discarded += 1
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, or compute, store and return it.
+        Concurrent misses for the same key may both compute; the last one is kept.
+        """
+        found, value, version = self.get(key)
+        if not found:
+            value = compute()
+            self.put(key, value, version)
+        return value
+
+    def stats(self):
+        """
+        Return the cache counters as a dictionary.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'discarded': self.discarded,
+            }
@@ -0,0 +1,145 @@
+import math
+import re
+import sqlite3
+import sys
+import time
+
+# Columns of json_data covered by the full text index, with their BM25 weights
+FTS_COLUMNS = [('title', 10.0), ('meta_prompt', 1.0), ('meta_tags', 4.0)]
+
+# How strongly play_count lifts a match in the blended ranking
+POPULARITY_WEIGHT = 0.1
+
+# Ways search results can be ordered
+SORT_OPTIONS = ["Play Count", "Relevance", "Relevance + Play Count"]
+
+# Quoted phrases or single terms in a user query
+QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+def indexed_columns(cursor):
+    """
+    Return the FTS columns present in json_data with their weights.
+    Databases migrated by older versions of update_db.py have a narrower json_data without meta_tags.
+    """
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(json_data)')}
+    return [(column, weight) for column, weight in FTS_COLUMNS if column in existing]
+
+def create_search_index(conn, rebuild=False):
+    """
+    Create the json_data_fts index and the triggers that keep it in sync with json_data.
+    The index is populated when it is first created or when rebuild is requested
+    (needed after json_data has been recreated or after VACUUM).
+    """
+    cursor = conn.cursor()
+    columns = [column for column, _ in indexed_columns(cursor)]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'json_data_fts'"
+    ).fetchone()
+    if exists and rebuild:
+        cursor.execute('DROP TABLE json_data_fts')
+
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS json_data_fts USING fts5(
+            {column_list},
+            content = 'json_data',
+            content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+
+    # Triggers are dropped together with json_data, so always recreate them
+    cursor.execute('DROP TRIGGER IF EXISTS json_data_fts_insert')
+    cursor.execute('DROP TRIGGER IF EXISTS json_data_fts_delete')
+    cursor.execute('DROP TRIGGER IF EXISTS json_data_fts_update')
+    cursor.execute(f'''
+        CREATE TRIGGER json_data_fts_insert AFTER INSERT ON json_data BEGIN
+            INSERT INTO json_data_fts (rowid, {column_list})
+            VALUES (new.rowid, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER json_data_fts_delete AFTER DELETE ON json_data BEGIN
+            INSERT INTO json_data_fts (json_data_fts, rowid, {column_list})
+            VALUES ('delete', old.rowid, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER json_data_fts_update AFTER UPDATE OF {column_list} ON json_data BEGIN
+            INSERT INTO json_data_fts (json_data_fts, rowid, {column_list})
+            VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO json_data_fts (rowid, {column_list})
+            VALUES (new.rowid, {new_values});
+        END
+    ''')
+
+    if not exists or rebuild:
+        cursor.execute("INSERT INTO json_data_fts (json_data_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO json_data_fts (json_data_fts) VALUES ('optimize')")
+    conn.commit()
+
+def register_search_functions(conn):
+    """
+    Register the SQL functions used by the blended ranking on a connection.
+    """
+    conn.create_function('log1p', 1, lambda value: math.log1p(value or 0), deterministic=True)
+
+def to_match_query(search_query):
+    """
+    Turn user input into a safe FTS5 MATCH expression.
+    "quoted words" become phrase queries, a trailing * makes a prefix query and
+    OR between terms is kept; every other term must match. Returns None for an
+    empty query.
+    """
+    parts = []
+    for phrase, term in QUERY_TOKEN_RE.findall(search_query or ''):
+        if phrase:
+            parts.append(f'"{phrase}"')
+        elif term == 'OR':
+            if parts and parts[-1] != 'OR':
+                parts.append('OR')
+        else:
+            prefix = term.endswith('*')
+            term = term.rstrip('*').replace('"', '""')
+            if term:
+                parts.append(f'"{term}"*' if prefix else f'"{term}"')
+
+    while parts and parts[-1] == 'OR':
+        parts.pop()
+    return " ".join(parts) or None
+
+def rank_expression(cursor, sort_by):
+    """
+    Return the ORDER BY expression for a sort option of a full text search.
+    The blended ranking needs register_search_functions on the connection.
+    """
+    weights = ", ".join(str(weight) for _, weight in indexed_columns(cursor))
+    bm25 = f"bm25(json_data_fts, {weights})"
+    if sort_by == "Relevance":
+        return bm25
+    if sort_by == "Relevance + Play Count":
+        # bm25 is negative, better matches are lower
+        return f"{bm25} * (1 + {POPULARITY_WEIGHT} * log1p(json_data.play_count))"
+    return "json_data.play_count DESC"
+
+def main(db_path, rebuild=False):
+    """
+    Build (or rebuild) the full text index of an existing database.
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    create_search_index(conn, rebuild)
+    total = conn.execute('SELECT COUNT(*) FROM json_data').fetchone()[0]
+    conn.close()
+    print(f"Full text index ready for {total} songs in {time.time() - start_time:.2f} seconds")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python search_index.py <path_to_db> [--rebuild]")
+        sys.exit(1)
+
+    main(sys.argv[1], '--rebuild' in sys.argv[2:])
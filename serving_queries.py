@@ -0,0 +1,91 @@
+# SQL of the song lists shared by the gradio and Flask apps, and checked by
+# db_indexes.py against the serving indexes
+
+# Songs per page of each app (Flask can override it with SONGS_PER_PAGE)
+GRADIO_PAGE_SIZE = 20
+FLASK_PAGE_SIZE = 50
+
+# Columns of a gradio result card
+SONG_COLUMNS = '''
+    json_data.id, json_data.title, json_data.meta_prompt AS lyrics, meta_duration AS duration,
+    play_count, meta_prompt_lang AS language, model_name,
+    audio_url, image_url, local_image, local_audio
+'''
+
+# Columns of a Flask index page row
+LIST_COLUMNS = '''
+    json_data.id, json_data.title, image_url, meta_duration, play_count,
+    meta_prompt_lang, model_name, json_data.meta_prompt, audio_url
+'''
+
+# Play count order; the keyset cursor is the (play_count, id) of the last song shown
+PLAY_COUNT_ORDER = " ORDER BY play_count DESC, json_data.id DESC LIMIT ?"
+
+# Song counts of the language and model dropdowns, stored by update_db.py
+LANGUAGE_COUNTS = '''
+    SELECT meta_prompt_lang AS language_code, COUNT(*) AS count
+    FROM json_data
+    WHERE meta_prompt_lang IS NOT NULL
+    GROUP BY meta_prompt_lang
+'''
+MODEL_COUNTS = '''
+    SELECT model_name, COUNT(*) AS count
+    FROM json_data
+    WHERE model_name IS NOT NULL
+    GROUP BY model_name
+'''
+
+def song_filters(match_query=None, language=None, model=None, local_only=False):
+    """
+    Build the FROM/WHERE clause of a song search and its parameters.
+    match_query goes through the full text index (see search_index.to_match_query).
+    """
+    params = []
+    if match_query:
+        clause = '''
+            FROM json_data
+            JOIN json_data_fts ON json_data_fts.rowid = json_data.rowid
+            WHERE json_data_fts MATCH ?
+        '''
+        params.append(match_query)
+    else:
+        clause = " FROM json_data WHERE 1"
+    if language:
+        clause += " AND meta_prompt_lang = ?"
+        params.append(language)
+    if model:
+        clause += " AND model_name = ?"
+        params.append(model)
+    if local_only:
+        clause += " AND local_audio = 1"
+    return clause, params
+
+def play_count_queries(columns, clause, params, after=None):
+    """
+    Return the (sql, params) queries reading a page in play count order after the
+    (play_count, id) cursor; each takes the number of rows still needed as its last
+    parameter (see read_in_order). Songs without a play count come last from a second
+    query, so both parts are index range scans instead of an OR that forces a sort.
+    """
+    query = f"SELECT {columns}, play_count AS sort_key {clause}"
+    without_plays = query + " AND play_count IS NULL"
+    if after and after[0] is None:
+        return [(without_plays + " AND json_data.id < ?" + PLAY_COUNT_ORDER, list(params) + [after[1]])]
+    if after:
+        first = (query + " AND (play_count, json_data.id) < (?, ?)" + PLAY_COUNT_ORDER, list(params) + list(after))
+    else:
+        first = (query + " AND play_count IS NOT NULL" + PLAY_COUNT_ORDER, list(params))
+    return [first, (without_plays + PLAY_COUNT_ORDER, list(params))]
+
+def read_in_order(execute, queries, limit):
+    """
+    Yield up to limit rows of the queries in turn, passing each the number of rows
+    still needed. execute(sql, params) runs one query, e.g. conn.execute.
+    """
+    count = 0
+    for sql, params in queries:
+        if count >= limit:
+            return
+        for row in execute(sql, list(params) + [limit - count]):
+            count += 1
+            yield row
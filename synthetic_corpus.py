@@ -0,0 +1,245 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import time
+import uuid
+import zipfile
+
+# Prompt languages and models with their share of the songs, roughly as skewed as the real catalog
+LANGUAGE_WEIGHTS = {
+    'en': 58, 'ja': 11, 'es': 6, 'ko': 5, 'pt': 4, 'fr': 3, 'de': 3,
+    'zh': 3, 'ru': 2, 'it': 1.5, 'id': 1.5, 'vi': 1, 'tr': 1,
+}
+MODEL_WEIGHTS = {
+    'chirp-v3-5': 55, 'chirp-v3': 28, 'chirp-v2-xxl-alpha': 9,
+    'chirp-v3-5-upsample': 5, 'chirp-v2-engine-v6': 3,
+}
+MAJOR_VERSIONS = {
+    'chirp-v3-5': 'v3.5', 'chirp-v3': 'v3', 'chirp-v2-xxl-alpha': 'v2',
+    'chirp-v3-5-upsample': 'v3.5', 'chirp-v2-engine-v6': 'v2',
+}
+
+# Words the lyrics are made of, per script
+LATIN_WORDS = (
+    'love night heart fire dream light rain sky road home time dance baby city '
+    'shadow river gold stars forever alone together burning falling rising wild '
+    'summer winter midnight ocean highway memory whisper thunder echo silver'
+).split()
+SCRIPT_WORDS = {
+    'ja': 'あなた 夜 夢 光 心 空 雨 愛 涙 明日 君 世界 風 星 声'.split(),
+    'ko': '사랑 밤 꿈 빛 마음 하늘 비 눈물 내일 너 세상 바람 별 목소리'.split(),
+    'zh': '爱 夜 梦 光 心 天空 雨 眼泪 明天 你 世界 风 星星 声音'.split(),
+    'ru': 'любовь ночь сердце огонь мечта свет дождь небо дорога дом время'.split(),
+}
+
+SECTION_TAGS = ['Verse', 'Chorus', 'Pre-Chorus', 'Bridge', 'Hook', 'Verse 2', 'Outro', 'Intro', 'Instrumental']
+STYLE_TAGS = (
+    'pop rock edm synthwave j-pop k-pop ballad acoustic lo-fi trap metal jazz '
+    'female-vocals male-vocals upbeat melancholic dreamy epic 80s anthemic'
+).split()
+
+# Songs per creator on average, and the shape of the Pareto distributed play counts
+SONGS_PER_CREATOR = 20
+PLAY_COUNT_ALPHA = 1.2
+
+# Records generated per task, each from its own seeded generator so the output
+# does not depend on the number of workers
+CHUNK_SIZE = 1000
+
+def weighted_choice(rng, weights):
+    """
+    Pick a key of weights with probability proportional to its value.
+    """
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+def make_lyrics(rng, language):
+    """
+    Return a prompt of [...] tagged sections, a few hundred to a few thousand characters.
+    """
+    words = SCRIPT_WORDS.get(language, LATIN_WORDS)
+    separator = '' if language in ('ja', 'zh') else ' '
+    sections = []
+    for i in range(rng.randint(3, 8)):
+        tag = 'Verse' if i == 0 else rng.choice(SECTION_TAGS)
+        lines = [separator.join(rng.choices(words, k=rng.randint(3, 9))).capitalize()
+                 for _ in range(rng.randint(2, 6))]
+        sections.append(f"[{tag}]\n" + "\n".join(lines))
+    return "\n\n".join(sections)
+
+def creator(index):
+    """
+    Return the profile columns of a creator, the same for every song of that creator.
+    """
+    rng = random.Random(f"creator-{index}")
+    name = f"{rng.choice(LATIN_WORDS).capitalize()}{rng.choice(LATIN_WORDS).capitalize()}"
+    return {
+        'display_name': name,
+        'handle': f"{name.lower()}{index}",
+        'user_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        'avatar_image_url': "https://cdn1.suno.ai/defaultPink.jpg" if index % 3 else
+                            f"https://cdn1.suno.ai/avatar_{index}.jpg",
+    }
+
+def make_record(rng, creators):
+    """
+    Return one song in the schema of the Kaggle JSON files.
+    """
+    song_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    language = weighted_choice(rng, LANGUAGE_WEIGHTS)
+    model = weighted_choice(rng, MODEL_WEIGHTS)
+    failed = rng.random() < 0.03
+    instrumental = rng.random() < 0.05
+    # Few creators make most songs: the top 1% make about a tenth of them
+    profile = creator(int(creators * rng.random() ** 2))
+    play_count = int(rng.paretovariate(PLAY_COUNT_ALPHA)) - 1
+    history = None
+    if rng.random() < 0.3:
+        history = [{'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)), 'continue_at': round(rng.uniform(30, 120), 2),
+                    'type': 'gen', 'source': 'web', 'infill': False}]
+
+    return {
+        'id': song_id,
+        'video_url': f"https://cdn1.suno.ai/{song_id}.mp4",
+        'audio_url': f"https://cdn1.suno.ai/{song_id}.mp3",
+        'image_url': f"https://cdn2.suno.ai/image_{song_id}.jpeg",
+        'image_large_url': f"https://cdn2.suno.ai/image_large_{song_id}.jpeg",
+        'is_video_pending': False,
+        'major_model_version': MAJOR_VERSIONS[model],
+        'model_name': model,
+        'reaction': None,
+        'is_handle_updated': rng.random() < 0.2,
+        'is_following_creator': False,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(1704067200 + rng.randint(0, 300 * 86400))),
+        'status': 'error' if failed else 'complete',
+        'title': " ".join(rng.choices(LATIN_WORDS, k=rng.randint(1, 4))).title(),
+        'play_count': play_count,
+        'upvote_count': int(play_count * rng.uniform(0, 0.1)),
+        'is_public': True,
+        **profile,
+        'metadata': {
+            'tags': ", ".join(rng.sample(STYLE_TAGS, rng.randint(1, 4))),
+            'negative_tags': None,
+            'prompt': "" if instrumental else make_lyrics(rng, language),
+            'audio_prompt_id': None,
+            'history': history,
+            'concat_history': None,
+            'stem_from_id': None,
+            'type': 'gen',
+            'duration': round(rng.uniform(60, 240), 2),
+            'refund_credits': failed,
+            'stream': True,
+            'infill': None,
+            'has_vocal': not instrumental,
+            'is_audio_upload_tos_accepted': None,
+            'error_type': 'moderation' if failed else None,
+            'error_message': "Song generation failed, please try again later." if failed else None,
+            'configurations': None,
+            'artist_clip_id': None,
+            'cover_clip_id': None,
+            'prompt_lang': language,
+            'gpt_lang': language,
+        },
+    }
+
+def make_chunk(task):
+    """
+    Generate one chunk of records (runs in a worker process).
+    Returns a list of (song id, JSON text).
+    """
+    seed, chunk, count, creators = task
+    rng = random.Random(f"{seed}-{chunk}")
+    records = (make_record(rng, creators) for _ in range(count))
+    return [(record['id'], json.dumps(record, ensure_ascii=False)) for record in records]
+
+def chunk_tasks(records, seed):
+    """
+    Yield the make_chunk tasks covering records songs.
+    """
+    creators = max(records // SONGS_PER_CREATOR, 1)
+    for chunk, start in enumerate(range(0, records, CHUNK_SIZE)):
+        yield seed, chunk, min(CHUNK_SIZE, records - start), creators
+
+def generate(out_dir, records, seed=0, workers=None, archive=False, keep_ids=0):
+    """
+    Write records Kaggle-style JSON files to out_dir/data/<id>.json, or to the
+    data/ folder of out_dir/suno-ai-music-prompts.zip. Returns the number of
+    records written and the ids of the first keep_ids songs (e.g. to write their
+    media); the others are not kept, at 10M songs they would take about 1GB.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    data_dir = os.path.join(out_dir, 'data')
+    zip_file = None
+    if archive:
+        zip_file = zipfile.ZipFile(os.path.join(out_dir, 'suno-ai-music-prompts.zip'), 'w', zipfile.ZIP_DEFLATED)
+    else:
+        os.makedirs(data_dir, exist_ok=True)
+
+    count = 0
+    song_ids = []
+    start_time = time.time()
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in pool.imap(make_chunk, chunk_tasks(records, seed)):
+            for song_id, text in chunk:
+                if zip_file:
+                    zip_file.writestr(f"data/{song_id}.json", text)
+                else:
+                    with open(os.path.join(data_dir, f"{song_id}.json"), 'w', encoding='utf-8') as f:
+                        f.write(text)
+                if count < keep_ids:
+                    song_ids.append(song_id)
+                count += 1
+                if count % 100000 == 0:
+                    print(f"{count} records, {count / (time.time() - start_time):.0f} records/s")
+    if zip_file:
+        zip_file.close()
+    return count, song_ids
+
+def write_media(out_dir, song_ids, image_size=(512, 512), audio_bytes=256 * 1024, seed=0):
+    """
+    Write a JPEG and a random-byte stand-in .mp3 for each song under
+    out_dir/suno-ai-music-prompts/, where the apps and media_inventory.py look for them.
+    """
+    from PIL import Image
+
+    image_dir = os.path.join(out_dir, 'suno-ai-music-prompts', 'image')
+    audio_dir = os.path.join(out_dir, 'suno-ai-music-prompts', 'audio')
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(audio_dir, exist_ok=True)
+    rng = random.Random(f"{seed}-media")
+
+    # A noisy image compresses like artwork instead of to a few hundred bytes
+    buffer = io.BytesIO()
+    Image.effect_noise(image_size, 64).convert('RGB').save(buffer, 'JPEG', quality=85)
+    image = buffer.getvalue()
+    audio = rng.randbytes(audio_bytes)
+    for song_id in song_ids:
+        with open(os.path.join(image_dir, f"{song_id}.jpeg"), 'wb') as f:
+            f.write(image)
+        with open(os.path.join(audio_dir, f"{song_id}.mp3"), 'wb') as f:
+            f.write(audio)
+
+def main(out_dir, records, seed=0, workers=None, archive=False, media=0):
+    """
+    Generate the corpus and optionally the media files of its first songs.
+    """
+    start_time = time.time()
+    count, song_ids = generate(out_dir, records, seed, workers, archive, keep_ids=media)
+    print(f"Generated {count} records in {time.time() - start_time:.2f} seconds")
+    if media:
+        write_media(out_dir, song_ids, seed=seed)
+        print(f"Wrote images and audio for {len(song_ids)} songs")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus in the schema of the Kaggle dataset.")
+    parser.add_argument('--out', default='synthetic', help="output folder")
+    parser.add_argument('--records', type=int, default=10000, help="number of songs (10k to 10M)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed, the same seed gives the same corpus")
+    parser.add_argument('--workers', type=int, default=None, help="generator processes (default: CPU count)")
+    parser.add_argument('--zip', action='store_true', help="write a zip archive with a data/ folder instead of files")
+    parser.add_argument('--media', type=int, default=0, help="also write stand-in image and audio files for this many songs")
+    args = parser.parse_args()
+
+    main(args.out, args.records, args.seed, args.workers, args.zip, args.media)
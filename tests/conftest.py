@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The modules are scripts in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import synthetic_corpus
+from json_import_sqlite import COLUMNS, flatten_record
+from search_index import create_search_index
+
+# Songs in the generated test corpus
+CORPUS_RECORDS = 300
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """
+    A small synthetic corpus as a folder of JSON files and as a Kaggle-style zip.
+    Returns (data folder, zip path).
+    """
+    out_dir = str(tmp_path_factory.mktemp('corpus'))
+    synthetic_corpus.generate(out_dir, CORPUS_RECORDS, seed=1, workers=2)
+    synthetic_corpus.generate(out_dir, CORPUS_RECORDS, seed=1, workers=2, archive=True)
+    return os.path.join(out_dir, 'data'), os.path.join(out_dir, 'suno-ai-music-prompts.zip')
+
+# Declared types of the json_data columns before the dimension and cold tables; the others are TEXT
+LEGACY_TYPES = {
+    'is_video_pending': 'BOOLEAN', 'is_handle_updated': 'BOOLEAN', 'is_following_creator': 'BOOLEAN',
+    'play_count': 'INTEGER', 'upvote_count': 'INTEGER', 'is_public': 'BOOLEAN',
+    'meta_duration': 'REAL', 'meta_refund_credits': 'BOOLEAN', 'meta_stream': 'BOOLEAN',
+    'meta_has_vocal': 'BOOLEAN', 'meta_is_audio_upload_tos_accepted': 'BOOLEAN',
+}
+
+@pytest.fixture
+def legacy_db(corpus, tmp_path):
+    """
+    The corpus in the layout from before the dimension and cold tables, with every
+    column on json_data, gaps in the rowids, the full text index, an index and a trigger.
+    """
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    definitions = ", ".join(
+        f"{column} {LEGACY_TYPES.get(column, 'TEXT')}" + (" PRIMARY KEY" if column == 'id' else "")
+        for column in COLUMNS
+    )
+    conn.execute(f'CREATE TABLE json_data ({definitions})')
+    rows = [flatten_record(json.loads(file.read_text(encoding='utf-8'))) for file in sorted(Path(corpus[0]).glob('*.json'))]
+    conn.executemany(f'INSERT INTO json_data VALUES ({", ".join(["?"] * len(COLUMNS))})', rows)
+    conn.execute('DELETE FROM json_data WHERE rowid % 5 = 0')
+    conn.execute('CREATE INDEX idx_json_data_play_count ON json_data (play_count)')
+    conn.execute('CREATE TABLE renamed_songs (id TEXT)')
+    conn.execute('''
+        CREATE TRIGGER json_data_renamed AFTER UPDATE OF title ON json_data BEGIN
+            INSERT INTO renamed_songs VALUES (new.id);
+        END
+    ''')
+    conn.commit()
+    create_search_index(conn)
+    conn.close()
+    return path
+
+class FileHandler(BaseHTTPRequestHandler):
+    """
+    Serves server.files ({name: (body, etag)}) with Range and If-Range support.
+    The first response of a file listed in server.fail_after is cut off after
+    that many bytes, and server.unavailable answers 503 with Retry-After that
+    many times per file.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.lstrip('/')
+        server.requests.append((time.monotonic(), name, dict(self.headers)))
+        if server.unavailable.get(name):
+            server.unavailable[name] -= 1
+            self.send_response(503)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if name not in server.files:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body, etag = server.files[name]
+        start = 0
+        requested = self.headers.get('Range')
+        if requested and self.headers.get('If-Range', etag) == etag:
+            start = int(requested[len('bytes='):-1])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.send_header('ETag', etag)
+        self.end_headers()
+
+        data = body[start:]
+        cut = server.fail_after.pop(name, None)
+        if cut is not None:
+            # Drop the connection partway through
+            self.wfile.write(data[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(data)
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+    server.files = {}
+    server.fail_after = {}
+    server.unavailable = {}
+    server.requests = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
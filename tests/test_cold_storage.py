@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+import cold_storage
+import dimensions
+from cold_storage import COLD_COLUMNS, COLD_TABLE
+from json_import_sqlite import COLUMNS
+
+def original_songs(conn):
+    return {row[0]: row for row in conn.execute(f'SELECT {", ".join(COLUMNS)} FROM json_data')}
+
+def test_compressed_values_round_trip():
+    values = {'meta_history': [{'id': 'a', 'continue_at': 31.5}], 'meta_error_message': 'échec 失败', 'video_url': None}
+    blob = cold_storage.compress_values(values)
+    assert cold_storage.decompress_values(blob) == {'meta_history': [{'id': 'a', 'continue_at': 31.5}],
+                                                    'meta_error_message': 'échec 失败'}
+    assert cold_storage.compress_values({'video_url': None}) is None
+
+    record = cold_storage.ColdRecord(blob)
+    assert record['meta_error_message'] == 'échec 失败'
+    assert record['video_url'] is None
+    assert len(record) == len(COLD_COLUMNS)
+    with pytest.raises(KeyError):
+        record['title']
+    assert dict(cold_storage.ColdRecord(None)) == dict.fromkeys(COLD_COLUMNS)
+
+def test_migration_moves_the_cold_values(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    before = original_songs(conn)
+    with_values = [song_id for song_id, row in before.items()
+                   if any(row[COLUMNS.index(column)] is not None for column in COLD_COLUMNS)]
+    assert with_values
+
+    assert cold_storage.migrate(conn) == len(with_values)
+    assert cold_storage.migrate(conn) is None
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(json_data)')}
+    assert not columns & set(COLD_COLUMNS)
+
+    records = cold_storage.load_cold(conn, list(before))
+    for song_id, row in before.items():
+        assert {column: records[song_id][column] for column in COLD_COLUMNS} == \
+               {column: row[COLUMNS.index(column)] for column in COLD_COLUMNS}
+
+    # Deleting a song removes its cold values
+    conn.execute('DELETE FROM json_data WHERE id = ?', (with_values[0],))
+    assert conn.execute(f'SELECT COUNT(*) FROM {COLD_TABLE} WHERE id = ?', (with_values[0],)).fetchone() == (0,)
+    conn.close()
+
+@pytest.mark.parametrize('migrations', [[cold_storage.migrate], [cold_storage.migrate, dimensions.migrate],
+                                        [dimensions.migrate, cold_storage.migrate]])
+def test_compat_view_has_every_original_column(legacy_db, migrations):
+    conn = sqlite3.connect(legacy_db)
+    before = original_songs(conn)
+    for migrate in migrations:
+        migrate(conn)
+
+    cold_storage.register_cold_functions(conn)
+    after = {row[0]: row for row in conn.execute(f'SELECT {", ".join(COLUMNS)} FROM {dimensions.COMPAT_VIEW}')}
+    assert after == before
+
+    history = COLUMNS.index('meta_history')
+    song_id = next(song_id for song_id, row in before.items() if row[history] is not None)
+    assert conn.execute(f"SELECT cold_value(data, 'meta_history') FROM {COLD_TABLE} WHERE id = ?",
+                        (song_id,)).fetchone() == (before[song_id][history],)
+    conn.close()
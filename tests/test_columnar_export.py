@@ -0,0 +1,100 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import columnar_export
+import json_import_sqlite
+
+COLUMNS = ['id', 'title', 'play_count', 'meta_prompt_lang']
+
+@pytest.fixture
+def db_path(corpus, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    json_import_sqlite.main(corpus[0])
+    return str(tmp_path / 'json_data.db')
+
+def exported(out_dir, columns=COLUMNS):
+    frame = columnar_export.load_table(out_dir, columns=columns)
+    return {tuple(None if pd.isna(value) else value for value in row) for row in frame.itertuples(index=False)}
+
+def in_database(db_path, columns=COLUMNS):
+    conn = sqlite3.connect(db_path)
+    rows = set(conn.execute(f'SELECT {", ".join(columns)} FROM json_data').fetchall())
+    conn.close()
+    return rows
+
+def execute(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+@pytest.mark.parametrize('file_format', ['arrow', 'parquet'])
+def test_incremental_export_follows_every_change(db_path, tmp_path, file_format):
+    out_dir = str(tmp_path / 'export')
+    columnar_export.export_all(db_path, out_dir, file_format)
+    assert exported(out_dir) == in_database(db_path)
+
+    # Changes made by other scripts, written without going through the importer
+    execute(db_path, 'UPDATE json_data SET play_count = 12345 WHERE rowid % 7 = 0')
+    execute(db_path, "INSERT INTO json_data (id, title, play_count, meta_prompt_lang) VALUES ('new-song', 'New', 1, 'en')")
+    last_seq = columnar_export.read_state(out_dir)['last_change_seq']
+    columnar_export.export_all(db_path, out_dir, file_format)
+    assert exported(out_dir) == in_database(db_path)
+    state = columnar_export.read_state(out_dir)
+    assert state['last_change_seq'] > last_seq
+
+    # Nothing changed: nothing appended
+    files = sorted(str(path) for path in (tmp_path / 'export' / 'json_data').rglob('*.*'))
+    columnar_export.export_all(db_path, out_dir, file_format)
+    assert sorted(str(path) for path in (tmp_path / 'export' / 'json_data').rglob('*.*')) == files
+    assert columnar_export.read_state(out_dir)['last_change_seq'] == state['last_change_seq']
+
+@pytest.mark.parametrize('file_format', ['arrow', 'parquet'])
+def test_deleted_songs_are_not_loaded(db_path, tmp_path, file_format):
+    out_dir = str(tmp_path / 'export')
+    columnar_export.export_all(db_path, out_dir, file_format)
+    execute(db_path, 'UPDATE json_data SET play_count = 1 WHERE rowid % 4 = 0')
+    columnar_export.export_all(db_path, out_dir, file_format)
+
+    # Deleted after being exported twice
+    songs = len(in_database(db_path, ['id']))
+    execute(db_path, 'DELETE FROM json_data WHERE rowid % 2 = 0')
+    columnar_export.export_all(db_path, out_dir, file_format)
+    assert exported(out_dir) == in_database(db_path)
+    tombstones = columnar_export.load_table(out_dir, latest_only=False)[columnar_export.DELETED_COLUMN].sum()
+    assert tombstones == songs - len(in_database(db_path, ['id']))
+
+def test_filters_apply_to_the_latest_version(db_path, tmp_path):
+    out_dir = str(tmp_path / 'export')
+    columnar_export.export_all(db_path, out_dir)
+    conn = sqlite3.connect(db_path)
+    moved = [row[0] for row in conn.execute("SELECT id FROM json_data WHERE meta_prompt_lang = 'en' LIMIT 5")]
+    conn.executemany("UPDATE json_data SET meta_prompt_lang = 'xx' WHERE id = ?", [(song_id,) for song_id in moved])
+    conn.commit()
+    conn.close()
+    columnar_export.export_all(db_path, out_dir)
+
+    english = columnar_export.load_table(out_dir, columns=['id'], filters={'meta_prompt_lang': 'en'})
+    assert not set(english['id']) & set(moved)
+    assert exported(out_dir) == in_database(db_path)
+    moved_rows = columnar_export.load_table(out_dir, columns=['id'], filters={'meta_prompt_lang': 'xx'})
+    assert set(moved_rows['id']) == set(moved)
+
+def test_changed_columns_export_everything_again(db_path, tmp_path):
+    out_dir = str(tmp_path / 'export')
+    columnar_export.export_all(db_path, out_dir)
+    execute(db_path, 'ALTER TABLE json_data ADD COLUMN mood TEXT')
+    execute(db_path, "UPDATE json_data SET mood = 'calm' WHERE rowid % 2 = 0")
+
+    columnar_export.export_all(db_path, out_dir)
+    assert exported(out_dir, COLUMNS + ['mood']) == in_database(db_path, COLUMNS + ['mood'])
+
+def test_exporting_another_format_needs_full(db_path, tmp_path):
+    out_dir = str(tmp_path / 'export')
+    columnar_export.export_all(db_path, out_dir, 'arrow')
+    with pytest.raises(ValueError):
+        columnar_export.export_all(db_path, out_dir, 'parquet')
+    columnar_export.export_all(db_path, out_dir, 'parquet', full=True)
+    assert exported(out_dir) == in_database(db_path)
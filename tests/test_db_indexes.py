@@ -0,0 +1,30 @@
+import sqlite3
+
+import pytest
+
+import db_indexes
+import json_import_sqlite
+from media_inventory import ensure_local_flags
+
+@pytest.fixture
+def conn(corpus, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    json_import_sqlite.main(corpus[0])
+    conn = sqlite3.connect(str(tmp_path / 'json_data.db'))
+    yield conn
+    conn.close()
+
+def test_optional_tables_and_columns_are_skipped(conn):
+    failures, skipped = db_indexes.check_query_plans(conn)
+    assert skipped
+    assert all(db_indexes.is_optional(error) for _, error in skipped)
+
+    ensure_local_flags(conn.cursor())
+    db_indexes.create_serving_indexes(conn)
+    assert db_indexes.analyze_and_check(conn) == []
+
+def test_missing_columns_fail_the_check(conn):
+    ensure_local_flags(conn.cursor())
+    conn.execute('ALTER TABLE json_data RENAME COLUMN model_name TO model')
+    with pytest.raises(sqlite3.OperationalError):
+        db_indexes.check_query_plans(conn)
@@ -0,0 +1,19 @@
+import sqlite3
+
+import pytest
+
+import db_pool
+
+def test_wrong_path_is_not_created(tmp_path):
+    db_path = tmp_path / 'missing.db'
+    with pytest.raises(FileNotFoundError):
+        db_pool.get_pool(str(db_path))
+    assert not db_path.exists()
+
+def test_existing_database_switches_to_wal(tmp_path):
+    db_path = str(tmp_path / 'songs.db')
+    sqlite3.connect(db_path).execute('CREATE TABLE songs (id TEXT)').connection.close()
+    db_pool.enable_wal(db_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    conn.close()
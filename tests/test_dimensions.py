@@ -0,0 +1,69 @@
+import sqlite3
+
+import dimensions
+from change_log import create_change_log
+from json_import_sqlite import COLUMNS
+
+def songs_by_rowid(conn, table):
+    """
+    Return {rowid: row in COLUMNS order}, read from json_data itself or through a view.
+    """
+    return {row[0]: row[1:] for row in conn.execute(f'''
+        SELECT j.rowid, {", ".join(f"t.{column}" for column in COLUMNS)}
+        FROM json_data j JOIN {table} t ON t.id = j.id
+    ''')}
+
+def fts_matches(conn, query):
+    return conn.execute('''
+        SELECT j.id FROM json_data_fts f JOIN json_data j ON j.rowid = f.rowid
+        WHERE json_data_fts MATCH ? ORDER BY j.id
+    ''', (query,)).fetchall()
+
+def test_migration_keeps_rowids_values_and_schema(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    create_change_log(conn.cursor())
+    conn.commit()
+    before = songs_by_rowid(conn, 'json_data')
+    matches = fts_matches(conn, 'love')
+    assert matches
+
+    assert dimensions.migrate(conn)
+    columns = dimensions.table_columns(conn.cursor(), 'json_data')
+    assert not dimensions.ENCODED_COLUMNS & set(columns)
+    assert conn.execute('SELECT COUNT(*) FROM creators').fetchone()[0] < len(before)
+
+    # Same rowids, so the full text index and the change log stay valid without a rebuild
+    assert songs_by_rowid(conn, dimensions.COMPAT_VIEW) == before
+    assert fts_matches(conn, 'love') == matches
+    schema = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'json_data'")}
+    assert {'idx_json_data_play_count', 'json_data_renamed', 'json_data_fts_insert',
+            'json_data_log_insert', 'json_data_log_update'} <= schema
+
+    song_id = next(iter(before.values()))[0]
+    conn.execute("UPDATE json_data SET title = 'Renamed' WHERE id = ?", (song_id,))
+    assert conn.execute('SELECT id FROM renamed_songs').fetchall() == [(song_id,)]
+    assert fts_matches(conn, 'Renamed') == [(song_id,)]
+    conn.close()
+
+def test_migration_runs_once(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    assert dimensions.migrate(conn)
+    assert not dimensions.migrate(conn)
+    conn.close()
+
+def test_encoder_reuses_keys(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    dimensions.migrate(conn)
+    row = conn.execute(f'SELECT {", ".join(COLUMNS)} FROM {dimensions.COMPAT_VIEW} LIMIT 1').fetchone()
+    creator_id, status_id = conn.execute('SELECT creator_id, status_id FROM json_data WHERE id = ?', row[:1]).fetchone()
+
+    encoder = dimensions.DimensionEncoder(conn, COLUMNS)
+    encoded = dict(zip(dimensions.fact_columns(COLUMNS), encoder.encode(row)))
+    assert (encoded['creator_id'], encoded['status_id']) == (creator_id, status_id)
+
+    renamed = list(row)
+    renamed[COLUMNS.index('handle')] = 'a-new-handle'
+    encoded = dict(zip(dimensions.fact_columns(COLUMNS), encoder.encode(renamed)))
+    assert encoded['creator_id'] != creator_id
+    assert conn.execute('SELECT handle FROM creators WHERE creator_id = ?', (encoded['creator_id'],)).fetchone() == ('a-new-handle',)
+    conn.close()
@@ -0,0 +1,106 @@
+import pytest
+
+from downloader import PART_SUFFIX, VALIDATOR_SUFFIX, Downloader
+
+BODY = bytes(range(256)) * 800
+ETAG = '"v1"'
+
+@pytest.fixture
+def server(http_server):
+    http_server.files['song.mp3'] = (BODY, ETAG)
+    return http_server
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def write(path, data):
+    with open(path, 'wb' if isinstance(data, bytes) else 'w') as f:
+        f.write(data)
+
+def test_resumes_after_the_connection_drops(server, tmp_path):
+    server.fail_after['song.mp3'] = 100000
+    path = str(tmp_path / 'song.mp3')
+
+    result = Downloader(retries=2, backoff=0).fetch(server.url + 'song.mp3', path)
+
+    assert result.status == 'downloaded'
+    assert read(path) == BODY
+    assert len(server.requests) == 2
+    headers = server.requests[1][2]
+    offset = int(headers['Range'][len('bytes='):-1])
+    assert 0 < offset <= 100000
+    assert headers['If-Range'] == ETAG
+    assert not (tmp_path / ('song.mp3' + PART_SUFFIX)).exists()
+    assert not (tmp_path / ('song.mp3' + VALIDATOR_SUFFIX)).exists()
+
+def test_changed_file_is_downloaded_again(server, tmp_path):
+    path = str(tmp_path / 'song.mp3')
+    write(path + PART_SUFFIX, b'old version')
+    write(path + VALIDATOR_SUFFIX, '"v0"')
+
+    result = Downloader(retries=0).fetch(server.url + 'song.mp3', path)
+
+    assert result.status == 'downloaded'
+    assert read(path) == BODY
+    assert server.requests[0][2]['If-Range'] == '"v0"'
+
+def test_partial_file_without_validator_starts_over(server, tmp_path):
+    path = str(tmp_path / 'song.mp3')
+    write(path + PART_SUFFIX, b'unknown version')
+
+    Downloader(retries=0).fetch(server.url + 'song.mp3', path)
+
+    assert read(path) == BODY
+    assert 'Range' not in server.requests[0][2]
+
+def test_complete_partial_file_is_renamed_on_416(server, tmp_path):
+    path = str(tmp_path / 'song.mp3')
+    write(path + PART_SUFFIX, BODY)
+    write(path + VALIDATOR_SUFFIX, ETAG)
+
+    result = Downloader(retries=0).fetch(server.url + 'song.mp3', path)
+
+    assert result.status == 'downloaded' and result.size == len(BODY)
+    assert read(path) == BODY
+    assert len(server.requests) == 1
+
+def test_stale_partial_file_is_discarded_on_416(server, tmp_path):
+    path = str(tmp_path / 'song.mp3')
+    write(path + PART_SUFFIX, BODY + b'trailing bytes')
+    write(path + VALIDATOR_SUFFIX, ETAG)
+
+    result = Downloader(retries=1, backoff=0).fetch(server.url + 'song.mp3', path)
+
+    assert result.status == 'downloaded'
+    assert read(path) == BODY
+    assert 'Range' not in server.requests[1][2]
+
+def test_retry_after_wait_releases_the_host_slot(server, tmp_path):
+    server.files['other.mp3'] = (b'other', '"o1"')
+    server.unavailable['song.mp3'] = 1
+    downloader = Downloader(workers=2, per_host=1, retries=1, backoff=0)
+    jobs = [(server.url + 'song.mp3', str(tmp_path / 'song.mp3')),
+            (server.url + 'other.mp3', str(tmp_path / 'other.mp3'))]
+
+    results = list(downloader.download_all(jobs))
+
+    assert {result.status for result in results} == {'downloaded'}
+    times = {}
+    for at, name, _ in server.requests:
+        times.setdefault(name, []).append(at)
+    # The other file is fetched while song.mp3 waits out its Retry-After second
+    assert times['other.mp3'][0] < times['song.mp3'][1] - 0.5
+    assert times['song.mp3'][1] - times['song.mp3'][0] >= 0.9
+
+def test_retry_after_is_capped_and_counts_as_an_attempt(server, tmp_path):
+    server.unavailable['song.mp3'] = 2
+    path = str(tmp_path / 'song.mp3')
+
+    result = Downloader(retries=1, backoff=0, max_backoff=0.1).fetch(server.url + 'song.mp3', path)
+
+    assert result.status == 'failed'
+    gap = server.requests[1][0] - server.requests[0][0]
+    assert gap < 0.5
+    result = Downloader(retries=1, backoff=0, max_backoff=0.1).fetch(server.url + 'song.mp3', path)
+    assert result.status == 'downloaded'
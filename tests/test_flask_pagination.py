@@ -0,0 +1,88 @@
+import html
+import importlib.util
+import os
+import re
+import sqlite3
+import sys
+
+import pytest
+
+from json_import_sqlite import create_table
+from search_index import create_search_index
+
+SONGS = 57
+PAGE_SIZE = 10
+
+def song(i):
+    """
+    Song i: a quarter have no play count, the others share a few values so the id breaks ties.
+    """
+    return (f'song-{i:03d}', f'Title song-{i:03d}', None if i % 4 == 0 else i % 7,
+            'en' if i % 3 else 'ja', 'chirp-v3', 'love song' if i % 2 else 'night drive')
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp('flask')
+    conn = sqlite3.connect(root / 'suno.db')
+    create_table(conn.cursor())
+    conn.executemany('''
+        INSERT INTO json_data (id, title, play_count, meta_prompt_lang, model_name, meta_prompt)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [song(i) for i in range(SONGS)])
+    conn.commit()
+    create_search_index(conn)
+    conn.close()
+
+    # The app opens ../suno.db from its own folder
+    (root / 'flask').mkdir()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(root / 'flask')
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask', 'app.py')
+        spec = importlib.util.spec_from_file_location('flask_app', path)
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, 'flask_app', module)
+        spec.loader.exec_module(module)
+        module.app.config['SONGS_PER_PAGE'] = PAGE_SIZE
+        yield module.app.test_client()
+
+def expected_ids(language=None, word=None):
+    songs = [s for s in map(song, range(SONGS))
+             if (language is None or s[3] == language) and (word is None or word in s[5])]
+    with_plays = sorted((s for s in songs if s[2] is not None), key=lambda s: (s[2], s[0]), reverse=True)
+    without_plays = sorted((s for s in songs if s[2] is None), key=lambda s: s[0], reverse=True)
+    return [s[0] for s in with_plays + without_plays]
+
+def crawl(client, url):
+    """
+    Follow the Next page links from url, returning the song ids of every page.
+    """
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_data(as_text=True)
+        pages.append(re.findall(r'<h3>Title (song-\d+)</h3>', page))
+        link = re.search(r'<a href="([^"]*)">Next page</a>', page)
+        url = html.unescape(link.group(1)) if link else None
+    return pages
+
+@pytest.mark.parametrize('query, language, word', [
+    ('/', None, None),
+    ('/?language=ja', 'ja', None),
+    ('/?search_query=love', None, 'love'),
+    ('/?search_query=night&language=en', 'en', 'night'),
+])
+def test_pages_follow_play_count_then_songs_without_plays(client, query, language, word):
+    pages = crawl(client, query)
+    ids = [song_id for page in pages for song_id in page]
+    assert ids == expected_ids(language, word)
+    assert all(len(page) == PAGE_SIZE for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= PAGE_SIZE
+
+def test_cursor_inside_the_songs_without_plays(client):
+    pages = crawl(client, '/?after=:song-040')
+    ids = [song_id for page in pages for song_id in page]
+    assert ids == [song_id for song_id in expected_ids() if song_id < 'song-040' and song(int(song_id[5:]))[2] is None]
+
+def test_invalid_cursor(client):
+    assert client.get('/?after=many:song-001').status_code == 400
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import json_import_sqlite
+from cold_storage import register_cold_functions
+from conftest import CORPUS_RECORDS
+from dimensions import DIMENSIONS
+
+def import_into(tmp_path, monkeypatch, input_path, **options):
+    """
+    Run the importer in tmp_path (it writes json_data.db in the working directory).
+    """
+    monkeypatch.chdir(tmp_path)
+    json_import_sqlite.main(input_path, **options)
+    return str(tmp_path / 'json_data.db')
+
+def snapshot(db_path):
+    """
+    Return every song with its decoded columns, and the ids the full text index finds.
+    """
+    conn = sqlite3.connect(db_path)
+    register_cold_functions(conn)
+    # Dimension keys depend on the order the files were read in, their values do not
+    keys = {key for key, _ in DIMENSIONS.values()}
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(json_data_full)') if row[1] not in keys]
+    songs = conn.execute(f'SELECT {", ".join(columns)} FROM json_data_full ORDER BY id').fetchall()
+    matches = conn.execute('''
+        SELECT j.id FROM json_data_fts f JOIN json_data j ON j.rowid = f.rowid
+        WHERE json_data_fts MATCH 'love' ORDER BY j.id
+    ''').fetchall()
+    conn.close()
+    return songs, matches
+
+@pytest.fixture(scope='module')
+def serial_snapshot(corpus, tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('serial')
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        return snapshot(import_into(tmp_path, monkeypatch, corpus[0]))
+
+def test_serial_import(serial_snapshot):
+    songs, matches = serial_snapshot
+    assert len(songs) == CORPUS_RECORDS
+    assert matches
+
+@pytest.mark.parametrize('batch_size', [7, json_import_sqlite.DEFAULT_BATCH_SIZE])
+def test_parallel_import_matches_serial(corpus, serial_snapshot, tmp_path, monkeypatch, batch_size):
+    db_path = import_into(tmp_path, monkeypatch, corpus[0], parallel=True, workers=2, batch_size=batch_size)
+    assert snapshot(db_path) == serial_snapshot
+
+def batches(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT files_scanned, files_changed, finished_at IS NOT NULL FROM import_batches ORDER BY batch_id').fetchall()
+    conn.close()
+    return rows
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_incremental_import_matches_serial(corpus, serial_snapshot, tmp_path, monkeypatch, parallel):
+    db_path = import_into(tmp_path, monkeypatch, corpus[0], incremental=True, parallel=parallel, workers=2)
+    assert snapshot(db_path) == serial_snapshot
+    assert batches(db_path) == [(CORPUS_RECORDS, CORPUS_RECORDS, 1)]
+
+def test_incremental_import_only_reads_changed_files(corpus, tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    shutil.copytree(corpus[0], data_dir)
+    db_path = import_into(tmp_path, monkeypatch, str(data_dir), incremental=True)
+
+    # Unchanged, touched only, edited and new files
+    names = sorted(os.listdir(data_dir))
+    os.utime(data_dir / names[0], ns=(0, 10**18))
+    record = json.loads((data_dir / names[1]).read_text())
+    record['title'] = 'Edited title'
+    (data_dir / names[1]).write_text(json.dumps(record))
+    record['id'] = 'new-song'
+    (data_dir / 'new-song.json').write_text(json.dumps(record))
+
+    import_into(tmp_path, monkeypatch, str(data_dir), incremental=True)
+    assert batches(db_path)[1] == (CORPUS_RECORDS + 1, 2, 1)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM json_data').fetchone()[0] == CORPUS_RECORDS + 1
+    assert conn.execute('SELECT title FROM json_data WHERE id = ?', (names[1][:-len('.json')],)).fetchone() == ('Edited title',)
+    # The touched file keeps the batch that imported it
+    assert conn.execute('SELECT batch_id FROM import_manifest WHERE path = ?',
+                        (str(data_dir / names[0]),)).fetchone() == (1,)
+    conn.close()
+
+    import_into(tmp_path, monkeypatch, str(data_dir), incremental=True)
+    assert batches(db_path)[2] == (CORPUS_RECORDS + 1, 0, 1)
+
+def test_incremental_import_keeps_the_first_duplicate_like_serial(corpus, tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    shutil.copytree(corpus[0], data_dir)
+    names = sorted(os.listdir(data_dir))
+    for i, name in enumerate(names[:5]):
+        record = json.loads((data_dir / name).read_text())
+        record['title'] = f'Duplicate {i}'
+        (data_dir / f'duplicate-{i}.json').write_text(json.dumps(record))
+
+    (tmp_path / 'serial').mkdir()
+    (tmp_path / 'incremental').mkdir()
+    serial = import_into(tmp_path / 'serial', monkeypatch, str(data_dir))
+    incremental = import_into(tmp_path / 'incremental', monkeypatch, str(data_dir), incremental=True)
+    assert snapshot(incremental) == snapshot(serial)
+
+    # Editing the ignored copy changes nothing, editing the imported one does
+    for i, name in enumerate(names[:5]):
+        for path in (data_dir / name, data_dir / f'duplicate-{i}.json'):
+            record = json.loads(path.read_text())
+            record['title'] += ' (edited)'
+            path.write_text(json.dumps(record))
+    import_into(tmp_path / 'incremental', monkeypatch, str(data_dir), incremental=True)
+    shutil.rmtree(tmp_path / 'serial')
+    (tmp_path / 'serial').mkdir()
+    serial = import_into(tmp_path / 'serial', monkeypatch, str(data_dir))
+    assert snapshot(incremental) == snapshot(serial)
+
+def test_incremental_import_deletes_songs_of_removed_files(corpus, tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    shutil.copytree(corpus[0], data_dir)
+    (tmp_path / 'incremental').mkdir()
+    db_path = import_into(tmp_path / 'incremental', monkeypatch, str(data_dir), incremental=True)
+
+    names = sorted(os.listdir(data_dir))
+    removed_ids = [name[:-len('.json')] for name in names[:3]]
+    for name in names[:3]:
+        os.remove(data_dir / name)
+    # The file now holds another song: the old one goes away
+    record = json.loads((data_dir / names[3]).read_text())
+    old_id, record['id'] = record['id'], 'renamed-song'
+    (data_dir / names[3]).write_text(json.dumps(record))
+
+    import_into(tmp_path / 'incremental', monkeypatch, str(data_dir), incremental=True)
+    conn = sqlite3.connect(db_path)
+    gone = removed_ids + [old_id]
+    assert conn.execute(
+        f'SELECT COUNT(*) FROM json_data WHERE id IN ({", ".join("?" * len(gone))})', gone
+    ).fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM import_manifest').fetchone()[0] == CORPUS_RECORDS - 3
+    conn.close()
+
+    (tmp_path / 'serial').mkdir()
+    assert snapshot(db_path) == snapshot(import_into(tmp_path / 'serial', monkeypatch, str(data_dir)))
+
+def test_interrupted_incremental_import_resumes_its_batch(corpus, serial_snapshot, tmp_path, monkeypatch):
+    db_path = import_into(tmp_path, monkeypatch, corpus[0], incremental=True)
+    conn = sqlite3.connect(db_path)
+    # As if the run stopped after committing part of the files
+    conn.execute('UPDATE import_batches SET finished_at = NULL')
+    conn.execute('DELETE FROM import_manifest WHERE rowid % 2 = 0')
+    conn.commit()
+    conn.close()
+
+    import_into(tmp_path, monkeypatch, corpus[0], incremental=True)
+    assert [row[2] for row in batches(db_path)] == [1]
+    assert snapshot(db_path) == serial_snapshot
+
+@pytest.mark.parametrize('options', [{}, {'parallel': True, 'workers': 2}, {'incremental': True}])
+def test_zip_import_matches_folder_import(corpus, serial_snapshot, tmp_path, monkeypatch, options):
+    db_path = import_into(tmp_path, monkeypatch, corpus[1], **options)
+    assert snapshot(db_path) == serial_snapshot
+
+def test_incremental_zip_import_skips_unchanged_entries(corpus, tmp_path, monkeypatch):
+    db_path = import_into(tmp_path, monkeypatch, corpus[1], incremental=True)
+    import_into(tmp_path, monkeypatch, corpus[1], incremental=True)
+    assert batches(db_path) == [(CORPUS_RECORDS, CORPUS_RECORDS, 1), (CORPUS_RECORDS, 0, 1)]
@@ -0,0 +1,33 @@
+import sqlite3
+
+import metrics
+from db_pool import ReadOnlyPool
+
+def recorded_queries():
+    return {query for query, _ in metrics.QUERY_SECONDS._series}
+
+def test_released_cursors_are_recorded_by_the_next_query(tmp_path, monkeypatch):
+    looked_up = []
+    monkeypatch.setattr(metrics, 'plan_type', lambda conn, sql, parameters: looked_up.append(sql) or 'other')
+    conn = sqlite3.connect(str(tmp_path / 'metrics.db'), factory=metrics.TracedConnection)
+    conn.execute('CREATE TABLE songs (id TEXT)')
+    conn.executemany('INSERT INTO songs VALUES (?)', [('a',), ('b',)])
+
+    # Released after one row: only queued by the finalizer
+    conn.execute('SELECT id FROM songs WHERE id > ?', ('',)).fetchone()
+    assert len(conn.pending_queries) == 1
+    assert 'SELECT id FROM songs WHERE id > ?' not in looked_up
+
+    conn.execute('SELECT COUNT(*) FROM songs').fetchall()
+    assert not conn.pending_queries
+    assert looked_up[-2:] == ['SELECT id FROM songs WHERE id > ?', 'SELECT COUNT(*) FROM songs']
+    conn.close()
+
+def test_data_version_polls_are_not_recorded(tmp_path):
+    db_path = str(tmp_path / 'metrics.db')
+    sqlite3.connect(db_path).execute('CREATE TABLE songs (id TEXT)').connection.close()
+    pool = ReadOnlyPool(db_path)
+    pool.data_version()
+    pool.data_version()
+    pool.close_all()
+    assert not any('data_version' in query for query in recorded_queries())
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+
+import pytest
+
+import mirror
+from downloader import PART_SUFFIX, VALIDATOR_SUFFIX
+from json_import_sqlite import create_table
+
+SONGS = 12
+
+def body(song_id, kind):
+    return f'{kind} of {song_id} '.encode() * 500
+
+@pytest.fixture
+def db_path(http_server, tmp_path, monkeypatch):
+    """
+    A database of SONGS songs whose media the test server has, except the audio of song-011.
+    The media folders are created under tmp_path.
+    """
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'suno.db')
+    conn = sqlite3.connect(path)
+    create_table(conn.cursor())
+    for i in range(SONGS):
+        song_id = f'song-{i:03d}'
+        conn.execute('INSERT INTO json_data (id, audio_url, image_url, play_count) VALUES (?, ?, ?, ?)',
+                     (song_id, f'{http_server.url}{song_id}.mp3', f'{http_server.url}{song_id}.jpeg', i))
+        http_server.files[f'{song_id}.jpeg'] = (body(song_id, 'image'), f'"i{i}"')
+        if i != SONGS - 1:
+            http_server.files[f'{song_id}.mp3'] = (body(song_id, 'audio'), f'"a{i}"')
+    conn.commit()
+    conn.close()
+    return path
+
+def run(db_path, **options):
+    mirror.main(db_path, ['audio', 'image'], rate=1000, retries=0, **options)
+    conn = sqlite3.connect(db_path)
+    counts = mirror.queue_counts(conn)
+    conn.close()
+    return counts
+
+def assert_mirrored(db_path, song_id, kind):
+    path = mirror.asset_path(song_id, kind)
+    with open(path, 'rb') as f:
+        assert f.read() == body(song_id, kind)
+    conn = sqlite3.connect(db_path)
+    flag = mirror.MEDIA_KINDS[kind][2]
+    assert conn.execute(f'SELECT {flag} FROM json_data WHERE id = ?', (song_id,)).fetchone() == (1,)
+    assert conn.execute('SELECT size FROM media_inventory WHERE id = ? AND kind = ?',
+                        (song_id, kind)).fetchone() == (os.path.getsize(path),)
+    conn.close()
+
+def test_mirror_downloads_every_asset(db_path):
+    assert run(db_path) == {'done': 2 * SONGS - 1, 'failed': 1}
+    for i in range(SONGS):
+        assert_mirrored(db_path, f'song-{i:03d}', 'image')
+    assert_mirrored(db_path, 'song-000', 'audio')
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT song_id, kind FROM mirror_jobs WHERE status = 'failed'").fetchall() == [('song-011', 'audio')]
+    conn.close()
+
+def test_interrupted_jobs_are_resumed(db_path, http_server):
+    assert run(db_path, queue_only=True) == {'pending': 2 * SONGS}
+
+    # As if the previous run stopped with jobs running, one halfway through its file
+    conn = sqlite3.connect(db_path)
+    running = mirror.claim_jobs(conn, 5)
+    conn.close()
+    song_id, kind, _ = running[0]
+    path = mirror.asset_path(song_id, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    name = os.path.basename(path)
+    with open(path + PART_SUFFIX, 'wb') as f:
+        f.write(http_server.files[name][0][:1000])
+    with open(path + VALIDATOR_SUFFIX, 'w') as f:
+        f.write(http_server.files[name][1])
+
+    assert run(db_path) == {'done': 2 * SONGS - 1, 'failed': 1}
+    for song_id, kind, _ in running:
+        assert_mirrored(db_path, song_id, kind)
+    assert [headers.get('Range') for _, requested, headers in http_server.requests if requested == name] == ['bytes=1000-']
+
+def test_failed_jobs_are_retried_on_request(db_path, http_server):
+    run(db_path)
+    requests_made = len(http_server.requests)
+    assert run(db_path) == {'done': 2 * SONGS - 1, 'failed': 1}
+    assert len(http_server.requests) == requests_made
+
+    http_server.files['song-011.mp3'] = (body('song-011', 'audio'), '"a11"')
+    assert run(db_path, retry_failed=True) == {'done': 2 * SONGS}
+    assert_mirrored(db_path, 'song-011', 'audio')
+
+def test_removed_files_are_queued_again(db_path):
+    run(db_path)
+    os.remove(mirror.asset_path('song-003', 'image'))
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE json_data SET local_image = 0 WHERE id = 'song-003'")
+    conn.commit()
+    assert mirror.queue_jobs(conn, ['audio', 'image']) == 1
+    conn.close()
+
+    assert run(db_path) == {'done': 2 * SONGS - 1, 'failed': 1}
+    assert_mirrored(db_path, 'song-003', 'image')
@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+import json_import_sqlite
+import prompt_analytics
+import update_db_interesting_prompts
+
+@pytest.fixture
+def db_path(corpus, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    json_import_sqlite.main(corpus[0])
+    update_db_interesting_prompts.main('json_data.db', workers=2)
+    return str(tmp_path / 'json_data.db')
+
+def summaries(conn):
+    columns = ', '.join(prompt_analytics.STAT_COLUMNS)
+    stats = conn.execute(f'SELECT dimension, value, {columns} FROM prompt_stats ORDER BY dimension, value').fetchall()
+    top = conn.execute('SELECT * FROM prompt_stats_top ORDER BY dimension, value, rank').fetchall()
+    members = conn.execute('SELECT * FROM analytics_members ORDER BY dimension, value, song_id').fetchall()
+    return stats, top, members
+
+def test_incremental_refresh_matches_full_rebuild(db_path):
+    conn = sqlite3.connect(db_path)
+    prompt_analytics.refresh_analytics(conn)
+    deleted = [row[0] for row in conn.execute('SELECT id FROM json_data WHERE rowid % 5 = 0')]
+
+    # Changes made by other scripts, deletes included
+    conn.execute('UPDATE json_data SET play_count = play_count + 1000 WHERE rowid % 3 = 0')
+    conn.execute("UPDATE json_data SET meta_prompt_lang = 'xx' WHERE rowid % 11 = 0")
+    conn.execute('DELETE FROM json_data WHERE rowid % 5 = 0')
+    # Reuses a deleted rowid
+    conn.execute("INSERT INTO json_data (rowid, id, play_count, meta_prompt_lang) VALUES (5, 'new-song', 7, 'en')")
+    conn.commit()
+    assert prompt_analytics.refresh_analytics(conn) > 0
+    incremental = summaries(conn)
+
+    placeholders = ', '.join('?' * len(deleted))
+    assert conn.execute(
+        f'SELECT COUNT(*) FROM analytics_members WHERE song_id IN ({placeholders})', deleted
+    ).fetchone()[0] == 0
+    assert conn.execute(
+        f'SELECT COUNT(*) FROM prompt_stats_top WHERE song_id IN ({placeholders})', deleted
+    ).fetchone()[0] == 0
+
+    prompt_analytics.refresh_analytics(conn, full=True)
+    assert incremental == summaries(conn)
+
+    # Nothing changed since
+    assert prompt_analytics.refresh_analytics(conn) == 0
+    conn.close()
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from db_pool import ReadOnlyPool
+from search_cache import SearchCache
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'suno.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE json_data (id TEXT PRIMARY KEY, title TEXT)')
+    conn.execute("INSERT INTO json_data VALUES ('a', 'first')")
+    conn.commit()
+    conn.close()
+    return path
+
+def write(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+def test_result_is_cached_until_the_data_changes(db_path):
+    cache = SearchCache(ReadOnlyPool(db_path))
+    found, _, version = cache.get('key')
+    assert not found
+    cache.put('key', ['a'], version)
+    assert cache.get('key')[:2] == (True, ['a'])
+
+    write(db_path, "INSERT INTO json_data VALUES ('b', 'second')")
+    assert cache.get('key')[:2] == (False, None)
+    assert cache.stats()['invalidations'] == 1
+
+def test_result_read_before_a_change_is_not_stored(db_path):
+    cache = SearchCache(ReadOnlyPool(db_path))
+    found, _, version = cache.get('key')
+    assert not found
+
+    # Committed while the result was being computed
+    write(db_path, "UPDATE json_data SET title = 'renamed'")
+    cache.put('key', ['stale'], version)
+
+    assert cache.get('key')[:2] == (False, None)
+    assert cache.stats()['discarded'] == 1
+
+def test_get_or_compute(db_path):
+    cache = SearchCache(ReadOnlyPool(db_path), max_entries=1)
+    assert cache.get_or_compute('a', lambda: 1) == 1
+    assert cache.get_or_compute('a', lambda: 2) == 1
+    assert cache.get_or_compute('b', lambda: 3) == 3
+    assert cache.get_or_compute('a', lambda: 4) == 4
+    assert cache.stats()['evictions'] == 2
@@ -0,0 +1,223 @@
+import argparse
+import multiprocessing
+import os
+import re
+import threading
+import time
+
+from PIL import Image
+
+from media_inventory import IMAGE_PATH
+
+# Thumbnail cache, next to the downloaded images
+THUMB_PATH = "./suno-ai-music-prompts/thumbs"
+
+# Longest side in pixels (the apps show artwork 300 pixels wide), format and quality
+THUMB_SIZE = 300
+THUMB_FORMAT = 'WEBP'
+THUMB_EXTENSION = '.webp'
+THUMB_QUALITY = 75
+
+# Default disk budget of the cache before the least recently used thumbnails are removed
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Errors of images that cannot be thumbnailed: truncated or unknown files
+# (UnidentifiedImageError is an OSError) and images over twice Image.MAX_IMAGE_PIXELS
+UNREADABLE_IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+# Song ids are UUIDs; anything else is rejected before touching the file system
+SONG_ID_RE = re.compile(r'^[\w-]+$')
+
+def thumbnail_path(cache_dir, song_id):
+    """
+    Return the cache path of a thumbnail, sharded by the first two characters of the
+    id so no directory grows to millions of entries.
+    """
+    return os.path.join(cache_dir, song_id[:2], song_id + THUMB_EXTENSION)
+
+def make_thumbnail(source, target, size=THUMB_SIZE):
+    """
+    Write a thumbnail of the source image to target, atomically.
+    """
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding, much faster than a full decode
+        image.draft('RGB', (size, size))
+        image = image.convert('RGB')
+        image.thumbnail((size, size), Image.LANCZOS)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            image.save(temp_path, THUMB_FORMAT, quality=THUMB_QUALITY)
+            os.replace(temp_path, target)
+        except Exception:
+            # Do not leave a partial file behind in the shard (disk full, encoder error)
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+def is_fresh(source, target):
+    """
+    Return True if target exists and is not older than source.
+    """
+    try:
+        return os.stat(target).st_mtime_ns >= os.stat(source).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+def generate_one(task):
+    """
+    Create one thumbnail unless an up to date one exists.
+    Returns the thumbnail size in bytes, 0 if skipped, or -1 if the image is unreadable.
+    """
+    source, target, size = task
+    if is_fresh(source, target):
+        return 0
+    try:
+        make_thumbnail(source, target, size)
+    except UNREADABLE_IMAGE_ERRORS as e:
+        print(f"Skipping {source}: {e}")
+        return -1
+    return os.path.getsize(target)
+
+def generate_all(image_dir=IMAGE_PATH, cache_dir=THUMB_PATH, workers=None, size=THUMB_SIZE):
+    """
+    Pre-generate thumbnails for every image across all CPU cores, printing progress.
+    Returns (created, skipped, failed) counts.
+    """
+    def tasks():
+        with os.scandir(image_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.jpeg'):
+                    song_id = entry.name[:-len('.jpeg')]
+                    yield entry.path, thumbnail_path(cache_dir, song_id), size
+
+    created = skipped = failed = 0
+    start_time = time.time()
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(generate_one, tasks(), chunksize=64):
+            if result > 0:
+                created += 1
+            elif result == 0:
+                skipped += 1
+            else:
+                failed += 1
+            total = created + skipped + failed
+            if total % 10000 == 0:
+                print(f"{total} images, {total / (time.time() - start_time):.0f} images/s")
+    return created, skipped, failed
+
+def cache_entries(cache_dir):
+    """
+    Yield (mtime_ns, size, path) of every cached thumbnail.
+    """
+    try:
+        shards = list(os.scandir(cache_dir))
+    except FileNotFoundError:
+        return
+    for shard in shards:
+        if not shard.is_dir():
+            continue
+        with os.scandir(shard.path) as entries:
+            for entry in entries:
+                if entry.name.endswith(THUMB_EXTENSION):
+                    stat = entry.stat()
+                    yield stat.st_mtime_ns, stat.st_size, entry.path
+
+def evict(cache_dir, max_bytes):
+    """
+    Remove the least recently used thumbnails until the cache fits in max_bytes.
+    Hits refresh a thumbnail's mtime, so mtime order is recency order.
+    Returns (removed files, bytes left).
+    """
+    entries = sorted(cache_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed, total
+
+class ThumbnailCache:
+    """
+    On-demand thumbnails for the static server. Misses are generated from the
+    source image; once the cache grows past max_bytes the oldest thumbnails are
+    evicted in the background down to 90% of the budget.
+    """
+
+    def __init__(self, image_dir=IMAGE_PATH, cache_dir=THUMB_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.image_dir = image_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._bytes = None
+        self._evicting = False
+        self._lock = threading.Lock()
+
+    def get(self, song_id):
+        """
+        Return the path of the song's thumbnail, creating it if needed,
+        or None if the id is invalid or there is no local image.
+        """
+        if not SONG_ID_RE.match(song_id):
+            return None
+        source = os.path.join(self.image_dir, song_id + '.jpeg')
+        target = thumbnail_path(self.cache_dir, song_id)
+
+        if is_fresh(source, target):
+            os.utime(target)  # Mark as recently used
+            return target
+        if not os.path.exists(source):
+            return None
+        make_thumbnail(source, target)
+        self._added(os.path.getsize(target))
+        return target
+
+    def _added(self, size):
+        """
+        Account for a new thumbnail and start an eviction pass when over budget.
+        """
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(entry_size for _, entry_size, _ in cache_entries(self.cache_dir))
+            else:
+                self._bytes += size
+            if self._bytes <= self.max_bytes or self._evicting:
+                return
+            self._evicting = True
+        threading.Thread(target=self._evict, daemon=True).start()
+
+    def _evict(self):
+        _, total = evict(self.cache_dir, int(self.max_bytes * 0.9))
+        with self._lock:
+            self._bytes = total
+            self._evicting = False
+
+def main(image_dir, cache_dir, workers=None, size=THUMB_SIZE, max_bytes=None):
+    """
+    Generate the missing thumbnails, then optionally trim the cache to max_bytes.
+    """
+    start_time = time.time()
+    created, skipped, failed = generate_all(image_dir, cache_dir, workers, size)
+    print(f"{created} thumbnails created, {skipped} up to date, {failed} unreadable images "
+          f"in {time.time() - start_time:.2f} seconds")
+    if max_bytes:
+        removed, total = evict(cache_dir, max_bytes)
+        print(f"Evicted {removed} thumbnails, cache holds {total / 2**20:.1f} MB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-generate thumbnails of the song artwork.")
+    parser.add_argument('--images', default=IMAGE_PATH, help="folder of the downloaded images")
+    parser.add_argument('--cache', default=THUMB_PATH, help="thumbnail cache folder")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all CPU cores)")
+    parser.add_argument('--size', type=int, default=THUMB_SIZE, help="longest side of a thumbnail in pixels")
+    parser.add_argument('--max-bytes', type=int, default=None, help="trim the cache to this size afterwards")
+    args = parser.parse_args()
+
+    main(args.images, args.cache, args.workers, args.size, args.max_bytes)
@@ -1,10 +1,10 @@
 import sqlite3
-import os
 import pandas as pd
 
-# Paths for local content
-IMAGE_PATH = "./suno-ai-music-prompts/image"
-AUDIO_PATH = "./suno-ai-music-prompts/audio"
+from db_indexes import analyze_and_check, create_serving_indexes
+from media_inventory import refresh_inventory, sync_local_flags
+from search_index import create_search_index
+from serving_queries import LANGUAGE_COUNTS, MODEL_COUNTS
 
 # Load the language codes CSV
 csv_file_path = "language-codes.csv"
@@ -14,48 +14,10 @@ language_codes_df = pd.read_csv(csv_file_path)  # Ensure the CSV is in the same
 conn = sqlite3.connect('suno.db')
 cursor = conn.cursor()
 
-# Helper function to check if local files exist
-def file_exists(song_id, content_type):
-    path = f"{IMAGE_PATH}/{song_id}.jpeg" if content_type == "image" else f"{AUDIO_PATH}/{song_id}.mp3"
-    return os.path.exists(path)
-
-# Drop and recreate the json_data table with new boolean columns
-cursor.execute('ALTER TABLE json_data RENAME TO json_data_old')
-cursor.execute('''
-    CREATE TABLE json_data (
-        id TEXT PRIMARY KEY,
-        title TEXT,
-        meta_prompt_lang TEXT,
-        model_name TEXT,
-        meta_duration REAL,
-        play_count INTEGER,
-        meta_prompt TEXT,
-        audio_url TEXT,
-        image_url TEXT,
-        local_image BOOLEAN DEFAULT FALSE,
-        local_audio BOOLEAN DEFAULT FALSE
-    )
-''')
-
-# Copy data from old table to new table with updated local file checks
-rows = cursor.execute('SELECT id FROM json_data_old').fetchall()
-data_to_insert = [(row[0], file_exists(row[0], "image"), file_exists(row[0], "audio")) for row in rows]
-
-for row_id, local_image, local_audio in data_to_insert:
-    cursor.execute('''
-        INSERT INTO json_data (
-            id, title, meta_prompt_lang, model_name, meta_duration, 
-            play_count, meta_prompt, audio_url, image_url, local_image, local_audio
-        )
-        SELECT 
-            id, title, meta_prompt_lang, model_name, meta_duration, 
-            play_count, meta_prompt, audio_url, image_url, ?, ?
-        FROM json_data_old
-        WHERE id = ?
-    ''', (local_image, local_audio, row_id))
-
-# Drop the old table
-cursor.execute('DROP TABLE json_data_old')
+# Bring the media inventory up to date (adding the local flags to a fresh import)
+# and derive local_image/local_audio for every song from it
+refresh_inventory(conn)
+print(f"Local content flags updated for {sync_local_flags(conn)} songs")
 
 # Drop and recreate the languages table
 cursor.execute('DROP TABLE IF EXISTS languages')
@@ -77,13 +39,7 @@ cursor.execute('''
 ''')
 
 # Populate the languages table with meta_prompt_lang and counts from json_data
-cursor.execute('''
-    INSERT OR REPLACE INTO languages (language_code, count)
-    SELECT meta_prompt_lang AS language_code, COUNT(*) AS count
-    FROM json_data
-    WHERE meta_prompt_lang IS NOT NULL
-    GROUP BY meta_prompt_lang
-''')
+cursor.execute(f'INSERT OR REPLACE INTO languages (language_code, count) {LANGUAGE_COUNTS}')
 
 # Load the languages from SQLite into a DataFrame to join with the CSV data
 languages_df = pd.read_sql_query('SELECT * FROM languages', conn)
@@ -101,17 +57,19 @@ cursor.executemany(
 )
 
 # Populate the models table with unique model_name values and their counts
-cursor.execute('''
-    INSERT OR REPLACE INTO models (model_name, count)
-    SELECT model_name, COUNT(*) AS count
-    FROM json_data
-    WHERE model_name IS NOT NULL
-    GROUP BY model_name
-''')
+cursor.execute(f'INSERT OR REPLACE INTO models (model_name, count) {MODEL_COUNTS}')
 
 # Commit the changes and close the connection
 conn.commit()
 
+# Make sure the full text index exists, e.g. for databases imported before it was added
+create_search_index(conn)
+
+# Indexes for the app filters and sort order, then refresh the planner statistics
+# and check the app query plans
+create_serving_indexes(conn)
+analyze_and_check(conn)
+
 # Optional: Display the contents of the languages and models tables for verification
 print("Languages Table:")
 cursor.execute("SELECT * FROM languages")
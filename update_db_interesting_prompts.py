@@ -1,33 +1,166 @@
 import sqlite3
 import os
 import re
+import time
+import argparse
+import multiprocessing
+from collections import deque
 
-# Connect to the SQLite database
-conn = sqlite3.connect('suno.db')
-cursor = conn.cursor()
-
-# add column prompt_template to table
-#cursor.execute('ALTER TABLE json_data ADD COLUMN prompt_template TEXT')
-#cursor.execute('ALTER TABLE json_data ADD COLUMN template_length INTEGER')
-# find all the rows and iterate through them
-rows = cursor.execute('SELECT id, meta_prompt FROM json_data').fetchall()
-for row in rows:
-    # get the id and meta_prompt
-    song_id, meta_prompt = row
-    # find the prompt_template
-    instructions = re.findall(r'\[(.*?)\]', meta_prompt)
-    # update the prompt_template column
-    # Remove empty strings and strip whitespace
-    instructions = [instr.strip() for instr in instructions if instr.strip()]
-    template_length = len(instructions)
-    prompt_template =  "\n".join([f"[{instruction}]" for instruction in instructions])
+from db_indexes import analyze_and_check
+from prompt_structure import create_instruction_tables, normalize_tag, template_hash
+
+# Instructions are written inside square brackets, e.g. [Verse] or [Chorus]
+INSTRUCTION_RE = re.compile(r'\[(.*?)\]')
+
+# Rows read, extracted and written per chunk
+DEFAULT_CHUNK_SIZE = 20000
+
+def prepare_table(cursor):
+    """
+    Add the template columns, the instruction table and the bookkeeping that tracks
+    which rows still need extracting. A NULL template_hash means pending; editing
+    meta_prompt resets it to NULL.
+    """
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(json_data)')}
+    if 'prompt_template' not in columns:
+        cursor.execute('ALTER TABLE json_data ADD COLUMN prompt_template TEXT')
+    if 'template_length' not in columns:
+        cursor.execute('ALTER TABLE json_data ADD COLUMN template_length INTEGER')
+    if 'template_hash' not in columns:
+        cursor.execute('ALTER TABLE json_data ADD COLUMN template_hash INTEGER')
+    create_instruction_tables(cursor)
+
+    # Partial index holding only the pending rows, in rowid order
     cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_json_data_pending_hash
+        ON json_data (template_hash) WHERE template_hash IS NULL
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS json_data_reset_template')
+    cursor.execute('''
+        CREATE TRIGGER json_data_reset_template
+        AFTER UPDATE OF meta_prompt ON json_data
+        WHEN old.meta_prompt IS NOT new.meta_prompt
+        BEGIN
+            UPDATE json_data SET prompt_template = NULL, template_length = NULL, template_hash = NULL
+            WHERE rowid = new.rowid;
+        END
+    ''')
+
+def extract_instructions(meta_prompt):
+    """
+    Return the stripped, non-empty [...] instructions of a prompt.
+    """
+    if not meta_prompt:
+        return []
+    instructions = INSTRUCTION_RE.findall(meta_prompt)
+    # Remove empty strings and strip whitespace
+    return [instr.strip() for instr in instructions if instr.strip()]
+
+def extract_chunk(rows):
+    """
+    Extract a chunk of (rowid, id, meta_prompt) rows (runs in a worker process).
+    Returns the (prompt_template, template_length, template_hash, rowid) updates and the
+    (song_id, position, tag, normalized_tag) instruction rows.
+    """
+    templates = []
+    instruction_rows = []
+    for rowid, song_id, meta_prompt in rows:
+        instructions = extract_instructions(meta_prompt)
+        normalized = [normalize_tag(instruction) for instruction in instructions]
+        prompt_template = "\n".join([f"[{instruction}]" for instruction in instructions])
+        templates.append((prompt_template, len(instructions), template_hash(normalized), rowid))
+        instruction_rows.extend(
+            (song_id, position, instruction, normalized_tag)
+            for position, (instruction, normalized_tag) in enumerate(zip(instructions, normalized))
+        )
+    return templates, instruction_rows
+
+def read_pending_chunks(conn, chunk_size):
+    """
+    Yield chunks of pending (rowid, id, meta_prompt) rows, walking the table by rowid.
+    """
+    last_rowid = 0
+    while True:
+        rows = conn.execute('''
+            SELECT rowid, id, meta_prompt FROM json_data
+            WHERE template_hash IS NULL AND rowid > ?
+            ORDER BY rowid LIMIT ?
+        ''', (last_rowid, chunk_size)).fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        yield rows
+
+def write_chunk(conn, templates, instruction_rows):
+    """
+    Write one chunk of templates and instructions back in a single transaction.
+    """
+    conn.executemany('''
+        DELETE FROM prompt_instructions
+        WHERE song_id = (SELECT id FROM json_data WHERE rowid = ?)
+    ''', [(template[-1],) for template in templates])
+    conn.executemany('''
         UPDATE json_data
         SET prompt_template = ?,
-        template_length = ?
-        WHERE id = ?
-    ''', (prompt_template,template_length, song_id))
-    print(f"{song_id}\n{template_length}\n{prompt_template}\n\n")
+        template_length = ?,
+        template_hash = ?
+        WHERE rowid = ?
+    ''', templates)
+    conn.executemany('''
+        INSERT INTO prompt_instructions (song_id, position, tag, normalized_tag)
+        VALUES (?, ?, ?, ?)
+    ''', instruction_rows)
+    conn.commit()
+
+def main(db_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Extract the prompt templates of every new or changed row.
+    Chunks are read and written from this process while a bounded number of them
+    are extracted in the pool, so memory stays flat whatever the table size.
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    prepare_table(conn.cursor())
+    conn.commit()
+
+    workers = workers or os.cpu_count() or 1
+    processed = 0
+    with multiprocessing.Pool(processes=workers) as pool:
+        in_flight = deque()
+        chunks = read_pending_chunks(conn, chunk_size)
+        while True:
+            # Keep every worker busy, then write the oldest chunk
+            while len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                in_flight.append(pool.apply_async(extract_chunk, (chunk,)))
+            if not in_flight:
+                break
+
+            templates, instruction_rows = in_flight.popleft().get()
+            write_chunk(conn, templates, instruction_rows)
+            processed += len(templates)
+            elapsed = max(time.time() - start_time, 1e-9)
+            print(f"{processed} prompts extracted, {processed / elapsed:.0f} prompts/s")
+
+    # The instruction indexes are new to the planner statistics
+    analyze_and_check(conn)
+    conn.close()
+    print(f"Extracted {processed} prompt templates in {time.time() - start_time:.2f} seconds")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Extract the [...] instruction template of every prompt into json_data and prompt_instructions."
+    )
+    parser.add_argument('--db', default='suno.db', help="path to the SQLite database")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of extraction processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="rows read, extracted and written per chunk")
+    args = parser.parse_args()
+
+    main(args.db, args.workers, args.chunk_size)
 
 """
 # Find all strings inside square brackets